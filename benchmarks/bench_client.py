@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+"""Measure RRIClient check and submit performance against a local server.
+
+Run from the repository root with::
+
+    python -m benchmarks.bench_client --output bench.json
+
+Results are written as JSON, one entry per scenario, with throughput in
+requests per second and latency percentiles in milliseconds.
+"""
+import argparse
+import json
+import os
+import pathlib
+import platform
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import rri
+from rri import RRIFleet
+
+from rri.testing import FakeRRIServer, parse_status_mix
+
+
+def parse_size(value):
+    """Parse ``512``, ``64KB`` or ``16MB`` into a number of bytes"""
+    units = {'KB': 1024, 'MB': 1024 ** 2, 'GB': 1024 ** 3}
+    value = value.strip().upper()
+
+    for unit, multiplier in units.items():
+        if value.endswith(unit):
+            return int(float(value[:-len(unit)]) * multiplier)
+
+    return int(value)
+
+
+def percentile(ordered, fraction):
+    if not ordered:
+        return 0.0
+
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarise(name, latencies, errors, elapsed, **details):
+    ordered = sorted(latencies)
+    milliseconds = [latency * 1000 for latency in ordered]
+
+    return dict(
+        name=name,
+        requests=len(latencies),
+        errors=errors,
+        seconds=round(elapsed, 4),
+        throughput=round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        latency_ms=dict(
+            mean=round(sum(milliseconds) / len(milliseconds), 3)
+            if milliseconds else 0.0,
+            p50=round(percentile(milliseconds, 0.50), 3),
+            p90=round(percentile(milliseconds, 0.90), 3),
+            p99=round(percentile(milliseconds, 0.99), 3),
+            max=round(milliseconds[-1], 3) if milliseconds else 0.0,
+        ),
+        **details
+    )
+
+
+def period(n):
+    """A different month for each of the first 12,000 requests"""
+    return f'{2000 + n // 12 % 1000:04d}-{n % 12 + 1:02d}'
+
+
+def run(fleet, operation, requests, workers):
+    tlds = list(fleet)
+
+    def call(n):
+        rric = fleet[tlds[n % len(tlds)]]
+        started = time.perf_counter()
+        try:
+            operation(rric, n)
+            failed = False
+        except Exception:
+            failed = True
+
+        return time.perf_counter() - started, failed
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        outcomes = list(executor.map(call, range(requests)))
+    elapsed = time.perf_counter() - started
+
+    latencies = [latency for latency, _ in outcomes]
+    errors = sum(failed for _, failed in outcomes)
+
+    return latencies, errors, elapsed
+
+
+def build_fleet(server, tld_count, workers):
+    credentials = ((f'tld{n}', f'user{n}', f'pass{n}')
+                   for n in range(tld_count))
+
+    return RRIFleet(credentials, pool_size=workers, base_url=server.base_url)
+
+
+def benchmark(args):
+    results = []
+
+    with tempfile.TemporaryDirectory() as directory:
+        large_path = pathlib.Path(directory, 'large.csv')
+        with open(large_path, 'wb') as f:
+            f.write(os.urandom(args.large_size))
+
+        small_report = 'x' * args.small_size
+
+        server = FakeRRIServer(latency=args.latency, status_mix=args.status)
+        with server:
+            for tld_count in args.tlds:
+                fleet = build_fleet(server, tld_count, args.workers)
+
+                # Each check asks about a different period, so checks in
+                # flight together aren't coalesced into one request
+                scenarios = [
+                    ('check', None, args.requests,
+                     lambda rric, n: rric.transactions.check(period(n))),
+                    ('submit', args.small_size, args.requests,
+                     lambda rric, n: rric.transactions.submit(small_report,
+                                                              '2018-08')),
+                    ('submit', args.large_size, args.large_requests,
+                     lambda rric, n: rric.transactions.submit(large_path,
+                                                              '2018-08')),
+                ]
+
+                for operation, size, requests, call in scenarios:
+                    latencies, errors, elapsed = run(fleet, call, requests,
+                                                     args.workers)
+                    name = f'{operation}-{tld_count}-tlds'
+                    if size is not None:
+                        name += f'-{size}-bytes'
+
+                    results.append(summarise(
+                        name, latencies, errors, elapsed,
+                        operation=operation, tlds=tld_count,
+                        payload_bytes=size, workers=args.workers
+                    ))
+
+                fleet.close()
+
+    return dict(
+        rri_version=rri.__version__,
+        python=platform.python_version(),
+        platform=platform.platform(),
+        server=dict(latency=args.latency,
+                    status_mix={str(k): v for k, v in args.status.items()}),
+        results=results,
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tlds', default='1,100,1000',
+                        type=lambda v: [int(n) for n in v.split(',')],
+                        help='comma separated numbers of tlds')
+    parser.add_argument('--requests', type=int, default=2000,
+                        help='requests per check and small submit scenario')
+    parser.add_argument('--large-requests', type=int, default=50,
+                        help='requests per large submit scenario')
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument('--small-size', type=parse_size, default='2KB')
+    parser.add_argument('--large-size', type=parse_size, default='16MB')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='server latency in seconds')
+    parser.add_argument('--status', type=parse_status_mix, default='200=1',
+                        help='server status mix, e.g. 200=95,500=5')
+    parser.add_argument('--output', help='write JSON results to a file')
+    args = parser.parse_args(argv)
+
+    report = benchmark(args)
+    output = json.dumps(report, indent=2)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        sys.stdout.write(output + '\n')
+
+    for result in report['results']:
+        sys.stderr.write('{name:40} {throughput:>10.1f} req/s '
+                         'p50 {latency_ms[p50]:>8.2f} ms '
+                         'p99 {latency_ms[p99]:>8.2f} ms\n'.format(**result))
+
+
+if __name__ == '__main__':
+    main()
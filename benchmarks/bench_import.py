@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""Measure how long importing rri takes in a fresh interpreter.
+
+Run from the repository root with::
+
+    python -m benchmarks.bench_import --output import.json
+
+Each scenario runs in a new process, as a cron job would, and the time
+spent in the statement is reported in milliseconds. Interpreter start up
+is excluded.
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+
+import rri
+
+from benchmarks.bench_client import percentile
+
+
+SCENARIOS = {
+    'version': 'import rri; rri.__version__',
+    'client-import': 'from rri import RRIClient',
+    'client': "from rri import RRIClient; RRIClient('example', 'u', 'p')",
+    'fleet': "from rri import RRIFleet; "
+             "RRIFleet({'example': ('u', 'p')})['example']",
+}
+
+TIMER = '''
+import sys, time
+started = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - started
+assert {forbidden!r} not in sys.modules, {forbidden!r}
+print(elapsed)
+'''
+
+
+def measure(statement, runs, forbidden=''):
+    code = TIMER.format(statement=statement,
+                        forbidden=forbidden or '\0')
+    timings = []
+
+    for _ in range(runs):
+        output = subprocess.check_output([sys.executable, '-c', code])
+        timings.append(float(output) * 1000)
+
+    ordered = sorted(timings)
+
+    return dict(
+        runs=runs,
+        min_ms=round(ordered[0], 3),
+        p50_ms=round(percentile(ordered, 0.50), 3),
+        p90_ms=round(percentile(ordered, 0.90), 3),
+    )
+
+
+def benchmark(args):
+    results = []
+
+    for name, statement in SCENARIOS.items():
+        # Reading the version must never load the HTTP stack
+        forbidden = 'requests' if name == 'version' else ''
+        results.append(dict(name=name, statement=statement,
+                            **measure(statement, args.runs, forbidden)))
+
+    return dict(
+        rri_version=rri.__version__,
+        python=platform.python_version(),
+        platform=platform.platform(),
+        results=results,
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=20,
+                        help='processes started per scenario')
+    parser.add_argument('--output', help='write JSON results to a file')
+    args = parser.parse_args(argv)
+
+    report = benchmark(args)
+    output = json.dumps(report, indent=2)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        sys.stdout.write(output + '\n')
+
+    for result in report['results']:
+        sys.stderr.write('{name:20} p50 {p50_ms:>8.2f} ms '
+                         'min {min_ms:>8.2f} ms\n'.format(**result))
+
+
+if __name__ == '__main__':
+    main()
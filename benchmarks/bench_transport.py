@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""Measure the per-call overhead of each transport against a local server.
+
+Run from the repository root with::
+
+    python -m benchmarks.bench_transport --output transport.json
+
+Checks are made one at a time from a single thread, so the figures are the
+cost of a call rather than of waiting for a connection. Wall time includes
+the local server's share, while CPU time only counts the calling thread.
+A bare ``urllib3`` HEAD is measured as the floor. Times are reported in
+microseconds.
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+
+import urllib3
+
+import rri
+from rri import RRIClient
+from rri.testing import FakeRRIServer
+from rri.transport import RequestsTransport, Urllib3Transport
+
+from benchmarks.bench_client import percentile
+
+
+TRANSPORTS = {
+    'requests': RequestsTransport,
+    'urllib3': Urllib3Transport,
+}
+
+
+def measure(call, calls, warmup):
+    for _ in range(warmup):
+        call()
+
+    wall = []
+    cpu = []
+
+    for _ in range(calls):
+        wall_started = time.perf_counter()
+        cpu_started = time.thread_time()
+        call()
+        cpu.append(time.thread_time() - cpu_started)
+        wall.append(time.perf_counter() - wall_started)
+
+    return wall, cpu
+
+
+def summarise(name, wall, cpu):
+    def micros(timings):
+        ordered = sorted(timing * 1e6 for timing in timings)
+        return dict(
+            mean=round(sum(ordered) / len(ordered), 1),
+            p50=round(percentile(ordered, 0.50), 1),
+            p90=round(percentile(ordered, 0.90), 1),
+        )
+
+    return dict(name=name, calls=len(wall), wall_us=micros(wall),
+                cpu_us=micros(cpu))
+
+
+def benchmark(args):
+    results = []
+
+    with FakeRRIServer() as server:
+        pool = urllib3.PoolManager(maxsize=1)
+        url = server.base_url + \
+            '/info/report/registrar-transactions/example/2018-08'
+        wall, cpu = measure(
+            lambda: pool.request('HEAD', url, retries=False,
+                                 headers=urllib3.make_headers(
+                                     basic_auth='user:pass')),
+            args.calls, args.warmup
+        )
+        results.append(summarise('urllib3-bare', wall, cpu))
+        pool.clear()
+
+        for name, transport_class in TRANSPORTS.items():
+            with transport_class(pool_size=1) as transport:
+                rric = RRIClient('example', 'user', 'pass', client=transport,
+                                 base_url=server.base_url)
+                wall, cpu = measure(
+                    lambda: rric.transactions.check('2018-08'),
+                    args.calls, args.warmup
+                )
+                results.append(summarise(name, wall, cpu))
+
+    return dict(
+        rri_version=rri.__version__,
+        python=platform.python_version(),
+        platform=platform.platform(),
+        urllib3=urllib3.__version__,
+        results=results,
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--calls', type=int, default=2000,
+                        help='checks measured per transport')
+    parser.add_argument('--warmup', type=int, default=100,
+                        help='checks made before measuring')
+    parser.add_argument('--output', help='write JSON results to a file')
+    args = parser.parse_args(argv)
+
+    report = benchmark(args)
+    output = json.dumps(report, indent=2)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        sys.stdout.write(output + '\n')
+
+    for result in report['results']:
+        sys.stderr.write('{name:15} wall p50 {wall_us[p50]:>8.1f} us '
+                         'cpu p50 {cpu_us[p50]:>8.1f} us\n'.format(**result))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,44 @@
 # -*- coding: utf-8 -*-
 
 """Top-level package for Registry Reporting Interface."""
+import sys
 
 __author__ = """John Storey"""
 __email__ = 'hello@storey.io'
 __version__ = '0.1.2'
 
-from .rri import RRIClient
+__all__ = ['RRIClient', 'RRIFleet', 'AsyncRRIClient']
 
-__all__ = ['RRIClient']
+# Submodules are imported on first use so that importing the package, e.g.
+# to read the version, doesn't pay for requests or aiohttp
+_LAZY = {
+    'RRIClient': '.rri',
+    'RRIFleet': '.fleet',
+    'AsyncRRIClient': '.aio',
+}
+
+
+def __getattr__(name):
+    try:
+        module = _LAZY[name]
+    except KeyError:
+        raise AttributeError(
+            f'module {__name__!r} has no attribute {name!r}'
+        ) from None
+
+    from importlib import import_module
+    value = getattr(import_module(module, __name__), name)
+    globals()[name] = value
+
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
+
+
+# Module __getattr__ needs Python 3.7 (PEP 562)
+if sys.version_info < (3, 7):  # pragma: no cover
+    from .rri import RRIClient  # noqa: F401
+    from .fleet import RRIFleet  # noqa: F401
+    from .aio import AsyncRRIClient  # noqa: F401
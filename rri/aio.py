@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+import asyncio
+
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover
+    aiohttp = None
+
+from .coalesce import AsyncCoalescer
+from .transport import _basic_auth_header
+from .rri import RRIClient, RRIResponse, EscrowReport, EscrowNotification, \
+    RegistryFunctions, PerRegistrarTransactions, DEFAULT_BASE_URL, \
+    DEFAULT_MAX_WORKERS, _get_default_useragent, _get_root_url
+
+
+__all__ = ['AsyncRRIClient']
+
+DEFAULT_CONNECTION_LIMIT = 100
+
+
+class AsyncRRIClient:
+    """
+    Registry Reporting Interface client for asyncio
+
+    Must be created while an event loop is running, and closed with
+    ``await client.close()`` or by using it as an async context manager.
+
+    :param str tld: tld to query
+    :param str rri_user: tld username
+    :param str rri_pass: tld password
+    :param client: alternative ``aiohttp.ClientSession``
+    :param str base_url: alternative base url
+    :param int pool_size: maximum number of simultaneous connections
+    """
+    icann_url = RRIClient.icann_url
+
+    def __init__(self, tld, rri_user, rri_pass, client=None, base_url=None,
+                 pool_size=DEFAULT_CONNECTION_LIMIT):
+        if aiohttp is None:
+            raise ImportError('AsyncRRIClient requires aiohttp, install it '
+                              'with "pip install rri[async]"')
+
+        self.tld = tld
+        self.rri_user = rri_user
+        self.rri_pass = rri_pass
+
+        if client:
+            self.client = client
+        else:
+            self.client = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=pool_size),
+                headers={'User-Agent': _get_default_useragent()}
+            )
+
+        self.base_url = base_url if base_url else DEFAULT_BASE_URL
+        self.icann_url = self.icann_url.partial(
+            base_url=_get_root_url(self.base_url)
+        )
+        self.auth = _basic_auth_header(self.rri_user, self.rri_pass)
+
+        self.url = self.icann_url.partial(tld=tld)
+
+        self.report = AsyncEscrowReport(self.client, self.url,
+                                        auth=self.auth)
+        self.notification = AsyncEscrowNotification(self.client, self.url,
+                                                    auth=self.auth)
+        self.functions = AsyncRegistryFunctions(self.client, self.url,
+                                                auth=self.auth)
+        self.transactions = AsyncPerRegistrarTransactions(self.client,
+                                                          self.url,
+                                                          auth=self.auth)
+
+    async def close(self):
+        await self.client.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def __repr__(self):
+        return (f'AsyncRRIClient("{self.tld}", "{self.rri_user}", '
+                f'"{self.rri_pass}")')
+
+
+class AsyncRRIResource:
+    """
+    Mixin providing coroutine versions of the RRIResource requests
+
+    URL construction, date handling and the mapping of HTTP status codes
+    to exceptions are inherited from the synchronous resource.
+    """
+    coalescer_class = AsyncCoalescer
+
+    async def _request(self, method, url, headers=None, **kwargs):
+        headers = dict(headers or {}, Authorization=self.auth)
+
+        async with self.client.request(method, url, headers=headers,
+                                       allow_redirects=False,
+                                       **kwargs) as response:
+            return response.status, await response.read(), response.charset
+
+    async def _submit(self, method, url, report) -> RRIResponse:
+        headers = {
+            'Content-type': self.content_type,
+            'Accept': self.content_type
+        }
+
+        status, body, encoding = await self._request(method, url,
+                                                     data=report,
+                                                     headers=headers)
+
+        success = self._submit_status(status)
+        return RRIResponse(success, body, encoding=encoding)
+
+    async def check(self, date=None):
+        """Check the status of a resource endpoint
+
+        :param date: The date to check, or today if None
+        :type date: ``str`` or ``datetime.datetime``
+        :return: True if HTTP/200, False if HTTP/404
+        :rtype: ``bool``
+        """
+        url_date = self._get_date_string(date)
+        check_url = self._get_info_url(url_date)
+
+        return await self.in_flight.call(check_url, self._check, check_url)
+
+    async def _check(self, check_url) -> bool:
+        status, _, _ = await self._request('HEAD', check_url)
+
+        return self._check_status(status)
+
+    async def check_many(self, dates,
+                         max_workers=DEFAULT_MAX_WORKERS) -> dict:
+        """Check the status of a resource endpoint for many dates
+
+        Checks run concurrently, and a failure for one date is returned in
+        place of its status rather than raised.
+
+        :param dates: The dates to check
+        :type dates: iterable of ``str`` or ``datetime.datetime``
+        :param int max_workers: maximum number of concurrent checks
+        :return: mapping of date string to True if HTTP/200, False if
+            HTTP/404, or the exception raised for that date
+        :rtype: ``dict``
+        """
+        results, periods = self._index_periods(dates)
+        semaphore = asyncio.Semaphore(max_workers)
+
+        async def check(period):
+            async with semaphore:
+                try:
+                    return await self.check(period)
+                except Exception as e:
+                    return e
+
+        checked = await asyncio.gather(*map(check, periods))
+        results.update(zip(periods, checked))
+
+        return results
+
+    async def check_range(self, start, end,
+                          max_workers=DEFAULT_MAX_WORKERS) -> dict:
+        """Check the status of a resource endpoint for a range of dates
+
+        Every period between start and end inclusive is checked, daily or
+        monthly depending on the resource.
+
+        :param start: The first date to check
+        :type start: ``str`` or ``datetime.datetime``
+        :param end: The last date to check
+        :type end: ``str`` or ``datetime.datetime``
+        :param int max_workers: maximum number of concurrent checks
+        :return: mapping of date string to status, see ``check_many``
+        :rtype: ``dict``
+        """
+        return await self.check_many(self._iter_periods(start, end),
+                                     max_workers=max_workers)
+
+    async def submit(self, report, date=None) -> RRIResponse:
+        """Submit a report to the resource endpoint
+
+        :param report:
+        :param date:
+        :return: ``RRIResponse``
+        """
+        url_date = self._get_date_string(date)
+        submit_url = self._get_submit_url(url_date)
+
+        return await self._submit('PUT', submit_url, report)
+
+
+class AsyncEscrowReport(AsyncRRIResource, EscrowReport):
+    """
+    Data Escrow Report resource
+    """
+    async def submit(self, report, id) -> RRIResponse:
+        """Submit a registry escrow report passed in as report
+
+        :param report:
+        :type report: ``str``
+        :param id:
+        :type id: ``str``
+        :return: ``RRIResponse``
+        """
+        submit_url = self._get_submit_url(id)
+
+        return await self._submit('PUT', submit_url, report)
+
+
+class AsyncEscrowNotification(AsyncRRIResource, EscrowNotification):
+    """
+    Data Escrow Notification resource
+    """
+    async def submit(self, report) -> RRIResponse:
+        """Submit an escrow agent notification passed in as report
+
+        :param report:
+        :type report: ``str``
+        :return: ``RRIResponse``
+        """
+        submit_url = self._get_submit_url()
+
+        return await self._submit('POST', submit_url, report)
+
+
+class AsyncRegistryFunctions(AsyncRRIResource, RegistryFunctions):
+    """
+    Registry Functions Activity resource
+    """
+
+
+class AsyncPerRegistrarTransactions(AsyncRRIResource,
+                                    PerRegistrarTransactions):
+    """
+    Per-Registrar Transactions resource
+    """
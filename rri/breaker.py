@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+import sqlite3
+import threading
+import time
+
+from .exception import CircuitOpen, ConnectionFailed, RequestTimeout
+
+
+__all__ = ['CircuitBreaker']
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+DEFAULT_FAILURE_STATUSES = (500, 502, 503, 504)
+
+
+class CircuitBreaker:
+    """
+    Stop sending requests to an RRI endpoint that keeps failing
+
+    After ``failure_threshold`` consecutive server errors or connection
+    failures the circuit opens and requests fail straight away with
+    ``CircuitOpen``. Once ``reset_timeout`` seconds have passed up to
+    ``half_open_probes`` requests are let through: the circuit closes if
+    they succeed and opens again if they fail.
+
+    State is kept in SQLite, so every process given the same ``path``
+    stops and resumes together. Without a path the state is only shared
+    by the threads of this process.
+
+    :param str path: path to the SQLite database, created if missing
+    :param int failure_threshold: consecutive failures that open the
+        circuit
+    :param float reset_timeout: seconds to wait before probing an open
+        circuit
+    :param int half_open_probes: requests let through at a time to probe
+    :param statuses: HTTP status codes counted as failures
+    :param float timeout: seconds to wait for another process's lock
+    """
+    exceptions = (ConnectionFailed, RequestTimeout)
+
+    def __init__(self, path=None, failure_threshold=5, reset_timeout=30.0,
+                 half_open_probes=1, statuses=DEFAULT_FAILURE_STATUSES,
+                 timeout=30.0):
+        self.path = path
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_probes = half_open_probes
+        self.statuses = frozenset(statuses)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path or ':memory:', timeout=timeout,
+                                   isolation_level=None,
+                                   check_same_thread=False)
+
+        with self._lock:
+            if path:
+                self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS circuit ('
+                '  key TEXT PRIMARY KEY,'
+                '  state TEXT NOT NULL,'
+                '  failures INTEGER NOT NULL,'
+                '  changed REAL NOT NULL,'
+                '  probes INTEGER NOT NULL'
+                ')'
+            )
+
+    def _row(self, key):
+        return self._db.execute(
+            'SELECT state, failures, changed, probes FROM circuit '
+            'WHERE key = ?', (key,)
+        ).fetchone()
+
+    def state(self, key) -> str:
+        """Return the state of a circuit: closed, open or half-open
+
+        :param str key: endpoint key
+        """
+        with self._lock:
+            row = self._row(key)
+
+        return row[0] if row else CLOSED
+
+    def before(self, key):
+        """Claim permission to send a request
+
+        :param str key: endpoint key
+        :raises CircuitOpen: if the request mustn't be sent
+        """
+        with self._lock:
+            row = self._row(key)
+            if row is None or row[0] == CLOSED:
+                return
+
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                # Read again now that no other process can change it
+                state, failures, changed, probes = self._row(key)
+                now = time.time()
+                waited = now - changed
+
+                if state == OPEN and waited >= self.reset_timeout:
+                    state, changed, probes = HALF_OPEN, now, 0
+
+                # Probes from a worker that died are given up on after
+                # another reset_timeout
+                elif state == HALF_OPEN and waited >= self.reset_timeout:
+                    changed, probes = now, 0
+
+                if state == HALF_OPEN and probes < self.half_open_probes:
+                    self._db.execute(
+                        'UPDATE circuit SET state = ?, changed = ?, '
+                        'probes = ? WHERE key = ?',
+                        (state, changed, probes + 1, key)
+                    )
+                    self._db.execute('COMMIT')
+                    return
+            except BaseException:
+                self._db.execute('ROLLBACK')
+                raise
+
+            self._db.execute('COMMIT')
+
+        if state == CLOSED:
+            return
+
+        raise CircuitOpen(key, max(0.0, self.reset_timeout - waited))
+
+    def success(self, key):
+        """Record a request that reached a working endpoint
+
+        :param str key: endpoint key
+        """
+        with self._lock:
+            self._db.execute(
+                'UPDATE circuit SET state = ?, failures = 0, changed = ?, '
+                'probes = 0 WHERE key = ? '
+                'AND (state != ? OR failures != 0)',
+                (CLOSED, time.time(), key, CLOSED)
+            )
+
+    def failure(self, key):
+        """Record a failed request, opening the circuit if need be
+
+        :param str key: endpoint key
+        """
+        now = time.time()
+
+        with self._lock:
+            self._db.execute(
+                'INSERT INTO circuit VALUES (?, ?, 1, ?, 0) '
+                'ON CONFLICT (key) DO UPDATE SET '
+                '  failures = failures + 1',
+                (key, CLOSED, now)
+            )
+            self._db.execute(
+                'UPDATE circuit SET state = ?, changed = ?, probes = 0 '
+                'WHERE key = ? AND ('
+                '  state = ? OR (state = ? AND failures >= ?)'
+                ')',
+                (OPEN, now, key, HALF_OPEN, CLOSED, self.failure_threshold)
+            )
+
+    def call(self, key, send, *args, **kwargs):
+        """Send a request through the circuit
+
+        :param str key: endpoint key
+        :param send: function sending the request and returning a response
+        :return: the response
+        :raises CircuitOpen: if the request wasn't sent
+        """
+        self.before(key)
+
+        try:
+            response = send(*args, **kwargs)
+        except self.exceptions:
+            self.failure(key)
+            raise
+
+        if response.status_code in self.statuses:
+            self.failure(key)
+        else:
+            self.success(key)
+
+        return response
+
+    def reset(self, key=None):
+        """Close a circuit, or every circuit
+
+        :param str key: endpoint key, or None for all of them
+        """
+        with self._lock:
+            if key is None:
+                self._db.execute('DELETE FROM circuit')
+            else:
+                self._db.execute('DELETE FROM circuit WHERE key = ?', (key,))
+
+    def close(self):
+        self._db.close()
+
+    def __repr__(self):
+        return f'CircuitBreaker("{self.path or ":memory:"}")'
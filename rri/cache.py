@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+import sqlite3
+import threading
+import time
+
+
+__all__ = ['CheckCache']
+
+DEFAULT_MISSING_TTL = 300
+
+
+class CheckCache:
+    """
+    On-disk cache of check results, shareable between processes
+
+    A report that has been accepted stays accepted, so HTTP/200 results
+    are kept forever. HTTP/404 results only mean the report hasn't arrived
+    yet and expire after ``missing_ttl`` seconds.
+
+    The cache also keeps the SHA-256 of the last accepted submission of
+    each report, so that ``submit()`` can skip uploading an unchanged
+    report again.
+
+    Entries are keyed by tld, resource and period, so a cache file should
+    only be used with a single RRI base url.
+
+    :param str path: path to the SQLite database, created if missing
+    :param int missing_ttl: seconds to keep HTTP/404 results for
+    :param float timeout: seconds to wait for another process's lock
+    """
+    def __init__(self, path, missing_ttl=DEFAULT_MISSING_TTL, timeout=30.0):
+        self.path = path
+        self.missing_ttl = missing_ttl
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=timeout,
+                                   isolation_level=None,
+                                   check_same_thread=False)
+
+        with self._lock:
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS check_result ('
+                '  tld TEXT NOT NULL,'
+                '  resource TEXT NOT NULL,'
+                '  period TEXT NOT NULL,'
+                '  accepted INTEGER NOT NULL,'
+                '  expires REAL,'
+                '  PRIMARY KEY (tld, resource, period)'
+                ')'
+            )
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS submission ('
+                '  tld TEXT NOT NULL,'
+                '  resource TEXT NOT NULL,'
+                '  period TEXT NOT NULL,'
+                '  digest TEXT NOT NULL,'
+                '  response_body TEXT NOT NULL,'
+                '  submitted REAL NOT NULL,'
+                '  PRIMARY KEY (tld, resource, period)'
+                ')'
+            )
+
+    def get(self, tld, resource, period):
+        """Return a cached check result
+
+        :param str tld: tld
+        :param str resource: resource name
+        :param str period: formatted date string
+        :return: True or False, or None if nothing is cached
+        """
+        with self._lock:
+            row = self._db.execute(
+                'SELECT accepted FROM check_result '
+                'WHERE tld = ? AND resource = ? AND period = ? '
+                'AND (expires IS NULL OR expires > ?)',
+                (tld, resource, period, time.time())
+            ).fetchone()
+
+        return bool(row[0]) if row else None
+
+    def set(self, tld, resource, period, accepted):
+        """Cache a check result
+
+        :param str tld: tld
+        :param str resource: resource name
+        :param str period: formatted date string
+        :param bool accepted: True if HTTP/200, False if HTTP/404
+        """
+        expires = None if accepted else time.time() + self.missing_ttl
+
+        with self._lock:
+            # Never replace a permanent result with an expiring one
+            self._db.execute(
+                'INSERT INTO check_result VALUES (?, ?, ?, ?, ?) '
+                'ON CONFLICT (tld, resource, period) DO UPDATE SET '
+                '  accepted = excluded.accepted,'
+                '  expires = excluded.expires '
+                'WHERE check_result.expires IS NOT NULL',
+                (tld, resource, period, int(accepted), expires)
+            )
+
+        if not accepted:
+            self.evict()
+
+    def get_submission(self, tld, resource, period, digest):
+        """Return the response to an accepted submission of a report
+
+        :param str tld: tld
+        :param str resource: resource name
+        :param str period: formatted date string, or escrow deposit id
+        :param str digest: SHA-256 of the report
+        :return: the response body, or None if the last accepted report
+            had a different digest
+        :rtype: ``str``
+        """
+        with self._lock:
+            row = self._db.execute(
+                'SELECT response_body FROM submission '
+                'WHERE tld = ? AND resource = ? AND period = ? '
+                'AND digest = ?',
+                (tld, resource, period, digest)
+            ).fetchone()
+
+        return row[0] if row else None
+
+    def set_submission(self, tld, resource, period, digest, response_body):
+        """Record an accepted submission
+
+        :param str tld: tld
+        :param str resource: resource name
+        :param str period: formatted date string, or escrow deposit id
+        :param str digest: SHA-256 of the report
+        :param str response_body: body of the HTTP/200 response
+        """
+        with self._lock:
+            self._db.execute(
+                'INSERT INTO submission VALUES (?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT (tld, resource, period) DO UPDATE SET '
+                '  digest = excluded.digest,'
+                '  response_body = excluded.response_body,'
+                '  submitted = excluded.submitted',
+                (tld, resource, period, digest, response_body or '',
+                 time.time())
+            )
+
+    def evict(self):
+        """Remove expired results
+
+        :return: the number of results removed
+        :rtype: ``int``
+        """
+        with self._lock:
+            cursor = self._db.execute(
+                'DELETE FROM check_result WHERE expires <= ?', (time.time(),)
+            )
+
+        return cursor.rowcount
+
+    def clear(self):
+        """Remove every cached result and submission digest"""
+        with self._lock:
+            self._db.execute('DELETE FROM check_result')
+            self._db.execute('DELETE FROM submission')
+
+    def close(self):
+        self._db.close()
+
+    def __repr__(self):
+        return f'CheckCache("{self.path}")'
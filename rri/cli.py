@@ -0,0 +1,314 @@
+# -*- coding: utf-8 -*-
+"""Submit and check reports kept in a directory tree.
+
+Reports are read from ``ROOT/<tld>/<resource>/<period>.<ext>``, e.g.
+``reports/example/registrar-transactions/2018-08.csv``. The period is
+the date of the report, or the deposit id of an escrow report. Escrow
+reports are checked by the date of their deposit's watermark.
+"""
+import argparse
+import os
+import pathlib
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from . import __version__
+from .cache import CheckCache
+from .escrow import read_report_watermark
+from .fleet import RRIFleet
+from .payload import open_report, report_digest
+from .retry import RetryPolicy
+from .rri import DEFAULT_POOL_SIZE
+
+
+__all__ = ['main', 'scan']
+
+RESOURCE_NAMES = ('registry-escrow-report', 'escrow-agent-notification',
+                  'registry-functions-activity', 'registrar-transactions')
+
+# Start of an XML Schema dateTime
+DATE_PATTERN = re.compile(r'^\d{4}-\d{2}-\d{2}(T|$)')
+
+# Outcomes that make the command exit with an error
+FAILURES = ('rejected', 'missing', 'error')
+
+
+class Task:
+    """
+    A report found in the tree, and the outcome of acting on it
+
+    :param str tld: tld
+    :param str resource: resource name
+    :param str period: date string, or escrow deposit id
+    :param path: path to the report
+    :type path: ``pathlib.Path``
+    """
+    __slots__ = ('tld', 'resource', 'period', 'path', 'result', 'detail')
+
+    def __init__(self, tld, resource, period, path):
+        self.tld = tld
+        self.resource = resource
+        self.period = period
+        self.path = path
+        self.result = None
+        self.detail = ''
+
+    def __repr__(self):
+        return f'Task({self.resource}/{self.tld}/{self.period})'
+
+
+def scan(root, tlds=None, resources=None):
+    """Find the reports in a directory tree
+
+    Hidden files and directories that aren't a resource name are skipped.
+
+    :param str root: directory laid out as ``<tld>/<resource>/<period>``
+    :param tlds: only include these tlds
+    :param resources: only include these resource names
+    :return: ``list`` of ``Task`` sorted by tld, resource and period
+    """
+    tasks = []
+
+    for tld in sorted(os.listdir(root)):
+        tld_dir = os.path.join(root, tld)
+        if tld.startswith('.') or not os.path.isdir(tld_dir):
+            continue
+        if tlds and tld not in tlds:
+            continue
+
+        for resource in sorted(os.listdir(tld_dir)):
+            resource_dir = os.path.join(tld_dir, resource)
+            if resource not in RESOURCE_NAMES or \
+                    not os.path.isdir(resource_dir):
+                continue
+            if resources and resource not in resources:
+                continue
+
+            for name in sorted(os.listdir(resource_dir)):
+                path = os.path.join(resource_dir, name)
+                if name.startswith('.') or not os.path.isfile(path):
+                    continue
+
+                period = name.split('.', 1)[0]
+                tasks.append(Task(tld, resource, period, pathlib.Path(path)))
+
+    return tasks
+
+
+def _submit(fleet, task, force=False):
+    resource = fleet[task.tld].resources[task.resource]
+
+    if task.resource == 'escrow-agent-notification':
+        response = resource.submit(task.path)
+    else:
+        response = resource.submit(task.path, task.period, force=force)
+
+    if response.deduplicated:
+        return 'unchanged', ''
+
+    if response.success:
+        return 'accepted', ''
+
+    return 'rejected', '; '.join(str(error) for error in response.errors())
+
+
+def _deposit_date(task):
+    """Return the date escrow reports are checked by, from the watermark
+
+    :return: date string, or None if the report has no valid watermark
+    """
+    try:
+        watermark = read_report_watermark(str(task.path))
+    except ValueError:
+        return None
+
+    if not watermark or not DATE_PATTERN.match(watermark):
+        return None
+
+    return watermark[:10]
+
+
+def _check(fleet, task):
+    resource = fleet[task.tld].resources[task.resource]
+    period = task.period
+    detail = ''
+
+    # The RRI checks escrow reports by date, but they're named by deposit
+    if task.resource == 'registry-escrow-report':
+        period = _deposit_date(task)
+        if period is None:
+            return 'skipped', 'no watermark to check the deposit date by'
+        detail = f'deposit of {period}'
+
+    return ('present', detail) if resource.check(period) \
+        else ('missing', detail)
+
+
+def _status(cache, task):
+    # Notifications aren't named by period, so the cache can't know them
+    if task.resource == 'escrow-agent-notification':
+        return 'untracked', 'notifications are not recorded in the cache'
+
+    with open(task.path, 'rb') as f, open_report(f) as body:
+        digest = report_digest(body)
+
+    if cache.get_submission(task.tld, task.resource, task.period,
+                            digest) is not None:
+        return 'submitted', ''
+
+    period = task.period
+    if task.resource == 'registry-escrow-report':
+        period = _deposit_date(task)
+
+    accepted = cache.get(task.tld, task.resource, period) \
+        if period else None
+
+    if accepted:
+        return 'accepted', 'differs from the submitted report'
+
+    if accepted is False:
+        return 'missing', ''
+
+    return 'unknown', ''
+
+
+def _run(action, tasks, workers):
+    def run(task):
+        try:
+            task.result, task.detail = action(task)
+        except Exception as e:
+            task.result = 'error'
+            task.detail = f'{type(e).__name__} {e}'.strip()
+
+        return task
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(run, tasks))
+
+
+def format_table(tasks):
+    """Format the outcome of tasks as a table with a totals line
+
+    :param tasks: ``Task`` objects with a result
+    :rtype: ``str``
+    """
+    header = ('TLD', 'RESOURCE', 'PERIOD', 'RESULT', '')
+    rows = [(t.tld, t.resource, t.period, t.result, t.detail)
+            for t in tasks]
+
+    widths = [max(len(str(row[i])) for row in [header] + rows)
+              for i in range(len(header) - 1)]
+
+    def line(row):
+        cells = [str(cell).ljust(width) for cell, width in zip(row, widths)]
+        return '  '.join(cells + [row[-1]]).rstrip()
+
+    totals = {}
+    for task in tasks:
+        totals[task.result] = totals.get(task.result, 0) + 1
+
+    summary = ', '.join(f'{count} {result}'
+                        for result, count in sorted(totals.items()))
+
+    return '\n'.join([line(header), *map(line, rows), '',
+                      f'{len(tasks)} reports: {summary or "none"}'])
+
+
+def _get_parser():
+    parser = argparse.ArgumentParser(
+        prog='rri', description=__doc__.splitlines()[0],
+        epilog='\n'.join(__doc__.splitlines()[2:]),
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument('--version', action='version',
+                        version=f'%(prog)s {__version__}')
+    parser.add_argument('--credentials', metavar='CSV',
+                        default=os.environ.get('RRI_CREDENTIALS'),
+                        help='CSV of tld,rri_user,rri_pass rows, defaults '
+                             'to $RRI_CREDENTIALS')
+    parser.add_argument('--base-url', help='alternative RRI base url')
+    parser.add_argument('--workers', type=int, default=DEFAULT_POOL_SIZE,
+                        help='concurrent requests (default: %(default)s)')
+    parser.add_argument('--cache', metavar='PATH',
+                        help='SQLite cache of check results and submitted '
+                             'reports')
+    parser.add_argument('--retries', type=int, default=3,
+                        help='retries of failed requests '
+                             '(default: %(default)s)')
+    parser.add_argument('--tld', action='append', dest='tlds',
+                        help='only act on this tld, may be repeated')
+    parser.add_argument('--resource', action='append', dest='resources',
+                        choices=RESOURCE_NAMES,
+                        help='only act on this resource, may be repeated')
+
+    commands = parser.add_subparsers(dest='command', metavar='command')
+    commands.required = True
+
+    submit = commands.add_parser('submit', help='submit every report')
+    submit.add_argument('root', help='directory of reports')
+    submit.add_argument('--force', action='store_true',
+                        help='submit reports even if they are unchanged')
+    submit.add_argument('--validate', action='store_true',
+                        help='validate reports before submitting them')
+
+    check = commands.add_parser('check',
+                                help='check ICANN has received every report')
+    check.add_argument('root', help='directory of reports')
+
+    status = commands.add_parser('status',
+                                 help='show what the cache knows of every '
+                                      'report, without any requests')
+    status.add_argument('root', help='directory of reports')
+
+    return parser
+
+
+def main(argv=None):
+    parser = _get_parser()
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.root):
+        parser.error(f'{args.root} is not a directory')
+
+    if args.workers < 1:
+        parser.error('--workers must be at least 1')
+
+    tasks = scan(args.root, args.tlds, args.resources)
+    cache = CheckCache(args.cache) if args.cache else None
+
+    try:
+        if args.command == 'status':
+            if cache is None:
+                parser.error('status needs --cache')
+
+            _run(lambda task: _status(cache, task), tasks, args.workers)
+        else:
+            if not args.credentials:
+                parser.error('--credentials or $RRI_CREDENTIALS is needed')
+
+            fleet = RRIFleet.from_csv(
+                args.credentials, pool_size=args.workers,
+                base_url=args.base_url, cache=cache,
+                retry=RetryPolicy(max_retries=args.retries),
+                validate=getattr(args, 'validate', False),
+            )
+
+            with fleet:
+                if args.command == 'submit':
+                    _run(lambda task: _submit(fleet, task, args.force),
+                         tasks, args.workers)
+                else:
+                    _run(lambda task: _check(fleet, task), tasks,
+                         args.workers)
+    finally:
+        if cache is not None:
+            cache.close()
+
+    print(format_table(tasks))
+
+    return 1 if any(task.result in FAILURES for task in tasks) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
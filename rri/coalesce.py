@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import threading
+from concurrent.futures import Future
+
+
+__all__ = ['Coalescer', 'AsyncCoalescer']
+
+
+class Coalescer:
+    """
+    Share one call between threads making the same call at the same time
+
+    The first caller for a key runs the function, and callers arriving
+    with the same key while it runs wait for it and get its result, or
+    its exception, instead of running it again. Once the call finishes
+    the next caller runs the function afresh.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def call(self, key, func, *args, **kwargs):
+        """Run func, or wait for the call already running for key
+
+        :param key: hashable identifying the call
+        :param func: function to call
+        :return: the result of func
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._calls)
+
+
+class AsyncCoalescer:
+    """
+    Share one coroutine between tasks awaiting the same call at the same
+    time
+
+    Calls are shared within an event loop. The call runs in its own task,
+    so cancelling one of the callers doesn't cancel it for the others.
+    """
+    def __init__(self):
+        self._calls = {}
+
+    async def call(self, key, func, *args, **kwargs):
+        """Await func, or the call already running for key
+
+        :param key: hashable identifying the call
+        :param func: coroutine function to call
+        :return: the result of func
+        """
+        key = (asyncio.get_event_loop(), key)
+        task = self._calls.get(key)
+
+        if task is None:
+            task = asyncio.ensure_future(func(*args, **kwargs))
+            self._calls[key] = task
+
+            def forget(_):
+                if self._calls.get(key) is task:
+                    del self._calls[key]
+
+            task.add_done_callback(forget)
+
+        return await asyncio.shield(task)
+
+    def __len__(self):
+        return len(self._calls)
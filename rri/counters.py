@@ -0,0 +1,511 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime as dt, timezone
+
+from .fields import TRANSACTION_FIELDS, FUNCTION_FIELDS
+
+
+__all__ = ['EPPEvent', 'MonthlyCounters']
+
+CHECKPOINT_VERSION = 1
+DEFAULT_CHECKPOINT_INTERVAL = 60.0
+
+# Short EPP object names used in Registry Functions Activity fields
+OBJECT_NAMES = {'domain': 'dom', 'host': 'host', 'contact': 'cont'}
+
+# Net adds and renews count registrations that weren't deleted within the
+# grace period following them
+GRACE_FIELDS = {'add': 'net-adds', 'renew': 'net-renews',
+                'autorenew': 'net-renews'}
+
+
+def _month(when) -> str:
+    """Return the report month of a datetime, in UTC, or check a month
+    string
+    """
+    if isinstance(when, str):
+        return dt.strftime(dt.strptime(when, '%Y-%m'), '%Y-%m')
+
+    if when.tzinfo is not None:
+        when = when.astimezone(timezone.utc)
+
+    return dt.strftime(when, '%Y-%m')
+
+
+def _write_atomically(path, text):
+    """Replace a file's contents, leaving either the old or the new file
+    after a crash
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temporary = tempfile.mkstemp(dir=directory, prefix='.checkpoint-')
+
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+
+class EPPEvent:
+    """
+    An EPP command handled by the registry
+
+    :param time: when the command was handled, UTC if naive
+    :type time: ``datetime.datetime``
+    :param int iana_id: IANA id of the sponsoring registrar
+    :param str object: EPP object, ``domain``, ``host`` or ``contact``
+    :param str command: EPP command, e.g. ``create``, ``renew``,
+        ``transfer``, ``rgp-restore`` or ``rename``
+    :param bool success: True if the command succeeded
+    :param str op: transfer or restore operation, e.g. ``request``
+    :param int years: registration period of a domain create or renew, or
+        of the create or renew a domain delete in its grace period undoes
+    :param grace: the grace period a domain delete was within, ``add``,
+        ``renew``, ``autorenew`` or ``transfer``, True if it isn't known,
+        or False
+    :param undoes: when the create or renew a domain delete in its grace
+        period undoes was handled, or the month of it, if it isn't in the
+        month of the delete
+    :type undoes: ``datetime.datetime`` or ``str``
+    """
+    __slots__ = ('time', 'iana_id', 'object', 'command', 'success', 'op',
+                 'years', 'grace', 'undoes')
+
+    def __init__(self, time, iana_id, object, command, success=True,
+                 op=None, years=None, grace=False, undoes=None):
+        self.time = time
+        self.iana_id = iana_id
+        self.object = object
+        self.command = command
+        self.success = success
+        self.op = op
+        self.years = years
+        self.grace = grace
+        self.undoes = undoes
+
+    def function_field(self):
+        """Return the Registry Functions Activity field counting the event,
+        or None
+        """
+        name = OBJECT_NAMES.get(self.object)
+        if name is None:
+            return None
+
+        parts = ['srs', name, self.command]
+        if self.op and self.command in ('transfer', 'rgp-restore'):
+            parts.append(self.op)
+
+        return '-'.join(parts)
+
+    def transaction_fields(self):
+        """Return the Per-Registrar Transactions fields counting the event
+
+        Domain creates count as attempted adds, and successful creates,
+        renews, deletes and restore requests count towards net adds, net
+        renews, deleted and restored domains. Transfers, AGP exemptions and
+        totals need knowledge of other registrars or of the registry, and
+        are left to ``MonthlyCounters.add_transaction()``.
+        """
+        if self.object != 'domain':
+            return []
+
+        fields = []
+        if self.command == 'create':
+            fields.append('attempted-adds')
+
+        if not self.success:
+            return fields
+
+        if self.command == 'create' and self.years:
+            fields.append(f'net-adds-{self.years}-yr')
+        elif self.command == 'renew' and self.years:
+            fields.append(f'net-renews-{self.years}-yr')
+        elif self.command == 'delete':
+            fields.append('deleted-domains-grace' if self.grace
+                          else 'deleted-domains-nograce')
+        elif self.command == 'rgp-restore' and self.op == 'request':
+            fields.append('restored-domains')
+
+        return fields
+
+    def reversed_fields(self):
+        """Return the Per-Registrar Transactions fields the event takes
+        one off
+
+        A domain deleted within its add, renew or auto-renew grace period
+        no longer counts towards the net adds or net renews of its
+        registration period.
+        """
+        if self.object != 'domain' or self.command != 'delete' or \
+                not self.success or not self.years:
+            return []
+
+        field = GRACE_FIELDS.get(self.grace)
+        if field is None:
+            return []
+
+        return [f'{field}-{self.years}-yr']
+
+    def __repr__(self):
+        return f'EPPEvent({self.iana_id} {self.object}:{self.command} ' \
+            f'{self.time:%Y-%m-%d %H:%M:%S})'
+
+
+class _Month:
+    """Counters for one report month"""
+    __slots__ = ('transactions', 'functions')
+
+    def __init__(self, function_count):
+        self.transactions = {}
+        self.functions = [0] * function_count
+
+
+class MonthlyCounters:
+    """
+    Per-registrar and per-function report counters kept up to date as
+    EPP events happen
+
+    Events are added with ``record()`` as the registry handles them, so at
+    any moment the Per-Registrar Transactions and Registry Functions
+    Activity CSVs for a month can be produced from the counters, in time
+    proportional to the number of registrars, rather than by rescanning a
+    month of logs. The CSVs are produced by ``rri.reports``, which needs
+    numpy, while counting doesn't.
+
+    With a ``path`` the counters are checkpointed to a JSON file at most
+    every ``checkpoint_interval`` seconds, replacing it atomically, and
+    loaded from it when created. Pass the position of each event in its
+    source, e.g. a log offset, and read ``position`` after a restart to
+    resume from the last checkpoint without counting events twice.
+
+    :param str path: path to the checkpoint file
+    :param registrars: mapping of IANA id to registrar name
+    :param float checkpoint_interval: seconds between checkpoints
+    :param transaction_fields: Per-Registrar Transactions fields after
+        ``registrar-name`` and ``iana-id``
+    :param function_fields: Registry Functions Activity fields
+    """
+    def __init__(self, path=None, registrars=None,
+                 checkpoint_interval=DEFAULT_CHECKPOINT_INTERVAL,
+                 transaction_fields=TRANSACTION_FIELDS,
+                 function_fields=FUNCTION_FIELDS):
+        self.path = path
+        self.registrars = dict(registrars or {})
+        self.checkpoint_interval = checkpoint_interval
+        self.transaction_fields = tuple(transaction_fields)
+        self.function_fields = tuple(function_fields)
+        self.position = None
+
+        self._transaction_index = {
+            field: i for i, field in enumerate(self.transaction_fields)
+        }
+        self._function_index = {
+            field: i for i, field in enumerate(self.function_fields)
+        }
+        self._months = {}
+        self._lock = threading.RLock()
+        self._last_checkpoint = time.monotonic()
+
+        if path and os.path.exists(path):
+            self._load()
+
+    def _get_month(self, month):
+        try:
+            return self._months[month]
+        except KeyError:
+            counters = self._months[month] = _Month(len(self.function_fields))
+            return counters
+
+    def _registrar(self, counters, iana_id):
+        try:
+            return counters.transactions[iana_id]
+        except KeyError:
+            row = counters.transactions[iana_id] = \
+                [0] * len(self.transaction_fields)
+            return row
+
+    def _transaction_field(self, field):
+        try:
+            return self._transaction_index[field]
+        except KeyError:
+            raise ValueError(f'Unknown report field {field}') from None
+
+    def _function_field(self, field):
+        try:
+            return self._function_index[field]
+        except KeyError:
+            raise ValueError(f'Unknown report field {field}') from None
+
+    def record(self, event, position=None):
+        """Count an EPP event
+
+        Commands without a report field, e.g. ``poll``, aren't counted.
+        Deletes within a grace period are taken off the net adds or renews
+        of the month of the create or renew they undo, given by the event's
+        ``undoes`` or else the month of the delete. Counters never go below
+        zero, and nothing is taken off a month that has been discarded.
+
+        :param event: ``EPPEvent``
+        :param position: position of the event in its source, saved with
+            the next checkpoint
+        """
+        month = _month(event.time)
+        function = event.function_field()
+        transactions = event.transaction_fields()
+        reversals = event.reversed_fields()
+        undone = _month(event.undoes) if event.undoes else month
+
+        with self._lock:
+            counters = self._get_month(month)
+
+            index = self._function_index.get(function)
+            if index is not None:
+                counters.functions[index] += 1
+
+            if transactions:
+                row = self._registrar(counters, event.iana_id)
+                for field in transactions:
+                    index = self._transaction_index.get(field)
+                    if index is not None:
+                        row[index] += 1
+
+            undone_counters = self._months.get(undone)
+            if reversals and undone_counters is not None:
+                row = undone_counters.transactions.get(event.iana_id)
+                for field in reversals:
+                    index = self._transaction_index.get(field)
+                    if row is not None and index is not None and \
+                            row[index] > 0:
+                        row[index] -= 1
+
+            if position is not None:
+                self.position = position
+
+            self._maybe_checkpoint()
+
+    def add_transaction(self, month, iana_id, field, count=1):
+        """Add to a registrar's Per-Registrar Transactions counter
+
+        :param month: report month, or a datetime within it
+        :type month: ``str`` or ``datetime.datetime``
+        :param int iana_id: registrar IANA id
+        :param str field: report field
+        :param int count: amount to add
+        """
+        index = self._transaction_field(field)
+
+        with self._lock:
+            row = self._registrar(self._get_month(_month(month)), iana_id)
+            row[index] += count
+            self._maybe_checkpoint()
+
+    def set_transaction(self, month, iana_id, field, value):
+        """Set a registrar's counter that isn't derived from events, e.g.
+        ``total-domains``
+        """
+        index = self._transaction_field(field)
+
+        with self._lock:
+            row = self._registrar(self._get_month(_month(month)), iana_id)
+            row[index] = value
+            self._maybe_checkpoint()
+
+    def add_function(self, month, field, count=1):
+        """Add to a Registry Functions Activity counter
+
+        :param month: report month, or a datetime within it
+        :type month: ``str`` or ``datetime.datetime``
+        :param str field: report field
+        :param int count: amount to add
+        """
+        index = self._function_field(field)
+
+        with self._lock:
+            self._get_month(_month(month)).functions[index] += count
+            self._maybe_checkpoint()
+
+    def set_function(self, month, field, value):
+        """Set a counter that isn't derived from events, e.g.
+        ``dns-udp-queries-received``
+        """
+        index = self._function_field(field)
+
+        with self._lock:
+            self._get_month(_month(month)).functions[index] = value
+            self._maybe_checkpoint()
+
+    def months(self):
+        """Return the months with counters, oldest first"""
+        with self._lock:
+            return sorted(self._months)
+
+    def discard(self, month):
+        """Forget a month's counters, e.g. once its reports are accepted
+
+        :param month: report month
+        :type month: ``str`` or ``datetime.datetime``
+        """
+        with self._lock:
+            self._months.pop(_month(month), None)
+            self._maybe_checkpoint()
+
+    def transactions_report(self, month):
+        """Return a month's counters as a Per-Registrar Transactions report
+
+        Producing reports needs numpy, counting events doesn't.
+
+        :param month: report month
+        :type month: ``str`` or ``datetime.datetime``
+        :rtype: ``rri.reports.TransactionsReport``
+        """
+        from .reports import TransactionsReport
+
+        report = TransactionsReport(self.registrars, self.transaction_fields)
+        width = len(self.transaction_fields)
+
+        with self._lock:
+            counters = self._months.get(_month(month))
+            rows = {iana_id: list(row) for iana_id, row
+                    in counters.transactions.items()} if counters else {}
+
+        if rows:
+            report.add([iana_id for iana_id in rows for _ in range(width)],
+                       list(range(width)) * len(rows),
+                       [value for row in rows.values() for value in row])
+
+        return report
+
+    def functions_report(self, month):
+        """Return a month's counters as a Registry Functions Activity report
+
+        :param month: report month
+        :type month: ``str`` or ``datetime.datetime``
+        :rtype: ``rri.reports.FunctionsReport``
+        """
+        from .reports import FunctionsReport
+
+        report = FunctionsReport(self.function_fields)
+        report.add(list(range(len(self.function_fields))),
+                   self.function_values(month))
+
+        return report
+
+    def transaction_rows(self, month):
+        """Return the Per-Registrar Transactions lines of a month, including
+        the totals line
+
+        :param month: report month
+        :type month: ``str`` or ``datetime.datetime``
+        :rtype: ``list``
+        """
+        return list(self.transactions_report(month).rows())
+
+    def function_values(self, month):
+        """Return the Registry Functions Activity counters of a month
+
+        :param month: report month
+        :type month: ``str`` or ``datetime.datetime``
+        :rtype: ``list``
+        """
+        with self._lock:
+            counters = self._months.get(_month(month))
+            if counters is None:
+                return [0] * len(self.function_fields)
+
+            return list(counters.functions)
+
+    def iter_transactions_csv(self, month):
+        """Iterate over a month's Per-Registrar Transactions CSV in ``bytes``
+        chunks
+        """
+        return self.transactions_report(month).iter_csv()
+
+    def iter_functions_csv(self, month):
+        """Iterate over a month's Registry Functions Activity CSV in
+        ``bytes`` chunks
+        """
+        return self.functions_report(month).iter_csv()
+
+    def submit_transactions(self, resource, month):
+        """Stream a month's report to a ``PerRegistrarTransactions``
+        resource
+
+        :param resource: e.g. ``RRIClient.transactions``
+        :param str month: report month
+        :return: ``RRIResponse``
+        """
+        return self.transactions_report(month).submit(resource,
+                                                      _month(month))
+
+    def submit_functions(self, resource, month):
+        """Stream a month's report to a ``RegistryFunctions`` resource
+
+        :param resource: e.g. ``RRIClient.functions``
+        :param str month: report month
+        :return: ``RRIResponse``
+        """
+        return self.functions_report(month).submit(resource, _month(month))
+
+    def _maybe_checkpoint(self):
+        if self.path and time.monotonic() - self._last_checkpoint >= \
+                self.checkpoint_interval:
+            self.checkpoint()
+
+    def checkpoint(self):
+        """Write the counters to the checkpoint file now"""
+        if not self.path:
+            raise ValueError('MonthlyCounters has no checkpoint path')
+
+        with self._lock:
+            state = dict(
+                version=CHECKPOINT_VERSION,
+                position=self.position,
+                transaction_fields=self.transaction_fields,
+                function_fields=self.function_fields,
+                months={
+                    month: dict(
+                        # JSON keys are strings, so keep ids as values
+                        transactions=[[iana_id, row] for iana_id, row
+                                      in counters.transactions.items()],
+                        functions=counters.functions,
+                    )
+                    for month, counters in self._months.items()
+                },
+            )
+            # Written under the lock so that an older state can't replace
+            # a newer one
+            _write_atomically(self.path,
+                              json.dumps(state, separators=(',', ':')))
+            self._last_checkpoint = time.monotonic()
+
+    def _load(self):
+        with open(self.path, encoding='utf-8') as f:
+            state = json.load(f)
+
+        if state.get('version') != CHECKPOINT_VERSION:
+            raise ValueError(f'Unsupported checkpoint version in {self.path}')
+
+        if tuple(state['transaction_fields']) != self.transaction_fields or \
+                tuple(state['function_fields']) != self.function_fields:
+            raise ValueError(f'Checkpoint {self.path} has different fields')
+
+        self.position = state['position']
+
+        for month, saved in state['months'].items():
+            counters = self._get_month(month)
+            counters.transactions = {iana_id: row for iana_id, row
+                                     in saved['transactions']}
+            counters.functions = saved['functions']
+
+    def __repr__(self):
+        return f'MonthlyCounters("{self.path or ""}", ' \
+            f'{len(self._months)} months)'
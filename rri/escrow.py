@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+from xml.sax.saxutils import escape, quoteattr
+
+from .rri import RRIResponse
+
+
+__all__ = ['DepositSummary', 'read_deposit', 'read_report_watermark',
+           'submit_deposit']
+
+RDE_NS = 'urn:ietf:params:xml:ns:rde-1.0'
+RDE_HEADER_NS = 'urn:ietf:params:xml:ns:rdeHeader-1.0'
+RDE_REPORT_NS = 'urn:ietf:params:xml:ns:rdeReport-1.0'
+
+RYDE_SPEC_ESCROW = 'RFC8909'
+RYDE_SPEC_MAPPING = 'RFC9022'
+
+
+def _tag(namespace, name):
+    return f'{{{namespace}}}{name}'
+
+
+def _namespace(tag):
+    return tag[1:].partition('}')[0] if tag.startswith('{') else ''
+
+
+class DepositSummary:
+    """
+    Metadata and object counts of an RDE deposit
+
+    ``header_counts`` are the counts in the deposit's own rdeHeader, while
+    ``counts`` and ``deletes`` are the objects found in its contents and
+    deletes, keyed by the object namespace URI.
+    """
+    def __init__(self):
+        self.id = None
+        self.kind = None
+        self.resend = 0
+        self.prev_id = None
+        self.watermark = None
+        self.tld = None
+        self.header_counts = {}
+        self.counts = {}
+        self.deletes = {}
+
+    def to_report(self, created=None, ryde_spec_escrow=RYDE_SPEC_ESCROW,
+                  ryde_spec_mapping=RYDE_SPEC_MAPPING) -> str:
+        """Build the escrow report XML for ``EscrowReport.submit``
+
+        The report header repeats the deposit's rdeHeader counts, or the
+        counted contents if the deposit has no header. Incremental and
+        differential deposits are both reported as INCR.
+
+        :param created: creation time of the report, now if None
+        :type created: ``datetime.datetime``
+        :param str ryde_spec_escrow: escrow format specification
+        :param str ryde_spec_mapping: mapping specification
+        :rtype: ``str``
+        """
+        if created is None:
+            created = datetime.now(timezone.utc)
+        if created.tzinfo is None:
+            created = created.replace(tzinfo=timezone.utc)
+
+        created = created.astimezone(timezone.utc) \
+            .strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+        kind = 'FULL' if self.kind == 'FULL' else 'INCR'
+        counts = self.header_counts or self.counts
+
+        def element(name, value):
+            return f'  <rdeReport:{name}>{escape(str(value))}' \
+                f'</rdeReport:{name}>'
+
+        lines = [
+            '<?xml version="1.0" encoding="UTF-8"?>',
+            f'<rdeReport:report xmlns:rdeReport="{RDE_REPORT_NS}"',
+            f'  xmlns:rdeHeader="{RDE_HEADER_NS}">',
+            element('id', self.id),
+            element('version', 1),
+            element('rydeSpecEscrow', ryde_spec_escrow),
+            element('rydeSpecMapping', ryde_spec_mapping),
+            element('resend', self.resend),
+            element('crDate', created),
+            element('kind', kind),
+            element('watermark', self.watermark),
+            '  <rdeHeader:header>',
+            f'    <rdeHeader:tld>{escape(self.tld or "")}</rdeHeader:tld>',
+            *(f'    <rdeHeader:count uri={quoteattr(uri)}>{count}'
+              f'</rdeHeader:count>' for uri, count in counts.items()),
+            '  </rdeHeader:header>',
+            '</rdeReport:report>',
+        ]
+
+        return '\n'.join(lines) + '\n'
+
+    def __repr__(self):
+        return f'DepositSummary(id={self.id!r}, kind={self.kind!r}, ' \
+            f'tld={self.tld!r})'
+
+
+def read_deposit(source) -> DepositSummary:
+    """Read an RDE deposit with constant memory
+
+    The deposit is parsed incrementally and each object is discarded once
+    counted, so memory use doesn't depend on the size of the deposit.
+
+    :param source: path or binary file of the decrypted deposit XML
+    :return: ``DepositSummary``
+    """
+    summary = DepositSummary()
+
+    contents = _tag(RDE_NS, 'contents')
+    deletes = _tag(RDE_NS, 'deletes')
+    header = _tag(RDE_HEADER_NS, 'header')
+
+    stack = []
+
+    for event, element in ET.iterparse(source, events=('start', 'end')):
+        if event == 'start':
+            if not stack:
+                if element.tag != _tag(RDE_NS, 'deposit'):
+                    raise ValueError(f'Not an RDE deposit: {element.tag}')
+
+                summary.id = element.get('id')
+                summary.kind = element.get('type')
+                summary.resend = int(element.get('resend', 0))
+                summary.prev_id = element.get('prevId')
+
+            stack.append(element)
+            continue
+
+        stack.pop()
+        parent = stack[-1] if stack else None
+
+        if parent is None:
+            break
+
+        if len(stack) == 1 and element.tag == _tag(RDE_NS, 'watermark'):
+            summary.watermark = (element.text or '').strip()
+
+        elif parent.tag == header:
+            if element.tag == _tag(RDE_HEADER_NS, 'tld'):
+                summary.tld = (element.text or '').strip()
+            elif element.tag == _tag(RDE_HEADER_NS, 'count'):
+                summary.header_counts[element.get('uri')] = \
+                    int((element.text or '0').strip())
+
+        elif parent.tag in (contents, deletes) and element.tag != header:
+            counts = summary.counts if parent.tag == contents \
+                else summary.deletes
+            uri = _namespace(element.tag)
+            counts[uri] = counts.get(uri, 0) + 1
+
+            # Drop the object now it's counted
+            parent.clear()
+
+    if summary.id is None:
+        raise ValueError('Deposit has no id')
+
+    return summary
+
+
+def read_report_watermark(source):
+    """Read the watermark of an escrow report, the time of its deposit
+
+    Parsing stops at the watermark, so the rest of the report isn't read.
+
+    :param source: path or binary file of the escrow report XML
+    :return: the watermark, or None if the report has none
+    :rtype: ``str``
+    :raises ValueError: if the source isn't an escrow report
+    """
+    watermark = _tag(RDE_REPORT_NS, 'watermark')
+    depth = 0
+
+    try:
+        for event, element in ET.iterparse(source, events=('start', 'end')):
+            if event == 'start':
+                if not depth and element.tag != _tag(RDE_REPORT_NS,
+                                                     'report'):
+                    raise ValueError(f'Not an escrow report: {element.tag}')
+                depth += 1
+                continue
+
+            depth -= 1
+            if depth == 1 and element.tag == watermark:
+                return (element.text or '').strip() or None
+    except ET.ParseError as e:
+        raise ValueError(f'Invalid escrow report: {e}') from None
+
+    return None
+
+
+def submit_deposit(resource, source) -> RRIResponse:
+    """Build the escrow report for a deposit and submit it
+
+    :param resource: ``RRIClient.report``
+    :param source: path or binary file of the decrypted deposit XML
+    :return: ``RRIResponse``
+    """
+    summary = read_deposit(source)
+    if summary.tld is None:
+        summary.tld = resource.tld
+
+    return resource.submit(summary.to_report(), summary.id)
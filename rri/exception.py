@@ -38,3 +38,36 @@ class NotImplemented(RRIException):
 class UnknownStatus(RRIException):
     """Unknown HTTP response"""
     pass
+
+
+class InvalidReport(RRIException):
+    """Report failed validation before being submitted"""
+    def __init__(self, errors):
+        self.errors = list(errors)
+        super().__init__('; '.join(str(error) for error in self.errors))
+
+
+class CircuitOpen(RRIException):
+    """Request not sent because its endpoint has been failing"""
+    def __init__(self, key, retry_after=None):
+        self.key = key
+        self.retry_after = retry_after
+        message = f'Circuit open for {key}'
+        if retry_after is not None:
+            message += f', retry in {retry_after:.1f}s'
+        super().__init__(message)
+
+
+class TransportError(RRIException):
+    """Request couldn't be completed, the cause is chained to it"""
+    pass
+
+
+class ConnectionFailed(TransportError):
+    """Connecting to the RRI failed, or the connection was dropped"""
+    pass
+
+
+class RequestTimeout(TransportError):
+    """The RRI didn't accept the connection or respond in time"""
+    pass
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+
+
+__all__ = ['TRANSACTION_FIELDS', 'FUNCTION_FIELDS']
+
+# Per-Registrar Transactions report fields after registrar-name and iana-id
+TRANSACTION_FIELDS = (
+    'total-domains',
+    'total-nameservers',
+    *(f'net-adds-{n}-yr' for n in range(1, 11)),
+    *(f'net-renews-{n}-yr' for n in range(1, 11)),
+    'transfer-gaining-successful',
+    'transfer-gaining-nacked',
+    'transfer-losing-successful',
+    'transfer-losing-nacked',
+    'transfer-disputed-won',
+    'transfer-disputed-lost',
+    'transfer-disputed-nodecision',
+    'deleted-domains-grace',
+    'deleted-domains-nograce',
+    'restored-domains',
+    'restored-noreport',
+    'agp-exemption-requests',
+    'agp-exemptions-granted',
+    'agp-exempted-domains',
+    'attempted-adds',
+)
+
+FUNCTION_FIELDS = (
+    'operational-registrars',
+    'zfa-passwords',
+    'whois-43-queries',
+    'web-whois-queries',
+    'searchable-whois-queries',
+    'dns-udp-queries-received',
+    'dns-udp-queries-responded',
+    'dns-tcp-queries-received',
+    'dns-tcp-queries-responded',
+    'srs-dom-check',
+    'srs-dom-create',
+    'srs-dom-delete',
+    'srs-dom-info',
+    'srs-dom-renew',
+    'srs-dom-rgp-restore-report',
+    'srs-dom-rgp-restore-request',
+    'srs-dom-transfer-approve',
+    'srs-dom-transfer-cancel',
+    'srs-dom-transfer-query',
+    'srs-dom-transfer-reject',
+    'srs-dom-transfer-request',
+    'srs-dom-update',
+    'srs-host-check',
+    'srs-host-create',
+    'srs-host-delete',
+    'srs-host-info',
+    'srs-host-rename',
+    'srs-host-update',
+    'srs-cont-check',
+    'srs-cont-create',
+    'srs-cont-delete',
+    'srs-cont-info',
+    'srs-cont-transfer-approve',
+    'srs-cont-transfer-cancel',
+    'srs-cont-transfer-query',
+    'srs-cont-transfer-reject',
+    'srs-cont-transfer-request',
+    'srs-cont-update',
+)
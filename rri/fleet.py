@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+import csv
+import threading
+
+from .rri import RRIClient, as_transport, create_transport, \
+    DEFAULT_POOL_SIZE
+
+
+__all__ = ['RRIFleet']
+
+
+class RRIFleet:
+    """
+    Collection of RRIClient objects sharing a single connection pool
+
+    Clients are built on first access, and every client uses the same
+    transport so connections to the RRI host are reused across tlds.
+
+    :param credentials: mapping of tld to ``(rri_user, rri_pass)``, or an
+        iterable of ``(tld, rri_user, rri_pass)``
+    :param int pool_size: maximum number of pooled connections
+    :param client: alternative ``rri.transport.Transport``, or
+        ``requests.Session``, shared by every tld
+    :param str base_url: alternative base url
+    :param cache: cache of check results shared by every tld
+    :type cache: ``rri.cache.CheckCache``
+    :param retry: retry policy shared by every tld, so that its retry
+        budget covers the whole fleet
+    :type retry: ``rri.retry.RetryPolicy``
+    :param hooks: callables passed an ``rri.metrics.RRIEvent`` after each
+        request for any tld
+    :param bool validate: validate reports locally before submitting them
+    :param breaker: circuit breaker shared by every tld
+    :type breaker: ``rri.breaker.CircuitBreaker``
+    """
+    def __init__(self, credentials=None, pool_size=DEFAULT_POOL_SIZE,
+                 client=None, base_url=None, cache=None, retry=None,
+                 hooks=None, validate=False, breaker=None):
+        self.pool_size = pool_size
+        self.base_url = base_url
+        self.cache = cache
+        self.retry = retry
+        self.hooks = list(hooks) if hooks else []
+        self.validate = validate
+        self.breaker = breaker
+        self.client = as_transport(client) if client \
+            else create_transport(pool_size)
+
+        self._credentials = {}
+        self._clients = {}
+        self._lock = threading.Lock()
+
+        if credentials:
+            if hasattr(credentials, 'items'):
+                credentials = ((tld, user, password)
+                               for tld, (user, password)
+                               in credentials.items())
+
+            for tld, rri_user, rri_pass in credentials:
+                self.add(tld, rri_user, rri_pass)
+
+    @classmethod
+    def from_csv(cls, path, **kwargs):
+        """Load a fleet from a CSV file of ``tld,rri_user,rri_pass`` rows
+
+        :param str path: path to the CSV file
+        :return: ``RRIFleet``
+        """
+        with open(path, newline='') as f:
+            rows = [row for row in csv.reader(f)
+                    if row and not row[0].startswith('#')]
+
+        return cls(((tld.strip(), user.strip(), password.strip())
+                    for tld, user, password in rows), **kwargs)
+
+    def add(self, tld, rri_user, rri_pass):
+        """Add or replace the credentials for a tld
+
+        :param str tld: tld to query
+        :param str rri_user: tld username
+        :param str rri_pass: tld password
+        """
+        with self._lock:
+            self._credentials[tld] = (rri_user, rri_pass)
+            self._clients.pop(tld, None)
+
+    def __getitem__(self, tld) -> RRIClient:
+        with self._lock:
+            try:
+                return self._clients[tld]
+            except KeyError:
+                rri_user, rri_pass = self._credentials[tld]
+
+            rric = RRIClient(tld, rri_user, rri_pass,
+                             client=self.client, base_url=self.base_url,
+                             cache=self.cache, retry=self.retry,
+                             hooks=self.hooks, validate=self.validate,
+                             breaker=self.breaker)
+            self._clients[tld] = rric
+
+            return rric
+
+    def get(self, tld, default=None):
+        try:
+            return self[tld]
+        except KeyError:
+            return default
+
+    def __contains__(self, tld):
+        return tld in self._credentials
+
+    def __iter__(self):
+        return iter(list(self._credentials))
+
+    def __len__(self):
+        return len(self._credentials)
+
+    def clients(self):
+        """Iterate over a client for every tld, building them as needed"""
+        for tld in self:
+            yield self[tld]
+
+    def close(self):
+        """Close the shared connection pool"""
+        self.client.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __repr__(self):
+        return f'RRIFleet({len(self)} tlds, pool_size={self.pool_size})'
@@ -0,0 +1,472 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+
+__all__ = ['LeaseBackend', 'SQLiteLeaseBackend', 'FileLeaseBackend',
+           'Lease', 'Partitioner', 'LeaseCoordinator']
+
+DEFAULT_TTL = 300.0
+
+
+def _default_owner():
+    return f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+
+
+class LeaseBackend:
+    """
+    Storage of leases shared by every worker
+
+    A lease is held by one owner until it expires, is released, or is
+    completed. A completed lease is never granted again until it's reset,
+    so work that's done isn't done twice. Times are UNIX timestamps, so
+    workers on different nodes need reasonably synchronised clocks.
+    """
+    def acquire(self, key, owner, ttl) -> bool:
+        """Take a lease that's free, expired or already held by owner
+
+        :param str key: work key
+        :param str owner: worker taking the lease
+        :param float ttl: seconds until the lease expires
+        :return: True if owner now holds the lease
+        """
+        raise NotImplementedError
+
+    def renew(self, key, owner, ttl) -> bool:
+        """Extend a lease held by owner
+
+        :return: True if owner still holds the lease
+        """
+        raise NotImplementedError
+
+    def release(self, key, owner):
+        """Give up a lease held by owner, letting another worker take it"""
+        raise NotImplementedError
+
+    def complete(self, key, owner) -> bool:
+        """Mark the work of a lease held by owner as done
+
+        :return: True if owner held the lease
+        """
+        raise NotImplementedError
+
+    def reset(self, key):
+        """Forget a lease, completed or not, so the work can be done again"""
+        raise NotImplementedError
+
+    def holder(self, key):
+        """Return ``(owner, expires)`` of a lease, expires being None once
+        the work is complete, or None if nobody holds it
+        """
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class SQLiteLeaseBackend(LeaseBackend):
+    """
+    Leases kept in SQLite, shared by every process given the same ``path``
+
+    Suits workers on one host, or on nodes sharing a filesystem with
+    working locks. Without a path leases are only shared by the threads of
+    this process.
+
+    :param str path: path to the SQLite database, created if missing
+    :param float timeout: seconds to wait for another process's lock
+    """
+    def __init__(self, path=None, timeout=30.0):
+        self.path = path
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path or ':memory:', timeout=timeout,
+                                   isolation_level=None,
+                                   check_same_thread=False)
+
+        with self._lock:
+            if path:
+                self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS lease ('
+                '  key TEXT PRIMARY KEY,'
+                '  owner TEXT NOT NULL,'
+                '  expires REAL'
+                ')'
+            )
+
+    def acquire(self, key, owner, ttl) -> bool:
+        now = time.time()
+
+        with self._lock:
+            cursor = self._db.execute(
+                'INSERT INTO lease VALUES (?, ?, ?) '
+                'ON CONFLICT (key) DO UPDATE SET '
+                '  owner = excluded.owner, expires = excluded.expires '
+                'WHERE lease.expires IS NOT NULL '
+                '  AND (lease.expires <= ? OR lease.owner = excluded.owner)',
+                (key, owner, now + ttl, now)
+            )
+
+        return cursor.rowcount == 1
+
+    def renew(self, key, owner, ttl) -> bool:
+        with self._lock:
+            cursor = self._db.execute(
+                'UPDATE lease SET expires = ? WHERE key = ? AND owner = ? '
+                'AND expires IS NOT NULL',
+                (time.time() + ttl, key, owner)
+            )
+
+        return cursor.rowcount == 1
+
+    def release(self, key, owner):
+        with self._lock:
+            self._db.execute(
+                'DELETE FROM lease WHERE key = ? AND owner = ? '
+                'AND expires IS NOT NULL', (key, owner)
+            )
+
+    def complete(self, key, owner) -> bool:
+        with self._lock:
+            cursor = self._db.execute(
+                'UPDATE lease SET expires = NULL WHERE key = ? AND owner = ?',
+                (key, owner)
+            )
+
+        return cursor.rowcount == 1
+
+    def reset(self, key):
+        with self._lock:
+            self._db.execute('DELETE FROM lease WHERE key = ?', (key,))
+
+    def holder(self, key):
+        with self._lock:
+            row = self._db.execute(
+                'SELECT owner, expires FROM lease WHERE key = ?', (key,)
+            ).fetchone()
+
+        if row is None or (row[1] is not None and row[1] <= time.time()):
+            return None
+
+        return row
+
+    def close(self):
+        self._db.close()
+
+    def __repr__(self):
+        return f'SQLiteLeaseBackend("{self.path or ":memory:"}")'
+
+
+class FileLeaseBackend(LeaseBackend):
+    """
+    Leases kept in one small file per key, guarded by ``flock``
+
+    Suits workers on one host, or on nodes sharing a filesystem whose
+    ``flock`` works across nodes. Needs a POSIX system.
+
+    :param str directory: directory of the lease files, created if missing
+    """
+    def __init__(self, directory):
+        if fcntl is None:
+            raise OSError('FileLeaseBackend needs fcntl, use '
+                          'SQLiteLeaseBackend on this system')
+
+        self.directory = os.fspath(directory)
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key):
+        name = hashlib.sha256(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, f'{name}.lease')
+
+    def _update(self, key, change):
+        """Read a lease file under an exclusive lock, writing the state
+        returned by change(state) if it isn't the state read
+        """
+        # Lease files are emptied rather than removed, so every process
+        # locks the same file
+        fd = os.open(self._path(key), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+
+            with os.fdopen(os.dup(fd), 'r+', encoding='utf-8') as f:
+                text = f.read()
+                state = json.loads(text) if text else None
+                updated = change(state)
+
+                if updated is not state:
+                    f.seek(0)
+                    f.truncate()
+                    if updated is not None:
+                        f.write(json.dumps(updated))
+                    f.flush()
+                    os.fsync(f.fileno())
+
+            return updated
+        finally:
+            os.close(fd)
+
+    def acquire(self, key, owner, ttl) -> bool:
+        now = time.time()
+
+        def change(state):
+            if state is None or (state['expires'] is not None and (
+                    state['expires'] <= now or state['owner'] == owner)):
+                return dict(key=key, owner=owner, expires=now + ttl)
+            return state
+
+        state = self._update(key, change)
+        return state['owner'] == owner and state['expires'] is not None
+
+    def renew(self, key, owner, ttl) -> bool:
+        def change(state):
+            if state and state['owner'] == owner and \
+                    state['expires'] is not None:
+                return dict(state, expires=time.time() + ttl)
+            return state
+
+        state = self._update(key, change)
+        return bool(state) and state['owner'] == owner and \
+            state['expires'] is not None
+
+    def release(self, key, owner):
+        def change(state):
+            if state and state['owner'] == owner and \
+                    state['expires'] is not None:
+                return None
+            return state
+
+        self._update(key, change)
+
+    def complete(self, key, owner) -> bool:
+        def change(state):
+            if state and state['owner'] == owner:
+                return dict(state, expires=None)
+            return state
+
+        state = self._update(key, change)
+        return bool(state) and state['owner'] == owner
+
+    def reset(self, key):
+        self._update(key, lambda state: None)
+
+    def holder(self, key):
+        state = self._update(key, lambda state: state)
+
+        if state is None:
+            return None
+
+        expires = state['expires']
+        if expires is not None and expires <= time.time():
+            return None
+
+        return state['owner'], expires
+
+    def __repr__(self):
+        return f'FileLeaseBackend("{self.directory}")'
+
+
+class Lease:
+    """
+    A lease held on a piece of work
+
+    While ``keepalive`` is set the lease is renewed every third of its
+    ttl in a background thread, so a long upload keeps it. ``lost`` is set
+    if a renewal fails because another worker took it over. Used as a
+    context manager the lease is released on exit unless it was completed.
+
+    :param backend: ``LeaseBackend``
+    :param str key: work key
+    :param str owner: worker holding the lease
+    :param float ttl: seconds the lease lasts without renewal
+    :param bool keepalive: renew the lease in the background
+    """
+    def __init__(self, backend, key, owner, ttl=DEFAULT_TTL,
+                 keepalive=True):
+        self.backend = backend
+        self.key = key
+        self.owner = owner
+        self.ttl = ttl
+        self.lost = False
+        self.completed = False
+
+        self._stopped = threading.Event()
+        self._thread = None
+        if keepalive:
+            self._thread = threading.Thread(target=self._keepalive,
+                                            daemon=True)
+            self._thread.start()
+
+    def _keepalive(self):
+        while not self._stopped.wait(self.ttl / 3):
+            if not self.renew():
+                self.lost = True
+                return
+
+    def _stop(self):
+        self._stopped.set()
+        if self._thread is not None and \
+                self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def renew(self) -> bool:
+        return self.backend.renew(self.key, self.owner, self.ttl)
+
+    def release(self):
+        """Let another worker take the work"""
+        self._stop()
+        self.backend.release(self.key, self.owner)
+
+    def complete(self) -> bool:
+        """Mark the work done so no worker takes it again"""
+        self._stop()
+        self.completed = self.backend.complete(self.key, self.owner)
+        return self.completed
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        if not self.completed:
+            self.release()
+
+    def __repr__(self):
+        return f'Lease({self.key!r}, {self.owner!r})'
+
+
+class Partitioner:
+    """
+    Assign work keys to workers by rendezvous hashing
+
+    Each key goes to the worker with the highest hash of the worker and
+    the key, so every worker agrees without talking to the others, and
+    adding or removing a worker only moves the keys it gains or loses.
+
+    :param workers: names of every worker, or their number
+    :type workers: iterable of ``str``, or ``int``
+    :param worker: name, or index, of this worker
+    """
+    def __init__(self, workers, worker):
+        if isinstance(workers, int):
+            workers = range(workers)
+
+        self.workers = [str(name) for name in workers]
+        self.worker = str(worker)
+
+        if self.worker not in self.workers:
+            raise ValueError(f'Unknown worker {worker}')
+
+    @staticmethod
+    def _score(worker, key):
+        digest = hashlib.blake2b(f'{worker}\0{key}'.encode('utf-8'),
+                                 digest_size=8).digest()
+        return int.from_bytes(digest, 'big')
+
+    def owner(self, key) -> str:
+        """Return the worker assigned a key"""
+        return max(self.workers, key=lambda worker: self._score(worker, key))
+
+    def owns(self, key) -> bool:
+        """Return True if this worker is assigned a key"""
+        return self.owner(key) == self.worker
+
+    def __repr__(self):
+        return f'Partitioner({self.worker!r} of {len(self.workers)})'
+
+
+class LeaseCoordinator:
+    """
+    Make sure each report is submitted by only one of many workers
+
+    A worker submits a report only if the partitioner assigns it the
+    report's (tld, resource, period), or if it's taking over, and only
+    while it holds the report's lease. Once the report is accepted the
+    lease is completed, so no worker submits it again. If a worker dies
+    mid-submission its lease expires after ``ttl`` seconds and another
+    worker can take over.
+
+    :param fleet: ``RRIFleet``, or a mapping of tld to ``RRIClient``
+    :param backend: ``LeaseBackend`` shared by every worker
+    :param partitioner: ``Partitioner`` assigning work to this worker, or
+        None to try all work
+    :param str owner: name of this worker in the leases, unique by
+        default
+    :param float ttl: seconds a lease lasts without renewal
+    """
+    def __init__(self, fleet, backend, partitioner=None, owner=None,
+                 ttl=DEFAULT_TTL):
+        self.fleet = fleet
+        self.backend = backend
+        self.partitioner = partitioner
+        self.owner = owner or _default_owner()
+        self.ttl = ttl
+
+    @staticmethod
+    def key(tld, resource, period) -> str:
+        return f'{tld}/{resource}/{period}'
+
+    def assigned(self, tld, resource, period) -> bool:
+        """Return True if the partitioner assigns the work to this worker"""
+        if self.partitioner is None:
+            return True
+
+        return self.partitioner.owns(self.key(tld, resource, period))
+
+    def lease(self, tld, resource, period, keepalive=True):
+        """Try to take the lease on a report
+
+        :return: ``Lease``, or None if another worker holds it or it's
+            complete
+        """
+        key = self.key(tld, resource, period)
+
+        if not self.backend.acquire(key, self.owner, self.ttl):
+            return None
+
+        return Lease(self.backend, key, self.owner, self.ttl, keepalive)
+
+    def submit(self, tld, resource, period, report, takeover=False):
+        """Submit a report unless another worker is responsible for it
+
+        :param str tld: tld
+        :param str resource: resource name, e.g. ``registrar-transactions``
+        :param str period: date string, or escrow deposit id
+        :param report: the report, anything ``submit()`` accepts
+        :param bool takeover: submit even if the report is assigned to
+            another worker, e.g. once it's close to its deadline
+        :return: ``RRIResponse``, or None if the report was left to
+            another worker
+        """
+        if not takeover and not self.assigned(tld, resource, period):
+            return None
+
+        lease = self.lease(tld, resource, period)
+        if lease is None:
+            return None
+
+        with lease:
+            rri_resource = self.fleet[tld].resources[resource]
+
+            if resource == 'escrow-agent-notification':
+                response = rri_resource.submit(report)
+            else:
+                response = rri_resource.submit(report, period)
+
+            # A rejected report is released so a corrected one can be sent
+            if response.success:
+                lease.complete()
+
+        return response
+
+    def __repr__(self):
+        return f'LeaseCoordinator({self.owner!r}, {self.backend!r})'
@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+import threading
+from bisect import bisect_left
+
+
+__all__ = ['RRIEvent', 'LatencyHistogram', 'MetricsCollector']
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                   10.0, 30.0, 60.0)
+
+
+class RRIEvent:
+    """
+    Details of a single check or submit request, passed to client hooks
+
+    Timings are in seconds. ``connect`` is 0.0 when an open connection was
+    reused, and None when the transport can't measure it separately, as
+    with ``RequestsTransport``. ``ttfb`` runs from sending the request to
+    receiving the response headers, so it includes connecting and
+    uploading the report.
+
+    A check that shared the request of an identical check already in
+    flight is reported with ``coalesced`` set, the time it waited in
+    ``total`` and no status, as it made no request of its own.
+
+    :param str tld: tld
+    :param str resource: resource name
+    :param str method: HTTP method
+    :param int status: HTTP status, or None if no response was received
+    :param exception: class of the exception raised, or None
+    :param int bytes_sent: size of the report sent
+    :param float connect: time spent connecting, including any TLS
+        handshake, in the last attempt
+    :param float ttfb: time to the first byte of the response
+    :param float total: time for the whole call, including retries
+    :param int retries: number of retries made
+    :param bool coalesced: whether the call shared another's request
+    """
+    __slots__ = ('tld', 'resource', 'method', 'status', 'exception',
+                 'bytes_sent', 'connect', 'ttfb', 'total', 'retries',
+                 'coalesced')
+
+    def __init__(self, tld, resource, method, status, exception=None,
+                 bytes_sent=0, connect=None, ttfb=None, total=0.0,
+                 retries=0, coalesced=False):
+        self.tld = tld
+        self.resource = resource
+        self.method = method
+        self.status = status
+        self.exception = exception
+        self.bytes_sent = bytes_sent
+        self.connect = connect
+        self.ttfb = ttfb
+        self.total = total
+        self.retries = retries
+        self.coalesced = coalesced
+
+    def __repr__(self):
+        coalesced = ' coalesced' if self.coalesced else ''
+        return f'RRIEvent({self.method} {self.resource}/{self.tld} ' \
+            f'status={self.status} total={self.total:.3f}{coalesced})'
+
+
+class LatencyHistogram:
+    """
+    Cumulative histogram of latencies
+
+    :param buckets: upper bounds of the buckets in seconds
+    """
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """Iterate over ``(upper bound, count)`` pairs, ending with +Inf"""
+        total = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            yield bound, total
+
+
+def _labels(**labels):
+    return ','.join('{}="{}"'.format(k, str(v).replace('\\', r'\\')
+                                     .replace('"', r'\"'))
+                    for k, v in labels.items())
+
+
+def _bound(value):
+    return '+Inf' if value == float('inf') else repr(value)
+
+
+class MetricsCollector:
+    """
+    Client hook aggregating events into latency histograms and counters
+
+    Pass it in ``hooks`` to one or more clients and read the results with
+    ``to_prometheus()``.
+
+    :param buckets: histogram bucket upper bounds in seconds
+    :param str prefix: prefix for metric names
+    """
+    def __init__(self, buckets=DEFAULT_BUCKETS, prefix='rri'):
+        self.buckets = buckets
+        self.prefix = prefix
+
+        self.latency = {}
+        self.ttfb = {}
+        self.connect = {}
+        self.requests = {}
+        self.bytes_sent = {}
+        self.retries = {}
+        self.coalesced = {}
+
+        self._lock = threading.Lock()
+
+    def __call__(self, event: RRIEvent):
+        key = (event.resource, event.method)
+        exception = event.exception.__name__ if event.exception else ''
+        outcome = key + (
+            event.status if event.status is not None else '', exception)
+
+        with self._lock:
+            # Calls sharing another's request are counted apart, so the
+            # request metrics only describe requests actually made
+            if event.coalesced:
+                shared = key + (exception,)
+                self.coalesced[shared] = self.coalesced.get(shared, 0) + 1
+                return
+
+            if key not in self.latency:
+                self.latency[key] = LatencyHistogram(self.buckets)
+                self.ttfb[key] = LatencyHistogram(self.buckets)
+
+            self.latency[key].observe(event.total)
+            if event.ttfb is not None:
+                self.ttfb[key].observe(event.ttfb)
+            # Only requests that opened a connection say how long it takes
+            if event.connect:
+                if key not in self.connect:
+                    self.connect[key] = LatencyHistogram(self.buckets)
+                self.connect[key].observe(event.connect)
+
+            self.requests[outcome] = self.requests.get(outcome, 0) + 1
+            self.bytes_sent[key] = \
+                self.bytes_sent.get(key, 0) + event.bytes_sent
+            self.retries[key] = self.retries.get(key, 0) + event.retries
+
+    def _histogram_lines(self, name, description, histograms):
+        yield f'# HELP {name} {description}'
+        yield f'# TYPE {name} histogram'
+
+        for (resource, method), histogram in sorted(histograms.items()):
+            labels = _labels(resource=resource, method=method)
+            for bound, count in histogram.cumulative():
+                yield f'{name}_bucket{{{labels},le="{_bound(bound)}"}} ' \
+                    f'{count}'
+            yield f'{name}_sum{{{labels}}} {histogram.sum!r}'
+            yield f'{name}_count{{{labels}}} {histogram.count}'
+
+    def _counter_lines(self, name, description, counters, label_names):
+        yield f'# HELP {name} {description}'
+        yield f'# TYPE {name} counter'
+
+        for key, value in sorted(counters.items(),
+                                 key=lambda item: tuple(map(str, item[0]))):
+            labels = _labels(**dict(zip(label_names, key)))
+            yield f'{name}{{{labels}}} {value}'
+
+    def to_prometheus(self) -> str:
+        """Render the collected metrics in the Prometheus text format
+
+        :rtype: ``str``
+        """
+        prefix = self.prefix
+
+        with self._lock:
+            lines = [
+                *self._histogram_lines(
+                    f'{prefix}_request_duration_seconds',
+                    'Time taken by RRI requests, including retries.',
+                    self.latency),
+                *self._histogram_lines(
+                    f'{prefix}_time_to_first_byte_seconds',
+                    'Time until RRI response headers were received.',
+                    self.ttfb),
+                *self._histogram_lines(
+                    f'{prefix}_connect_seconds',
+                    'Time taken to open connections to the RRI.',
+                    self.connect),
+                *self._counter_lines(
+                    f'{prefix}_requests_total',
+                    'RRI requests by status and exception raised.',
+                    self.requests,
+                    ('resource', 'method', 'status', 'exception')),
+                *self._counter_lines(
+                    f'{prefix}_request_bytes_sent_total',
+                    'Report bytes sent to the RRI.',
+                    self.bytes_sent, ('resource', 'method')),
+                *self._counter_lines(
+                    f'{prefix}_retries_total',
+                    'Retries of RRI requests.',
+                    self.retries, ('resource', 'method')),
+                *self._counter_lines(
+                    f'{prefix}_coalesced_total',
+                    'Calls that shared the request of an identical call.',
+                    self.coalesced, ('resource', 'method', 'exception')),
+            ]
+
+        return '\n'.join(lines) + '\n'
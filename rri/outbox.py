@@ -0,0 +1,392 @@
+# -*- coding: utf-8 -*-
+import logging
+import os
+import pathlib
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .retry import TRANSIENT_ERRORS
+
+
+__all__ = ['Outbox', 'OutboxItem']
+
+PENDING = 'pending'
+IN_FLIGHT = 'in-flight'
+DONE = 'done'
+REJECTED = 'rejected'
+FAILED = 'failed'
+
+STATES = (PENDING, IN_FLIGHT, DONE, REJECTED, FAILED)
+
+DEFAULT_LEASE_TIMEOUT = 3600
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_BACKOFF_FACTOR = 30.0
+DEFAULT_MAX_BACKOFF = 3600.0
+
+logger = logging.getLogger(__name__)
+
+
+class OutboxItem:
+    """
+    A submission recorded in an ``Outbox``
+
+    :param int id: row id
+    :param str tld: tld
+    :param str resource: resource name, e.g. ``registrar-transactions``
+    :param str period: date string, or escrow deposit id
+    :param str payload: path to the report
+    :param str state: one of pending, in-flight, done, rejected or failed
+    :param int attempts: number of times the submission was started
+    :param str error: response body or error of the last attempt
+    """
+    __slots__ = ('id', 'tld', 'resource', 'period', 'payload', 'state',
+                 'attempts', 'error')
+
+    def __init__(self, id, tld, resource, period, payload, state=PENDING,
+                 attempts=0, error=None):
+        self.id = id
+        self.tld = tld
+        self.resource = resource
+        self.period = period
+        self.payload = payload
+        self.state = state
+        self.attempts = attempts
+        self.error = error
+
+    def __repr__(self):
+        return f'OutboxItem({self.resource}/{self.tld}/{self.period} ' \
+            f'{self.state})'
+
+
+class Outbox:
+    """
+    Durable queue of report submissions, shareable between processes
+
+    Submissions are recorded before any upload starts and their outcome
+    is written as each finishes, so a run that dies part way through can be
+    restarted and only submits what's left. Each submission is unique by
+    tld, resource and period, so adding the same work again is harmless.
+
+    A submission that was in flight when its worker died is taken again
+    once it has been claimed for ``lease_timeout`` seconds, or straight
+    away after ``recover()``. A submission failing with a server or
+    connection error waits ``backoff_factor * 2 ** (attempts - 1)``
+    seconds, at most ``max_backoff``, before it's tried again.
+
+    :param str path: path to the SQLite database, created if missing
+    :param int lease_timeout: seconds before an in-flight submission is
+        considered abandoned
+    :param int max_attempts: attempts before a submission that keeps
+        failing with a server or connection error is marked failed
+    :param float backoff_factor: seconds to wait after the first failure
+    :param float max_backoff: longest wait in seconds
+    :param float timeout: seconds to wait for another process's lock
+    """
+    def __init__(self, path, lease_timeout=DEFAULT_LEASE_TIMEOUT,
+                 max_attempts=DEFAULT_MAX_ATTEMPTS,
+                 backoff_factor=DEFAULT_BACKOFF_FACTOR,
+                 max_backoff=DEFAULT_MAX_BACKOFF, timeout=30.0,
+                 sleep=time.sleep):
+        self.path = path
+        self.lease_timeout = lease_timeout
+        self.max_attempts = max_attempts
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.sleep = sleep
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=timeout,
+                                   isolation_level=None,
+                                   check_same_thread=False)
+
+        with self._lock:
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('PRAGMA synchronous=FULL')
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS outbox ('
+                '  id INTEGER PRIMARY KEY,'
+                '  tld TEXT NOT NULL,'
+                '  resource TEXT NOT NULL,'
+                '  period TEXT NOT NULL,'
+                '  payload TEXT NOT NULL,'
+                '  state TEXT NOT NULL,'
+                '  attempts INTEGER NOT NULL DEFAULT 0,'
+                '  claimed REAL,'
+                '  finished REAL,'
+                '  error TEXT,'
+                '  not_before REAL,'
+                '  UNIQUE (tld, resource, period)'
+                ')'
+            )
+
+            # Outboxes created before retries were delayed lack not_before
+            columns = [row[1] for row in
+                       self._db.execute('PRAGMA table_info(outbox)')]
+            if 'not_before' not in columns:
+                self._db.execute(
+                    'ALTER TABLE outbox ADD COLUMN not_before REAL'
+                )
+            self._db.execute(
+                'CREATE INDEX IF NOT EXISTS outbox_state ON outbox (state)'
+            )
+
+    def add(self, tld, resource, period, payload) -> bool:
+        """Record a submission, unless it's already in the outbox
+
+        :param str tld: tld
+        :param str resource: resource name, e.g. ``registrar-transactions``
+        :param str period: date string, deposit id for escrow reports, or
+            None for escrow notifications
+        :param payload: path to the report
+        :type payload: ``str`` or ``os.PathLike``
+        :return: True if the submission was added
+        :rtype: ``bool``
+        """
+        payload = os.path.abspath(os.fspath(payload))
+
+        with self._lock:
+            cursor = self._db.execute(
+                'INSERT INTO outbox (tld, resource, period, payload, state) '
+                'VALUES (?, ?, ?, ?, ?) '
+                'ON CONFLICT (tld, resource, period) DO NOTHING',
+                (tld, resource, period or '', payload, PENDING)
+            )
+
+        return cursor.rowcount == 1
+
+    def claim(self):
+        """Take the next submission to make, marking it in flight
+
+        :return: ``OutboxItem``, or None if nothing is left
+        """
+        now = time.time()
+
+        with self._lock:
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                row = self._db.execute(
+                    'SELECT id, tld, resource, period, payload, attempts '
+                    'FROM outbox WHERE (state = ? AND '
+                    '(not_before IS NULL OR not_before <= ?)) '
+                    'OR (state = ? AND claimed <= ?) '
+                    'ORDER BY attempts, id LIMIT 1',
+                    (PENDING, now, IN_FLIGHT, now - self.lease_timeout)
+                ).fetchone()
+
+                if row:
+                    self._db.execute(
+                        'UPDATE outbox SET state = ?, claimed = ?, '
+                        'attempts = attempts + 1 WHERE id = ?',
+                        (IN_FLIGHT, now, row[0])
+                    )
+            except BaseException:
+                self._db.execute('ROLLBACK')
+                raise
+
+            self._db.execute('COMMIT')
+
+        if row is None:
+            return None
+
+        id, tld, resource, period, payload, attempts = row
+
+        return OutboxItem(id, tld, resource, period, payload, IN_FLIGHT,
+                          attempts + 1)
+
+    def finish(self, item, state, error=None, delay=None):
+        """Record the outcome of a claimed submission
+
+        :param item: ``OutboxItem`` returned by ``claim()``
+        :param str state: new state of the submission
+        :param str error: response body or error to record
+        :param float delay: seconds before a pending submission may be
+            claimed again
+        """
+        if state not in STATES:
+            raise ValueError(f'Unknown state {state}')
+
+        now = time.time()
+        not_before = now + delay if delay and state == PENDING else None
+
+        with self._lock:
+            self._db.execute(
+                'UPDATE outbox SET state = ?, finished = ?, error = ?, '
+                'not_before = ? WHERE id = ?',
+                (state, now if state != PENDING else None, error, not_before,
+                 item.id)
+            )
+
+        item.state = state
+        item.error = error
+
+    def backoff(self, attempts, retry_after=None) -> float:
+        """Return the delay in seconds before a failed submission is
+        tried again
+
+        :param int attempts: attempts made so far
+        :param float retry_after: seconds the server or circuit breaker
+            asked to wait, if longer
+        """
+        delay = self.backoff_factor * 2 ** max(attempts - 1, 0)
+
+        return min(max(delay, retry_after or 0), self.max_backoff)
+
+    def next_due(self):
+        """Return when the next delayed submission may be claimed
+
+        :return: UNIX time, or None if no submission is pending
+        """
+        with self._lock:
+            row = self._db.execute(
+                'SELECT COUNT(*), MIN(COALESCE(not_before, 0)) FROM outbox '
+                'WHERE state = ?', (PENDING,)
+            ).fetchone()
+
+        return row[1] if row[0] else None
+
+    def recover(self) -> int:
+        """Return every in-flight submission to pending
+
+        Call this when restarting after a crash and no other worker is
+        draining the outbox.
+
+        :return: the number of submissions returned
+        :rtype: ``int``
+        """
+        with self._lock:
+            cursor = self._db.execute(
+                'UPDATE outbox SET state = ?, claimed = NULL, '
+                'not_before = NULL WHERE state = ?',
+                (PENDING, IN_FLIGHT)
+            )
+
+        return cursor.rowcount
+
+    def retry_failed(self) -> int:
+        """Return failed submissions to pending with their attempts reset
+
+        :return: the number of submissions returned
+        :rtype: ``int``
+        """
+        with self._lock:
+            cursor = self._db.execute(
+                'UPDATE outbox SET state = ?, attempts = 0, claimed = NULL, '
+                'not_before = NULL WHERE state = ?',
+                (PENDING, FAILED)
+            )
+
+        return cursor.rowcount
+
+    def items(self, state=None):
+        """Return the submissions in the outbox
+
+        :param str state: only return submissions in this state
+        :return: ``list`` of ``OutboxItem``
+        """
+        query = 'SELECT id, tld, resource, period, payload, state, ' \
+            'attempts, error FROM outbox'
+        params = ()
+        if state:
+            query += ' WHERE state = ?'
+            params = (state,)
+
+        with self._lock:
+            rows = self._db.execute(query + ' ORDER BY id', params).fetchall()
+
+        return [OutboxItem(*row) for row in rows]
+
+    def counts(self):
+        """Return the number of submissions in each state
+
+        :rtype: ``dict``
+        """
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT state, COUNT(*) FROM outbox GROUP BY state'
+            ).fetchall()
+
+        counts = dict.fromkeys(STATES, 0)
+        counts.update(rows)
+
+        return counts
+
+    def process(self, fleet, item):
+        """Submit a claimed submission and record its outcome
+
+        :param fleet: ``RRIFleet``, or a mapping of tld to ``RRIClient``
+        :param item: ``OutboxItem`` returned by ``claim()``
+        :return: the new state of the submission
+        :rtype: ``str``
+        """
+        try:
+            resource = fleet[item.tld].resources[item.resource]
+            args = (item.period,) if item.period else ()
+
+            # A str would be uploaded as the report itself
+            response = resource.submit(pathlib.Path(item.payload), *args)
+        except TRANSIENT_ERRORS as e:
+            if item.attempts < self.max_attempts:
+                self.finish(item, PENDING, repr(e), delay=self.backoff(
+                    item.attempts, getattr(e, 'retry_after', None)
+                ))
+            else:
+                self.finish(item, FAILED, repr(e))
+        except Exception as e:
+            logger.warning('Submission %r failed', item, exc_info=True)
+            self.finish(item, FAILED, repr(e))
+        else:
+            self.finish(item, DONE if response.success else REJECTED,
+                        response.response_body)
+
+        return item.state
+
+    def _work(self, fleet):
+        while True:
+            item = self.claim()
+            if item is not None:
+                self.process(fleet, item)
+                continue
+
+            # Wait for submissions delayed after a failure, leaving those
+            # in flight with other workers
+            due = self.next_due()
+            if due is None:
+                return
+
+            self.sleep(max(due - time.time(), 0.0) + 0.01)
+
+    def drain(self, fleet, max_workers=1, recover=True):
+        """Submit everything left in the outbox
+
+        Submissions that fail with a server or connection error are tried
+        again after a delay, up to ``max_attempts`` in total, and drain
+        waits for them.
+
+        :param fleet: ``RRIFleet``, or a mapping of tld to ``RRIClient``
+        :param int max_workers: maximum number of concurrent submissions
+        :param bool recover: take back in-flight submissions first, False
+            when other workers may be draining the same outbox
+        :return: the number of submissions in each state, see ``counts``
+        :rtype: ``dict``
+        """
+        if recover:
+            recovered = self.recover()
+            if recovered:
+                logger.info('Resuming %d interrupted submissions', recovered)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            workers = [executor.submit(self._work, fleet)
+                       for _ in range(max_workers)]
+
+            for worker in workers:
+                worker.result()
+
+        return self.counts()
+
+    def close(self):
+        self._db.close()
+
+    def __repr__(self):
+        return f'Outbox("{self.path}")'
@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+import io
+import mmap
+import os
+from contextlib import contextmanager
+from hashlib import sha256
+
+
+__all__ = ['open_report', 'report_length', 'report_digest',
+           'CountingIterator', 'HashingIterator']
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def _is_real_file(f):
+    try:
+        f.fileno()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return False
+
+    return True
+
+
+@contextmanager
+def _map_file(f):
+    size = os.fstat(f.fileno()).st_size
+
+    # Zero length files can't be mapped
+    if not size:
+        yield b''
+        return
+
+    mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(mapped)
+    try:
+        yield view
+    finally:
+        view.release()
+        mapped.close()
+
+
+@contextmanager
+def open_report(report):
+    """Prepare a report for upload without reading it into memory
+
+    ``str`` and ``bytes`` reports are sent as they are. Paths and binary
+    files that start at the beginning of a regular file are memory mapped
+    and sent without copying. Other binary file objects are streamed, and
+    iterables of ``bytes`` chunks are sent with chunked transfer encoding.
+
+    :param report: the report, a path, a binary file or an iterable of
+        ``bytes``
+    :type report: ``str``, ``bytes``, ``os.PathLike``, file or iterable
+    :return: a body suitable for ``requests``
+    """
+    if isinstance(report, os.PathLike):
+        with open(report, 'rb') as f, _map_file(f) as body:
+            yield body
+    elif hasattr(report, 'read') and _is_real_file(report) \
+            and report.seekable() and report.tell() == 0:
+        with _map_file(report) as body:
+            yield body
+    else:
+        yield report
+
+
+def _is_rereadable(body):
+    if isinstance(body, (str, bytes, bytearray, memoryview)):
+        return True
+
+    try:
+        return hasattr(body, 'read') and body.seekable()
+    except (AttributeError, OSError):
+        return False
+
+
+def _iter_chunks(body):
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+
+    if isinstance(body, (bytes, bytearray, memoryview)):
+        # Release each slice so a memory mapped report can be closed
+        with memoryview(body) as view:
+            for start in range(0, view.nbytes, CHUNK_SIZE):
+                with view[start:start + CHUNK_SIZE] as chunk:
+                    yield chunk
+        return
+
+    position = body.tell()
+    try:
+        for chunk in iter(lambda: body.read(CHUNK_SIZE), b''):
+            yield chunk
+    finally:
+        body.seek(position)
+
+
+def report_length(body):
+    """Return the size in bytes of a prepared report, if it is known
+
+    :param body: a body returned by ``open_report``
+    :return: the size, or None if the report is an iterable
+    :rtype: ``int``
+    """
+    if body is None:
+        return 0
+
+    if isinstance(body, str):
+        return len(body.encode('utf-8'))
+
+    if isinstance(body, memoryview):
+        return body.nbytes
+
+    if isinstance(body, (bytes, bytearray)):
+        return len(body)
+
+    if hasattr(body, 'read'):
+        try:
+            if _is_real_file(body):
+                return os.fstat(body.fileno()).st_size - body.tell()
+
+            position = body.tell()
+            length = body.seek(0, io.SEEK_END) - position
+            body.seek(position)
+            return length
+        except (AttributeError, OSError, io.UnsupportedOperation):
+            return None
+
+    return None
+
+
+def report_digest(body):
+    """Return the SHA-256 of a prepared report that can be read again
+
+    A memory mapped report is hashed in place, without copying it.
+
+    :param body: a body returned by ``open_report``
+    :return: the hex digest
+    :rtype: ``str``
+    """
+    digest = sha256()
+    for chunk in _iter_chunks(body):
+        digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+class CountingIterator:
+    """
+    Iterate over a report's chunks, counting the bytes passed on
+
+    :param chunks: iterable of ``bytes``
+    """
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.count = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        chunk = next(self.chunks)
+        self.count += len(chunk)
+        return chunk
+
+
+class HashingIterator:
+    """
+    Iterate over a report's chunks, hashing the bytes passed on
+
+    :param chunks: iterable of ``bytes``
+    """
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.digest = sha256()
+        self.exhausted = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            chunk = next(self.chunks)
+        except StopIteration:
+            self.exhausted = True
+            raise
+
+        self.digest.update(chunk)
+        return chunk
+
+    def hexdigest(self):
+        """Return the digest of the whole report, or None if the report
+        wasn't read to the end
+        """
+        return self.digest.hexdigest() if self.exhausted else None
@@ -0,0 +1,302 @@
+# -*- coding: utf-8 -*-
+import csv
+import io
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+from .rri import RRIResponse
+from .fields import TRANSACTION_FIELDS, FUNCTION_FIELDS
+
+
+__all__ = ['TRANSACTION_FIELDS', 'FUNCTION_FIELDS', 'TransactionsReport',
+           'FunctionsReport']
+
+CHUNK_SIZE = 64 * 1024
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError('rri.reports requires numpy, install it with '
+                          '"pip install rri[reports]"')
+
+
+def _column(batch, name):
+    """Return a column of a record batch, data frame or mapping as an array"""
+    column = batch.column(name) if hasattr(batch, 'column') else batch[name]
+    return np.asarray(column)
+
+
+def _field_indexes(fields, field_names):
+    """Convert an array of field names or indexes to field indexes"""
+    fields = np.asarray(fields)
+
+    if np.issubdtype(fields.dtype, np.integer):
+        out_of_range = (fields < 0) | (fields >= len(field_names))
+        if out_of_range.any():
+            raise ValueError('Field index out of range')
+        return fields
+
+    positions = {name: i for i, name in enumerate(field_names)}
+    names, inverse = np.unique(fields, return_inverse=True)
+
+    try:
+        lookup = np.array([positions[str(name)] for name in names],
+                          dtype=np.intp)
+    except KeyError as e:
+        raise ValueError(f'Unknown report field {e}') from None
+
+    return lookup[inverse.reshape(-1)]
+
+
+def _counts(counts, size):
+    if counts is None:
+        return None
+
+    counts = np.asarray(counts)
+    if counts.shape != (size,):
+        raise ValueError('counts must be the same length as fields')
+
+    if not np.issubdtype(counts.dtype, np.integer) and \
+            counts.dtype != np.bool_:
+        # bincount would silently truncate fractional counts
+        try:
+            whole = np.issubdtype(counts.dtype, np.floating) and \
+                bool((np.mod(counts, 1) == 0).all())
+        except TypeError:
+            whole = False
+        if not whole:
+            raise ValueError('counts must be integers')
+
+    return counts
+
+
+def _iana_id(iana_id):
+    """Return an IANA id as an int, whether it was given as one or not"""
+    try:
+        return int(iana_id)
+    except (TypeError, ValueError):
+        raise ValueError(f'IANA id {iana_id!r} is not an integer') from None
+
+
+def _iana_ids(iana_ids):
+    """Return an array of IANA ids as integers, so that ids given as
+    strings and ints are the same registrar and can be sorted
+    """
+    ids = np.asarray(iana_ids)
+    if np.issubdtype(ids.dtype, np.integer):
+        return ids
+
+    try:
+        converted = ids.astype(np.int64)
+    except (TypeError, ValueError):
+        raise ValueError('IANA ids must be integers') from None
+
+    if np.issubdtype(ids.dtype, np.floating) and (converted != ids).any():
+        raise ValueError('IANA ids must be integers')
+
+    return converted
+
+
+class _CSVStream:
+    """Encode CSV rows in chunks of roughly ``CHUNK_SIZE`` bytes"""
+    def __init__(self):
+        self.buffer = io.StringIO()
+        self.writer = csv.writer(self.buffer, lineterminator='\r\n')
+
+    def write(self, row):
+        self.writer.writerow(row)
+
+        if self.buffer.tell() >= CHUNK_SIZE:
+            return self.flush()
+
+    def flush(self):
+        chunk = self.buffer.getvalue().encode('utf-8')
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        return chunk
+
+
+class TransactionsReport:
+    """
+    Per-Registrar Transactions report built from columnar data
+
+    Counters are added as parallel arrays of registrar IANA ids, field
+    names (or indexes into ``fields``) and optional counts, and summed with
+    NumPy rather than a loop per record. Every registrar seen or passed in
+    ``registrars`` gets a line, sorted by IANA id, followed by the totals
+    line, and the CSV is streamed into the resource's ``submit()``.
+
+    IANA ids may be given as ints or strings, and are reported as ints.
+
+    :param registrars: mapping of IANA id to registrar name
+    :param fields: report fields after ``registrar-name`` and ``iana-id``
+    """
+    def __init__(self, registrars=None, fields=TRANSACTION_FIELDS):
+        _require_numpy()
+
+        self.registrars = {_iana_id(iana_id): name for iana_id, name
+                           in dict(registrars or {}).items()}
+        self.fields = tuple(fields)
+
+        self._rows = {}
+        self._ids = []
+        self._counters = np.zeros((0, len(self.fields)), dtype=np.int64)
+
+    def _row_indexes(self, iana_ids):
+        ids, inverse = np.unique(_iana_ids(iana_ids), return_inverse=True)
+
+        for iana_id in ids.tolist():
+            if iana_id not in self._rows:
+                self._rows[iana_id] = len(self._ids)
+                self._ids.append(iana_id)
+
+        if len(self._ids) > self._counters.shape[0]:
+            grown = np.zeros((len(self._ids), len(self.fields)),
+                             dtype=np.int64)
+            grown[:self._counters.shape[0]] = self._counters
+            self._counters = grown
+
+        lookup = np.array([self._rows[i] for i in ids.tolist()],
+                          dtype=np.intp)
+        return lookup[inverse.reshape(-1)]
+
+    def add(self, iana_ids, fields, counts=None):
+        """Add counters for many transactions at once
+
+        :param iana_ids: registrar IANA id of each record
+        :param fields: report field name or index of each record
+        :param counts: whole amount to add for each record, 1 if None
+        """
+        fields = _field_indexes(fields, self.fields)
+        counts = _counts(counts, fields.shape[0])
+
+        if np.shape(iana_ids) != fields.shape:
+            raise ValueError('iana_ids must be the same length as fields')
+
+        rows = self._row_indexes(iana_ids)
+
+        width = len(self.fields)
+        totals = np.bincount(rows * width + fields, weights=counts,
+                             minlength=self._counters.size)
+
+        self._counters += totals.astype(np.int64).reshape(
+            self._counters.shape
+        )
+
+    def add_batch(self, batch, iana_id='iana_id', field='field',
+                  count=None):
+        """Add counters from a record batch, data frame or dict of arrays
+
+        :param batch: columnar data
+        :param str iana_id: name of the IANA id column
+        :param str field: name of the field column
+        :param str count: name of the count column, or None to count rows
+        """
+        self.add(_column(batch, iana_id), _column(batch, field),
+                 _column(batch, count) if count else None)
+
+    def rows(self):
+        """Iterate over report lines, including the totals line"""
+        ids = sorted(set(self._ids) | set(self.registrars))
+
+        for iana_id in ids:
+            row = self._rows.get(iana_id)
+            values = self._counters[row].tolist() if row is not None \
+                else [0] * len(self.fields)
+
+            yield [self.registrars.get(iana_id, ''), iana_id, *values]
+
+        yield ['Totals', '', *self._counters.sum(axis=0).tolist()]
+
+    def iter_csv(self):
+        """Iterate over the report CSV in ``bytes`` chunks"""
+        stream = _CSVStream()
+        stream.write(['registrar-name', 'iana-id', *self.fields])
+
+        for row in self.rows():
+            chunk = stream.write(row)
+            if chunk:
+                yield chunk
+
+        yield stream.flush()
+
+    def to_csv(self) -> str:
+        return b''.join(self.iter_csv()).decode('utf-8')
+
+    def submit(self, resource, date=None) -> RRIResponse:
+        """Stream the report to a ``PerRegistrarTransactions`` resource
+
+        :param resource: e.g. ``RRIClient.transactions``
+        :param date: The month of the report
+        :type date: ``str`` or ``datetime.datetime``
+        :return: ``RRIResponse``
+        """
+        return resource.submit(self.iter_csv(), date)
+
+
+class FunctionsReport:
+    """
+    Registry Functions Activity report built from columnar data
+
+    :param fields: report fields
+    """
+    def __init__(self, fields=FUNCTION_FIELDS):
+        _require_numpy()
+
+        self.fields = tuple(fields)
+        self._counters = np.zeros(len(self.fields), dtype=np.int64)
+
+    def add(self, fields, counts=None):
+        """Add counters for many transactions at once
+
+        :param fields: report field name or index of each record
+        :param counts: whole amount to add for each record, 1 if None
+        """
+        fields = _field_indexes(fields, self.fields)
+        counts = _counts(counts, fields.shape[0])
+
+        totals = np.bincount(fields, weights=counts,
+                             minlength=len(self.fields))
+        self._counters += totals.astype(np.int64)
+
+    def add_batch(self, batch, field='field', count=None):
+        """Add counters from a record batch, data frame or dict of arrays
+
+        :param batch: columnar data
+        :param str field: name of the field column
+        :param str count: name of the count column, or None to count rows
+        """
+        self.add(_column(batch, field),
+                 _column(batch, count) if count else None)
+
+    def set(self, field, value):
+        """Set a counter that isn't derived from transactions
+
+        :param str field: report field name
+        :param int value: value of the counter
+        """
+        self._counters[self.fields.index(field)] = value
+
+    def iter_csv(self):
+        """Iterate over the report CSV in ``bytes`` chunks"""
+        stream = _CSVStream()
+        stream.write(self.fields)
+        stream.write(self._counters.tolist())
+
+        yield stream.flush()
+
+    def to_csv(self) -> str:
+        return b''.join(self.iter_csv()).decode('utf-8')
+
+    def submit(self, resource, date=None) -> RRIResponse:
+        """Stream the report to a ``RegistryFunctions`` resource
+
+        :param resource: e.g. ``RRIClient.functions``
+        :param date: The month of the report
+        :type date: ``str`` or ``datetime.datetime``
+        :return: ``RRIResponse``
+        """
+        return resource.submit(self.iter_csv(), date)
@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+import io
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+from .exception import GeneralFailure, UnknownStatus, CircuitOpen, \
+    TransportError, ConnectionFailed, RequestTimeout
+
+
+__all__ = ['RetryPolicy', 'RetryBudget']
+
+DEFAULT_RETRY_STATUSES = (500, 502, 503, 504)
+DEFAULT_RETRY_METHODS = ('HEAD', 'PUT')
+
+# Failures of a whole call worth trying again later, anything else is final
+TRANSIENT_ERRORS = (GeneralFailure, UnknownStatus, CircuitOpen,
+                    TransportError)
+
+
+class RetryBudget:
+    """
+    Limit retries to a fraction of the requests being made
+
+    Every first attempt deposits ``ratio`` tokens and every retry spends
+    one, so when the RRI is failing retries can add at most ``ratio`` extra
+    load. ``min_retries`` tokens are always available to a quiet client.
+    Share one budget between clients to limit retries across all of them.
+
+    :param float ratio: retries allowed per request
+    :param int min_retries: retries allowed regardless of request volume
+    """
+    def __init__(self, ratio=0.2, min_retries=10):
+        self.ratio = ratio
+        self.min_retries = min_retries
+
+        self._max_tokens = min_retries + 100 * ratio
+        self._tokens = float(min_retries)
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self._tokens = min(self._max_tokens, self._tokens + self.ratio)
+
+    def withdraw(self):
+        """Spend a token for a retry
+
+        :return: True if the retry may go ahead
+        :rtype: ``bool``
+        """
+        with self._lock:
+            if self._tokens < 1:
+                return False
+
+            self._tokens -= 1
+            return True
+
+    def __repr__(self):
+        return f'RetryBudget(ratio={self.ratio}, ' \
+            f'min_retries={self.min_retries})'
+
+
+def _parse_retry_after(value):
+    if not value:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+def _rewind(body):
+    """Return a function resetting body for another attempt, or None"""
+    if body is None or isinstance(body, (str, bytes, bytearray, memoryview)):
+        return lambda: None
+
+    try:
+        position = body.tell()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return None
+
+    return lambda: body.seek(position)
+
+
+class RetryPolicy:
+    """
+    Retry transient RRI failures with exponential backoff and jitter
+
+    Requests answered with one of ``statuses``, or failing to connect,
+    are retried up to ``max_retries`` times. The delay before retry ``n``
+    is a random time up to ``backoff_factor * 2 ** n`` seconds, unless
+    the response has a Retry-After header, and is never more than
+    ``max_backoff``. Reports streamed from an iterable can't be resent
+    and are never retried.
+
+    :param int max_retries: maximum number of retries per request
+    :param float backoff_factor: base delay in seconds
+    :param float max_backoff: longest delay in seconds
+    :param bool jitter: randomise delays to spread out retries
+    :param statuses: HTTP status codes to retry
+    :param methods: HTTP methods to retry
+    :param budget: shared limit on the number of retries
+    :type budget: ``RetryBudget``
+    """
+    exceptions = (ConnectionFailed, RequestTimeout)
+
+    def __init__(self, max_retries=3, backoff_factor=0.5, max_backoff=30.0,
+                 jitter=True, statuses=DEFAULT_RETRY_STATUSES,
+                 methods=DEFAULT_RETRY_METHODS, budget=None,
+                 sleep=time.sleep):
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.statuses = frozenset(statuses)
+        self.methods = frozenset(methods)
+        self.budget = budget if budget else RetryBudget()
+        self.sleep = sleep
+
+    def backoff(self, retry, retry_after=None) -> float:
+        """Return the delay in seconds before a retry
+
+        :param int retry: the retry number, starting at 0
+        :param retry_after: value of the Retry-After header
+        :type retry_after: ``str``
+        """
+        delay = _parse_retry_after(retry_after)
+
+        if delay is None:
+            delay = self.backoff_factor * 2 ** retry
+            if self.jitter:
+                delay = random.uniform(0, delay)
+
+        return min(delay, self.max_backoff)
+
+    def call(self, send, method, url, **kwargs):
+        """Send a request, retrying transient failures
+
+        The response gets ``retries`` and ``retry_time`` attributes with
+        the number of retries made and the seconds spent on them after the
+        first attempt.
+
+        :param send: function sending the request and returning a response
+        :param str method: HTTP method
+        :param str url: url
+        :return: the last response
+        """
+        rewind = _rewind(kwargs.get('data'))
+        retryable = rewind is not None and method.upper() in self.methods
+
+        self.budget.deposit()
+
+        retries = 0
+        first_attempt = None
+
+        while True:
+            error = None
+            try:
+                response = send(method, url, **kwargs)
+            except self.exceptions as e:
+                response, error = None, e
+
+            if first_attempt is None:
+                first_attempt = time.monotonic()
+
+            if response is not None and \
+                    response.status_code not in self.statuses:
+                break
+
+            if not retryable or retries >= self.max_retries or \
+                    not self.budget.withdraw():
+                if error is not None:
+                    raise error
+                break
+
+            retry_after = None
+            if response is not None:
+                retry_after = response.headers.get('Retry-After')
+
+            self.sleep(self.backoff(retries, retry_after))
+            rewind()
+            retries += 1
+
+        response.retries = retries
+        response.retry_time = time.monotonic() - first_attempt \
+            if retries else 0.0
+
+        return response
+
+    def __repr__(self):
+        return f'RetryPolicy(max_retries={self.max_retries}, ' \
+            f'backoff_factor={self.backoff_factor})'
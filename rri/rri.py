@@ -1,16 +1,46 @@
 # -*- coding: utf-8 -*-
-from datetime import datetime as dt
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime as dt, timedelta
+from functools import lru_cache
+from urllib.parse import quote
 
-import requests
 from uritemplate import URITemplate
 
-from . import __version__
+from .transport import as_transport, create_transport, create_session, \
+    _get_charset, _get_default_useragent, DEFAULT_POOL_SIZE
+from .payload import open_report, report_length, report_digest, \
+    CountingIterator, HashingIterator, _is_rereadable
+from .metrics import RRIEvent
+from .coalesce import Coalescer
 from .exception import RRIException, InvalidInput, InvalidTldCredentials, \
     InvalidAccess, InvalidRequestMethod, GeneralFailure, NotImplemented, \
     UnknownStatus
 
 
-__all__ = ['RRIClient']
+__all__ = ['RRIClient', 'create_session']
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BASE_URL = 'ry-api.icann.org'
+DEFAULT_MAX_WORKERS = DEFAULT_POOL_SIZE
+
+
+@lru_cache(maxsize=4096)
+def _format_period(date_format, date) -> str:
+    if isinstance(date, str):
+        # Make sure it's a valid date string
+        date = dt.strptime(date, date_format)
+
+    return dt.strftime(date, date_format)
+
+
+def _get_root_url(base_url) -> str:
+    if '://' in base_url:
+        return base_url.rstrip('/')
+
+    return f'https://{base_url}'
 
 
 class RRIClient:
@@ -20,49 +50,135 @@ class RRIClient:
     :param str tld: tld to query
     :param str rri_user: tld username
     :param str rri_pass: tld password
-    :param client: alternative client
-    :type client:
-    :param str base_url: alternative base url
+    :param client: alternative transport, or a ``requests.Session`` to
+        send requests through
+    :type client: ``rri.transport.Transport``
+    :param str base_url: alternative base url, https is used unless it
+        includes a scheme
+    :param cache: cache of check results
+    :type cache: ``rri.cache.CheckCache``
+    :param retry: policy for retrying transient failures
+    :type retry: ``rri.retry.RetryPolicy``
+    :param hooks: callables passed an ``rri.metrics.RRIEvent`` after each
+        request
+    :param bool validate: validate reports locally before submitting them,
+        raising ``InvalidReport`` instead of uploading an invalid report
+    :param breaker: circuit breaker failing fast while an endpoint is down
+    :type breaker: ``rri.breaker.CircuitBreaker``
     """
     icann_url = URITemplate(
-        r'https://{base_url}{/info}/report/{resource}/{tld}{/id}'
+        r'{+base_url}{/info}/report/{resource}/{tld}{/id}'
     )
 
-    def __init__(self, tld, rri_user, rri_pass, client=None, base_url=None):
+    def __init__(self, tld, rri_user, rri_pass, client=None, base_url=None,
+                 cache=None, retry=None, hooks=None, validate=False,
+                 breaker=None):
         self.tld = tld
         self.rri_user = rri_user
         self.rri_pass = rri_pass
 
         if client:
-            self.client = client
+            self.client = as_transport(client)
         else:
-            self.client = requests.session()
-            self.client.headers.update({
-                'User-Agent': self._get_default_useragent()
-            })
+            self.client = create_transport(
+                user_agent=self._get_default_useragent()
+            )
 
-        self.base_url = base_url if base_url else 'ry-api.icann.org'
-        self.icann_url = self.icann_url.partial(base_url=self.base_url)
-        self.client.auth = (self.rri_user, self.rri_pass)
+        self.base_url = base_url if base_url else DEFAULT_BASE_URL
+        self.icann_url = self.icann_url.partial(
+            base_url=_get_root_url(self.base_url)
+        )
+
+        # Credentials travel with each request rather than on the session,
+        # so the session can be shared between clients for different tlds
+        self.auth = (self.rri_user, self.rri_pass)
 
         self.url = self.icann_url.partial(tld=tld)
 
-        self.report = EscrowReport(self.client, self.url)
-        self.notification = EscrowNotification(self.client, self.url)
-        self.functions = RegistryFunctions(self.client, self.url)
-        self.transactions = PerRegistrarTransactions(self.client, self.url)
+        self.cache = cache
+        self.retry = retry
+        self.hooks = list(hooks) if hooks else []
+        self.validate = validate
+        self.breaker = breaker
+
+        options = {'auth': self.auth, 'tld': self.tld, 'cache': self.cache,
+                   'retry': self.retry, 'hooks': self.hooks,
+                   'validate': self.validate, 'breaker': self.breaker}
+
+        self.report = EscrowReport(self.client, self.url, **options)
+        self.notification = EscrowNotification(self.client, self.url,
+                                               **options)
+        self.functions = RegistryFunctions(self.client, self.url, **options)
+        self.transactions = PerRegistrarTransactions(self.client, self.url,
+                                                     **options)
+
+        self.resources = {
+            resource.resource_name: resource
+            for resource in (self.report, self.notification, self.functions,
+                             self.transactions)
+        }
 
     def _get_default_useragent(self, name='python-rri'):
-        return f'{name}/{__version__}'
+        return _get_default_useragent(name)
 
     def __repr__(self):
         return f'RRIClient("{self.tld}", "{self.rri_user}", "{self.rri_pass}")'
 
 
 class RRIResponse:
-    def __init__(self, success, response_body):
+    """
+    Outcome of a submission
+
+    The response body is kept as the bytes received and only decoded when
+    ``response_body`` is read, so keeping many responses is cheap. Bodies
+    are decoded with the charset of their Content-Type, or UTF-8 if it has
+    none, whichever transport received them.
+
+    :param bool success: True if the report was accepted
+    :param response_body: body of the response
+    :type response_body: ``bytes`` or ``str``
+    :param int retries: number of retries made
+    :param float retry_time: seconds spent waiting between retries
+    :param bool deduplicated: True if the report wasn't uploaded because
+        it's unchanged since it was last accepted
+    :param str encoding: encoding of a ``bytes`` body
+    """
+    __slots__ = ('success', 'content', 'encoding', 'retries', 'retry_time',
+                 'deduplicated')
+
+    def __init__(self, success, response_body, retries=0, retry_time=0.0,
+                 deduplicated=False, encoding=None):
         self.success = success
-        self.response_body = response_body
+        self.encoding = encoding or 'utf-8'
+        self.content = response_body.encode(self.encoding) \
+            if isinstance(response_body, str) else (response_body or b'')
+        self.retries = retries
+        self.retry_time = retry_time
+        self.deduplicated = deduplicated
+
+    @property
+    def response_body(self) -> str:
+        return self.content.decode(self.encoding, errors='replace')
+
+    @response_body.setter
+    def response_body(self, value):
+        self.content = value.encode(self.encoding) \
+            if isinstance(value, str) else (value or b'')
+
+    def errors(self):
+        """Iterate over the problems listed in a rejected report's response
+
+        :return: iterator of ``rri.validate.ReportError``
+        """
+        if self.success:
+            return iter(())
+
+        from .validate import parse_errors
+        return parse_errors(self.content, self.encoding)
+
+    def __repr__(self):
+        return f'RRIResponse(success={self.success!r}, ' \
+            f'{len(self.content)} bytes)'
 
 
 class RRIResource:
@@ -72,9 +188,23 @@ class RRIResource:
     resource_name = ''
     date_format = ''
     content_type = ''
+    coalescer_class = Coalescer
 
-    def __init__(self, client, url: URITemplate):
+    def __init__(self, client, url: URITemplate, auth=None, tld=None,
+                 cache=None, retry=None, hooks=None, validate=False,
+                 breaker=None):
         self.client = client
+        self.auth = auth
+        self.tld = tld
+        self.cache = cache
+        self.retry = retry
+        self.hooks = hooks if hooks is not None else []
+        self.validate = validate
+        self.breaker = breaker
+
+        # Checks in progress, shared by the threads using this client only,
+        # since clients can differ in retries, breakers and hooks
+        self.in_flight = self.coalescer_class()
 
         self.info_url = url.partial(info='info', resource=self.resource_name)
 
@@ -83,6 +213,140 @@ class RRIResource:
         submit_url = url.expand(info=None, resource=self.resource_name)
         self.submit_url = URITemplate(submit_url + '{/id}')
 
+        # Only the id varies between requests, so expand everything else
+        # once and append the id as the templates' {/id} would
+        self._info_prefix = self.info_url.expand()
+        self._submit_prefix = submit_url
+
+        # One circuit per resource endpoint, shared by every tld
+        self.breaker_key = submit_url.rsplit('/', 1)[0]
+
+    @staticmethod
+    def _build_url(prefix, id=None) -> str:
+        if id is None:
+            return prefix
+
+        return prefix + '/' + quote(str(id), safe='')
+
+    def _get_info_url(self, id) -> str:
+        return self._build_url(self._info_prefix, id)
+
+    def _get_submit_url(self, id=None) -> str:
+        return self._build_url(self._submit_prefix, id)
+
+    def _send(self, method, url, **kwargs):
+        return self.client.request(method, url, auth=self.auth, **kwargs)
+
+    def _send_through_breaker(self, method, url, **kwargs):
+        return self.breaker.call(self.breaker_key, self._send, method, url,
+                                 **kwargs)
+
+    def _request(self, method, url, **kwargs):
+        # Each attempt passes through the breaker, so retries stop once it
+        # opens
+        send = self._send_through_breaker if self.breaker else self._send
+
+        if self.retry:
+            return self.retry.call(send, method, url, **kwargs)
+
+        return send(method, url, **kwargs)
+
+    def _emit(self, event):
+        for hook in self.hooks:
+            try:
+                hook(event)
+            except Exception:
+                logger.exception('RRI hook %r failed', hook)
+
+    def _perform(self, method, url, handle_status, data=None, **kwargs):
+        """Send a request and map its status, reporting it to the hooks
+
+        :return: the response and the result of ``handle_status``
+        """
+        if not self.hooks:
+            request = self._request(method, url, data=data, **kwargs)
+            return request, handle_status(request.status_code)
+
+        bytes_sent = report_length(data)
+        if bytes_sent is None:
+            data = CountingIterator(data)
+
+        request = None
+        exception = None
+        started = time.perf_counter()
+        try:
+            request = self._request(method, url, data=data, **kwargs)
+            return request, handle_status(request.status_code)
+        except Exception as e:
+            exception = type(e)
+            raise
+        finally:
+            elapsed = getattr(request, 'elapsed', None)
+
+            self._emit(RRIEvent(
+                tld=self.tld,
+                resource=self.resource_name,
+                method=method,
+                status=getattr(request, 'status_code', None),
+                exception=exception,
+                bytes_sent=data.count if bytes_sent is None else bytes_sent,
+                connect=getattr(request, 'connect', None),
+                ttfb=elapsed.total_seconds() if elapsed else None,
+                total=time.perf_counter() - started,
+                retries=getattr(request, 'retries', 0),
+            ))
+
+    def _submit(self, method, url, report, period=None,
+                force=False) -> RRIResponse:
+        headers = {
+            'Content-type': self.content_type,
+            'Accept': self.content_type
+        }
+
+        # Accepted reports are indexed by digest when there's a cache, so
+        # an unchanged report isn't uploaded again
+        dedup = self.cache is not None and period is not None
+
+        with open_report(report) as body:
+            digest = None
+            if dedup and _is_rereadable(body):
+                digest = report_digest(body)
+                cached = None if force else self.cache.get_submission(
+                    self.tld, self.resource_name, period, digest
+                )
+                if cached is not None:
+                    return RRIResponse(True, cached, deduplicated=True)
+
+            if self.validate:
+                # Only load the validators when they're used
+                from .validate import validate_body
+                body = validate_body(self.resource_name, body)
+
+            if dedup and digest is None:
+                body = digest = HashingIterator(body)
+
+            request, success = self._perform(method, url,
+                                             self._submit_status,
+                                             data=body,
+                                             headers=headers)
+
+        if isinstance(digest, HashingIterator):
+            digest = digest.hexdigest()
+
+        # requests gives text/* bodies without a charset ISO-8859-1, so
+        # read the charset from the header for every transport alike
+        encoding = _get_charset(request.headers.get('Content-Type') or '')
+        response = RRIResponse(success, request.content,
+                               retries=getattr(request, 'retries', 0),
+                               retry_time=getattr(request, 'retry_time', 0.0),
+                               encoding=encoding)
+
+        if success and digest:
+            self.cache.set_submission(self.tld, self.resource_name, period,
+                                      digest, response.response_body)
+
+        return response
+
     def _raise_status(self, status):
         if status == 400: raise InvalidInput
         if status == 401: raise InvalidTldCredentials
@@ -109,16 +373,21 @@ class RRIResource:
         if not date:
             return dt.strftime(dt.now(), self.date_format)
 
-        if isinstance(date, str):
-            # Make sure it's a valid date string
-            try:
-                parsed_date = dt.strptime(date, self.date_format)
-            except ValueError:
-                raise
+        return _format_period(self.date_format, date)
+
+    def _iter_periods(self, start, end):
+        start = dt.strptime(self._get_date_string(start), self.date_format)
+        end = dt.strptime(self._get_date_string(end), self.date_format)
+        daily = '%d' in self.date_format
 
-            return dt.strftime(parsed_date, self.date_format)
+        while start <= end:
+            yield dt.strftime(start, self.date_format)
 
-        return dt.strftime(date, self.date_format)
+            if daily:
+                start += timedelta(days=1)
+            else:
+                start = start.replace(year=start.year + start.month // 12,
+                                      month=start.month % 12 + 1)
 
     def check(self, date=None):
         """Check the status of a resource endpoint
@@ -131,38 +400,154 @@ class RRIResource:
         """
         try:
             url_date = self._get_date_string(date)
-            check_url = self.info_url.expand(id=url_date)
 
-            request = self.client.head(check_url)
+            if self.cache:
+                cached = self.cache.get(self.tld, self.resource_name,
+                                        url_date)
+                if cached is not None:
+                    return cached
 
-            return self._check_status(request.status_code)
+            check_url = self._get_info_url(url_date)
+
+            return self._coalesced_check(check_url, url_date)
         except ValueError:
             raise
         except RRIException:
             raise
 
-    def submit(self, report, date=None) -> RRIResponse:
+    def _coalesced_check(self, check_url, url_date) -> bool:
+        """Check, sharing the request of an identical check in flight
+
+        The check making the request reports it to the hooks, and each
+        check sharing it reports an event marked ``coalesced``.
+        """
+        if not self.hooks:
+            return self.in_flight.call(check_url, self._check, check_url,
+                                       url_date)
+
+        led = []
+
+        def lead():
+            led.append(True)
+            return self._check(check_url, url_date)
+
+        exception = None
+        started = time.perf_counter()
+        try:
+            return self.in_flight.call(check_url, lead)
+        except Exception as e:
+            exception = type(e)
+            raise
+        finally:
+            if not led:
+                self._emit(RRIEvent(
+                    tld=self.tld,
+                    resource=self.resource_name,
+                    method='HEAD',
+                    status=None,
+                    exception=exception,
+                    total=time.perf_counter() - started,
+                    coalesced=True,
+                ))
+
+    def _check(self, check_url, url_date) -> bool:
+        _, result = self._perform('HEAD', check_url, self._check_status,
+                                  allow_redirects=False)
+
+        if self.cache:
+            self.cache.set(self.tld, self.resource_name, url_date, result)
+
+        return result
+
+    def _index_periods(self, dates):
+        """Map dates to their period strings, keeping those that can't be
+        formatted with their exception
+
+        :return: mapping of date string to None, or to the exception for
+            that date, and the period strings to check
+        """
+        results = {}
+
+        for date in dates:
+            try:
+                results[self._get_date_string(date)] = None
+            except (ValueError, TypeError) as e:
+                results[date] = e
+
+        periods = [period for period, result in results.items()
+                   if result is None]
+
+        return results, periods
+
+    def check_many(self, dates, max_workers=DEFAULT_MAX_WORKERS) -> dict:
+        """Check the status of a resource endpoint for many dates
+
+        Checks run concurrently, and a failure for one date is returned in
+        place of its status rather than raised.
+
+        :param dates: The dates to check
+        :type dates: iterable of ``str`` or ``datetime.datetime``
+        :param int max_workers: maximum number of concurrent checks
+        :return: mapping of date string to True if HTTP/200, False if
+            HTTP/404, or the exception raised for that date
+        :rtype: ``dict``
+        """
+        results, periods = self._index_periods(dates)
+
+        def check(period):
+            try:
+                return self.check(period)
+            except Exception as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results.update(zip(periods, executor.map(check, periods)))
+
+        return results
+
+    def check_range(self, start, end,
+                    max_workers=DEFAULT_MAX_WORKERS) -> dict:
+        """Check the status of a resource endpoint for a range of dates
+
+        Every period between start and end inclusive is checked, daily or
+        monthly depending on the resource.
+
+        :param start: The first date to check
+        :type start: ``str`` or ``datetime.datetime``
+        :param end: The last date to check
+        :type end: ``str`` or ``datetime.datetime``
+        :param int max_workers: maximum number of concurrent checks
+        :return: mapping of date string to status, see ``check_many``
+        :rtype: ``dict``
+        """
+        return self.check_many(self._iter_periods(start, end),
+                               max_workers=max_workers)
+
+    def submit(self, report, date=None, force=False) -> RRIResponse:
         """Submit a report to the resource endpoint
 
-        :param report:
+        With a cache, a report identical to the last one accepted for the
+        period isn't uploaded again, and the earlier response is returned
+        with ``deduplicated`` set.
+
+        :param report: the report, or a path, binary file or iterable of
+            ``bytes`` to stream it from
+        :type report: ``str``, ``bytes``, ``os.PathLike``, file or iterable
         :param date:
+        :param bool force: upload the report even if it's unchanged
         :return:
         """
         try:
-            headers = {
-                'Content-type': self.content_type,
-                'Accept': self.content_type
-            }
-
             url_date = self._get_date_string(date)
-            submit_url = self.submit_url.expand(id=url_date)
+            submit_url = self._get_submit_url(url_date)
 
-            request = self.client.put(submit_url,
-                                      data=report,
-                                      headers=headers)
+            response = self._submit('PUT', submit_url, report,
+                                    period=url_date, force=force)
 
-            success = self._submit_status(request.status_code)
-            return RRIResponse(success, request.text)
+            if self.cache and response.success:
+                self.cache.set(self.tld, self.resource_name, url_date, True)
+
+            return response
         except ValueError:
             raise
         except RRIException:
@@ -177,29 +562,22 @@ class EscrowReport(RRIResource):
     date_format = '%Y-%m-%d'
     content_type = 'text/xml'
 
-    def submit(self, report, id) -> RRIResponse:
+    def submit(self, report, id, force=False) -> RRIResponse:
         """Submit a registry escrow report passed in as report
 
-        :param report:
-        :type report: ``str``
+        :param report: the report, or a path, binary file or iterable of
+            ``bytes`` to stream it from
+        :type report: ``str``, ``bytes``, ``os.PathLike``, file or iterable
         :param id:
         :type id: ``str``
+        :param bool force: upload the report even if it's unchanged
         :return: ``RRIResponse``
         """
         try:
-            headers = {
-                'Content-type': self.content_type,
-                'Accept': self.content_type
-            }
-
-            submit_url = self.submit_url.expand(id=id)
+            submit_url = self._get_submit_url(id)
 
-            request = self.client.put(submit_url,
-                                      data=report,
-                                      headers=headers)
-
-            success = self._submit_status(request.status_code)
-            return RRIResponse(success, request.text)
+            return self._submit('PUT', submit_url, report, period=str(id),
+                                force=force)
         except RRIException:
             raise
 
@@ -215,25 +593,15 @@ class EscrowNotification(RRIResource):
     def submit(self, report) -> RRIResponse:
         """Submit an escrow agent notification passed in as report
 
-        :param report:
-        :type report: ``str``
+        :param report: the report, or a path, binary file or iterable of
+            ``bytes`` to stream it from
+        :type report: ``str``, ``bytes``, ``os.PathLike``, file or iterable
         :return: ``RRIResponse``
         """
         try:
-            headers = {
-                'Content-type': self.content_type,
-                'Accept': self.content_type
-            }
-
-            submit_url = self.submit_url.expand(id=None)
-
-            request = self.client.post(submit_url,
-                                       data=report,
-                                       headers=headers)
-
-            success = self._submit_status(request.status_code)
-            return RRIResponse(success, request.text)
+            submit_url = self._get_submit_url()
 
+            return self._submit('POST', submit_url, report)
         except RRIException:
             raise
 
@@ -0,0 +1,280 @@
+# -*- coding: utf-8 -*-
+import heapq
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime as dt, timedelta, timezone
+
+from .retry import TRANSIENT_ERRORS
+
+
+__all__ = ['Scheduler', 'WorkItem', 'get_deadline']
+
+MONTHLY_RESOURCES = ('registry-functions-activity', 'registrar-transactions')
+DAILY_RESOURCES = ('registry-escrow-report', 'escrow-agent-notification')
+
+# Monthly reports are due by the end of the 20th of the following month
+MONTHLY_DUE_DAY = 20
+
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_RETRY_DELAY = 30.0
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+REJECTED = 'rejected'
+FAILED = 'failed'
+
+logger = logging.getLogger(__name__)
+
+
+def _parse_day(period):
+    """Parse a daily period, or the date an escrow deposit id starts with"""
+    if not isinstance(period, str):
+        return None
+
+    for text, date_format in ((period, '%Y-%m-%d'), (period[:8], '%Y%m%d')):
+        try:
+            return dt.strptime(text, date_format)
+        except ValueError:
+            pass
+
+    return None
+
+
+def get_deadline(resource_name, period):
+    """Return when ICANN expects a report
+
+    Monthly reports are due by the end of the 20th day of the following
+    month, and daily escrow reports and notifications by the end of the
+    day after the deposit. Escrow report ids are read as a date when they
+    start with one, e.g. ``20180809001``.
+
+    :param str resource_name: resource name
+    :param str period: date string, or escrow deposit id, or None
+    :return: the deadline in UTC, or None if the period isn't a date
+    :rtype: ``datetime.datetime``
+    """
+    if resource_name in MONTHLY_RESOURCES:
+        month = dt.strptime(period, '%Y-%m')
+        year = month.year + month.month // 12
+        due = dt(year, month.month % 12 + 1, MONTHLY_DUE_DAY)
+    elif resource_name in DAILY_RESOURCES:
+        day = _parse_day(period)
+        if day is None:
+            return None
+        due = day + timedelta(days=1)
+    else:
+        raise ValueError(f'Unknown resource {resource_name}')
+
+    return (due + timedelta(days=1)).replace(tzinfo=timezone.utc)
+
+
+class WorkItem:
+    """
+    A report waiting to be submitted by a ``Scheduler``
+
+    :param str tld: tld
+    :param str resource: resource name
+    :param str period: date string, or escrow deposit id
+    :param report: the report, anything ``submit()`` accepts that can be
+        read again if the submission is retried, e.g. a path
+    :param deadline: when the report is due, in UTC
+    :type deadline: ``datetime.datetime``
+    """
+    __slots__ = ('tld', 'resource', 'period', 'report', 'deadline',
+                 'state', 'attempts', 'response', 'error', 'finished')
+
+    def __init__(self, tld, resource, period, report, deadline):
+        self.tld = tld
+        self.resource = resource
+        self.period = period
+        self.report = report
+        self.deadline = deadline
+        self.state = QUEUED
+        self.attempts = 0
+        self.response = None
+        self.error = None
+        self.finished = None
+
+    @property
+    def overdue(self):
+        """True if the item finished, or is still waiting, past its
+        deadline
+        """
+        when = self.finished or dt.now(timezone.utc)
+        return when > self.deadline
+
+    def __repr__(self):
+        return f'WorkItem({self.resource}/{self.tld}/{self.period} ' \
+            f'{self.state} due {self.deadline:%Y-%m-%d %H:%M})'
+
+
+class Scheduler:
+    """
+    Submit reports in order of their deadlines through a bounded pool
+
+    Whenever a worker is free it takes the queued report closest to its
+    deadline, so when the RRI is slow or failing the most urgent reports
+    go first. Reports that fail with a server or connection error are
+    queued again after ``retry_delay`` seconds, up to ``max_attempts``
+    attempts in total. Rejected reports aren't retried.
+
+    :param fleet: ``RRIFleet``, or a mapping of tld to ``RRIClient``
+    :param int max_workers: maximum number of concurrent submissions
+    :param int max_attempts: attempts before a report is marked failed
+    :param float retry_delay: seconds before a failed report is queued
+        again
+    """
+    def __init__(self, fleet, max_workers=DEFAULT_MAX_WORKERS,
+                 max_attempts=DEFAULT_MAX_ATTEMPTS,
+                 retry_delay=DEFAULT_RETRY_DELAY):
+        self.fleet = fleet
+        self.max_workers = max_workers
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+
+        # Ready items by deadline, and items waiting to retry by time
+        self._queue = []
+        self._delayed = []
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def add(self, tld, resource, period, report, deadline=None) -> WorkItem:
+        """Queue a report
+
+        :param str tld: tld
+        :param str resource: resource name, e.g. ``registrar-transactions``
+        :param str period: date string, or escrow deposit id
+        :param report: the report, see ``WorkItem``
+        :param deadline: override when the report is due
+        :type deadline: ``datetime.datetime``
+        :return: ``WorkItem``
+        """
+        if deadline is None:
+            # Reports without a dated period are due straight away
+            deadline = get_deadline(resource, period) or dt.now(timezone.utc)
+        elif deadline.tzinfo is None:
+            deadline = deadline.replace(tzinfo=timezone.utc)
+
+        item = WorkItem(tld, resource, period, report, deadline)
+        self._push(item)
+
+        return item
+
+    def _push(self, item):
+        with self._lock:
+            heapq.heappush(self._queue,
+                           (item.deadline, next(self._counter), item))
+
+    def _delay(self, item):
+        with self._lock:
+            heapq.heappush(self._delayed,
+                           (time.monotonic() + self.retry_delay,
+                            next(self._counter), item))
+
+    def _pop(self):
+        """Return the most urgent ready item, or None"""
+        with self._lock:
+            now = time.monotonic()
+            while self._delayed and self._delayed[0][0] <= now:
+                _, count, item = heapq.heappop(self._delayed)
+                heapq.heappush(self._queue, (item.deadline, count, item))
+
+            if self._queue:
+                return heapq.heappop(self._queue)[2]
+
+        return None
+
+    def _next_retry(self):
+        with self._lock:
+            if not self._delayed:
+                return None
+
+            return max(0.0, self._delayed[0][0] - time.monotonic())
+
+    def __len__(self):
+        with self._lock:
+            return len(self._queue) + len(self._delayed)
+
+    def _submit(self, item):
+        resource = self.fleet[item.tld].resources[item.resource]
+
+        if item.resource == 'escrow-agent-notification':
+            return resource.submit(item.report)
+
+        return resource.submit(item.report, item.period)
+
+    def _finish(self, item, state):
+        item.state = state
+        item.finished = dt.now(timezone.utc)
+
+        if item.overdue:
+            logger.warning('%r finished after its deadline', item)
+
+    def _run_item(self, item):
+        """Submit an item, returning it if it's finished or None if it was
+        queued again
+        """
+        item.attempts += 1
+
+        try:
+            item.response = self._submit(item)
+        except TRANSIENT_ERRORS as e:
+            item.error = e
+
+            if item.attempts < self.max_attempts:
+                item.state = QUEUED
+                self._delay(item)
+                return None
+            else:
+                self._finish(item, FAILED)
+        except Exception as e:
+            logger.warning('Submitting %r failed', item, exc_info=True)
+            item.error = e
+            self._finish(item, FAILED)
+        else:
+            item.error = None
+            self._finish(item, DONE if item.response.success else REJECTED)
+
+        return item
+
+    def run(self):
+        """Submit every queued report, including retries
+
+        :return: the items finished, in the order they finished
+        :rtype: ``list`` of ``WorkItem``
+        """
+        finished = []
+        running = set()
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while True:
+                while len(running) < self.max_workers:
+                    item = self._pop()
+                    if item is None:
+                        break
+
+                    item.state = RUNNING
+                    running.add(executor.submit(self._run_item, item))
+
+                if not running:
+                    delay = self._next_retry()
+                    if delay is None:
+                        break
+
+                    time.sleep(delay)
+                    continue
+
+                done, running = wait(running, timeout=self._next_retry(),
+                                     return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    item = future.result()
+                    if item is not None:
+                        finished.append(item)
+
+        return finished
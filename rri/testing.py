@@ -0,0 +1,423 @@
+# -*- coding: utf-8 -*-
+"""Local stand-in for the ICANN RRI API, for tests and load tests.
+
+Use it in-process::
+
+    from rri.testing import FakeRRIServer
+
+    with FakeRRIServer(latency=0.01) as server:
+        rric = RRIClient('example', 'user', 'pass', base_url=server.base_url)
+
+or run it on its own with::
+
+    python -m rri.testing --port 8080 --latency 0.02 --status 200=95,500=5
+"""
+import argparse
+import base64
+import random
+import re
+import socket
+import socketserver
+import threading
+import time
+from collections import deque
+from datetime import datetime as dt, timezone
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from .exception import InvalidReport
+from .validate import get_validator
+
+
+__all__ = ['FakeRRIServer', 'RecordedRequest', 'parse_status_mix']
+
+URL_PATTERN = re.compile(
+    r'^(?P<info>/info)?/report/(?P<resource>[^/]+)/(?P<tld>[^/]+)'
+    r'(?:/(?P<id>[^/]+))?$'
+)
+RESOURCE_NAMES = ('registry-escrow-report', 'escrow-agent-notification',
+                  'registry-functions-activity', 'registrar-transactions')
+READ_SIZE = 1024 * 1024
+# Escrow reports are checked by the date of their watermark, found near
+# the start of the report
+WATERMARK_PATTERN = re.compile(
+    rb'<(?:[\w.-]+:)?watermark>\s*(\d{4}-\d{2}-\d{2})'
+)
+HEAD_SIZE = 64 * 1024
+DEFAULT_LOG_SIZE = 10000
+
+
+def parse_status_mix(value):
+    """Parse ``200=95,500=5`` into a mapping of status to weight"""
+    mix = {}
+    for item in value.split(','):
+        status, _, weight = item.partition('=')
+        mix[int(status)] = float(weight or 1)
+
+    return mix
+
+
+class RecordedRequest:
+    """
+    A request received by a ``FakeRRIServer``
+
+    :param str method: HTTP method
+    :param str path: request path
+    :param str tld: tld, or None if the path isn't an RRI url
+    :param str resource: resource name
+    :param str period: period or deposit id in the url
+    :param str user: username sent with Basic authentication
+    :param int bytes_received: size of the request body
+    :param int status: HTTP status sent, or None if the connection was
+        dropped
+    :param float received: time the request was received
+    """
+    __slots__ = ('method', 'path', 'tld', 'resource', 'period', 'user',
+                 'bytes_received', 'status', 'received')
+
+    def __init__(self, method, path, tld=None, resource=None, period=None,
+                 user=None, bytes_received=0, status=None, received=None):
+        self.method = method
+        self.path = path
+        self.tld = tld
+        self.resource = resource
+        self.period = period
+        self.user = user
+        self.bytes_received = bytes_received
+        self.status = status
+        self.received = received
+
+    def __repr__(self):
+        return f'RecordedRequest({self.method} {self.path} {self.status})'
+
+
+class FakeRRIRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_body(self, validator):
+        """Read the request body, feeding it to the validator if any
+
+        :return: the size of the body, the problems found in it, and its
+            first ``HEAD_SIZE`` bytes
+        """
+        received = 0
+        errors = []
+        head = bytearray()
+
+        def consume(chunk):
+            nonlocal validator
+            if len(head) < HEAD_SIZE:
+                head.extend(chunk[:HEAD_SIZE - len(head)])
+
+            if validator is None:
+                return
+
+            # Keep reading the body once it's invalid, to keep the
+            # connection usable
+            try:
+                validator.feed(chunk)
+            except InvalidReport as e:
+                errors.extend(e.errors)
+                validator = None
+
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            while True:
+                size = int(self.rfile.readline().split(b';')[0], 16)
+                if not size:
+                    self.rfile.readline()
+                    break
+
+                while size:
+                    chunk = self.rfile.read(min(size, READ_SIZE))
+                    size -= len(chunk)
+                    received += len(chunk)
+                    consume(chunk)
+
+                self.rfile.readline()
+        else:
+            remaining = int(self.headers.get('Content-Length', 0))
+            while remaining:
+                chunk = self.rfile.read(min(remaining, READ_SIZE))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                received += len(chunk)
+                consume(chunk)
+
+        if validator is not None:
+            try:
+                validator.close()
+            except InvalidReport as e:
+                errors.extend(e.errors)
+
+        return received, errors, bytes(head)
+
+    def _user(self):
+        scheme, _, token = self.headers.get('Authorization', '').partition(' ')
+        if scheme.lower() != 'basic':
+            return None, None
+
+        try:
+            decoded = base64.b64decode(token).decode('utf-8')
+        except ValueError:
+            return None, None
+
+        user, _, password = decoded.partition(':')
+        return user, password
+
+    def _drop(self):
+        self.close_connection = True
+        try:
+            self.connection.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def _respond(self, submit):
+        server = self.server
+        match = URL_PATTERN.match(self.path)
+        user, password = self._user()
+
+        record = RecordedRequest(self.command, self.path, user=user,
+                                 received=time.time())
+        if match:
+            record.tld = match.group('tld')
+            record.resource = match.group('resource')
+            record.period = match.group('id')
+
+        validator = None
+        if server.validate and submit and match and \
+                not match.group('info') and record.resource in RESOURCE_NAMES:
+            validator = get_validator(record.resource)
+
+        record.bytes_received, errors, head = self._read_body(validator)
+        body = ''.join(f'{error}\n' for error in errors).encode()
+
+        watermark = WATERMARK_PATTERN.search(head)
+        status = server.choose_status(
+            self.command, match, submit, user, password, record,
+            bool(errors), watermark.group(1).decode() if watermark else None
+        )
+        if status != 400:
+            body = b''
+
+        if server.latency:
+            time.sleep(server.latency)
+
+        if status is None:
+            server.record(record)
+            self._drop()
+            return
+
+        record.status = status
+        server.record(record)
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/plain; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def do_HEAD(self):
+        self._respond(submit=False)
+
+    def do_PUT(self):
+        self._respond(submit=True)
+
+    def do_POST(self):
+        self._respond(submit=True)
+
+
+class FakeRRIServer(socketserver.ThreadingMixIn, HTTPServer):
+    """
+    Threaded HTTP server behaving like the ICANN RRI
+
+    Accepted reports are remembered per tld, resource and period, so a
+    check returns HTTP/200 once the report has been submitted and
+    HTTP/404 before. Escrow reports are submitted by deposit id but
+    checked by date, so they're filed under the date of their watermark,
+    and escrow notifications and reports without a watermark under the
+    day they arrive. Faults can be injected with ``status_mix``, ``drop_rate``,
+    ``fail_next()`` and ``drop_next()``, and every request is kept in
+    ``log``.
+
+    :param int port: port to listen on, 0 picks a free port
+    :param float latency: seconds to wait before each response
+    :param dict status_mix: mapping of HTTP status to relative weight,
+        HTTP/200 meaning the request is handled normally
+    :param float drop_rate: fraction of requests whose connection is
+        closed without a response
+    :param credentials: mapping of tld to ``(rri_user, rri_pass)``, any
+        credentials are accepted if None
+    :param bool validate: reject invalid reports with HTTP/400, listing
+        the problems found by ``rri.validate``
+    :param int log_size: number of requests kept in ``log``
+    """
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, port=0, latency=0.0, status_mix=None, drop_rate=0.0,
+                 credentials=None, validate=False, log_size=DEFAULT_LOG_SIZE):
+        super().__init__(('127.0.0.1', port), FakeRRIRequestHandler)
+        self.latency = latency
+        self.status_mix = status_mix or {200: 1}
+        self.drop_rate = drop_rate
+        self.credentials = dict(credentials) if credentials else None
+        self.validate = validate
+
+        self.reports = {}
+        # Date each escrow report was filed under, by tld and deposit id
+        self.deposits = {}
+        self.log = deque(maxlen=log_size)
+        self.requests = 0
+        self.bytes_received = 0
+
+        self._statuses = list(self.status_mix)
+        self._weights = list(self.status_mix.values())
+        self._faults = deque()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return 'http://{}:{}'.format(*self.server_address)
+
+    def fail_next(self, count=1, status=500):
+        """Answer the next requests with an error status
+
+        :param int count: number of requests
+        :param int status: HTTP status to send
+        """
+        with self._lock:
+            self._faults.extend([status] * count)
+
+    def drop_next(self, count=1):
+        """Close the connection of the next requests without a response
+
+        :param int count: number of requests
+        """
+        with self._lock:
+            self._faults.extend([None] * count)
+
+    def accepted(self, tld, resource, period):
+        """Return True if a report has been accepted
+
+        :param str tld: tld
+        :param str resource: resource name
+        :param str period: date string, or escrow deposit id
+        :rtype: ``bool``
+        """
+        with self._lock:
+            if resource == 'registry-escrow-report':
+                period = self.deposits.get((tld, period), period)
+
+            return (tld, resource, period) in self.reports
+
+    def _authorized(self, tld, user, password):
+        if self.credentials is None:
+            return user is not None
+
+        return self.credentials.get(tld) == (user, password)
+
+    def choose_status(self, method, match, submit, user, password, record,
+                      invalid=False, watermark=None):
+        """Pick the response to a request, updating the stored reports
+
+        :param str watermark: date of a submitted escrow report's
+            watermark
+        :return: HTTP status, or None to drop the connection
+        """
+        with self._lock:
+            if self._faults:
+                return self._faults.popleft()
+
+            if self.drop_rate and random.random() < self.drop_rate:
+                return None
+
+            status = random.choices(self._statuses, self._weights)[0]
+            if status != 200:
+                return status
+
+            if not match or match.group('resource') not in RESOURCE_NAMES:
+                return 404
+            if bool(match.group('info')) == submit:
+                return 405
+            if not self._authorized(record.tld, user, password):
+                return 401
+
+            if submit and invalid:
+                return 400
+
+            period = record.period
+            if submit and record.resource == 'escrow-agent-notification':
+                period = record.period = \
+                    dt.now(timezone.utc).strftime('%Y-%m-%d')
+            elif submit and record.resource == 'registry-escrow-report':
+                period = watermark or \
+                    dt.now(timezone.utc).strftime('%Y-%m-%d')
+                self.deposits[(record.tld, record.period)] = period
+
+            key = (record.tld, record.resource, period)
+            if submit:
+                self.reports[key] = record.bytes_received
+                return 200
+
+            return 200 if key in self.reports else 404
+
+    def record(self, record):
+        with self._lock:
+            self.requests += 1
+            self.bytes_received += record.bytes_received
+            self.log.append(record)
+
+    def reset(self):
+        """Forget every accepted report, pending fault and logged request"""
+        with self._lock:
+            self.reports.clear()
+            self.deposits.clear()
+            self.log.clear()
+            self._faults.clear()
+            self.requests = 0
+            self.bytes_received = 0
+
+    def start(self):
+        # Poll often so that stopping the server doesn't hold up tests
+        self._thread = threading.Thread(target=self.serve_forever,
+                                        args=(0.05,), daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--status', type=parse_status_mix, default='200=1')
+    parser.add_argument('--drop-rate', type=float, default=0.0)
+    parser.add_argument('--validate', action='store_true')
+    args = parser.parse_args()
+
+    server = FakeRRIServer(args.port, args.latency, args.status,
+                           drop_rate=args.drop_rate, validate=args.validate)
+    print(f'Serving RRI on {server.base_url}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,433 @@
+# -*- coding: utf-8 -*-
+import base64
+import netrc
+import os
+import threading
+import time
+import urllib.request
+from datetime import timedelta
+from functools import lru_cache
+from urllib.parse import unquote
+
+import urllib3
+
+from . import __version__
+from .exception import TransportError, ConnectionFailed, RequestTimeout
+from .payload import report_length
+
+
+__all__ = ['Transport', 'Urllib3Transport', 'RequestsTransport',
+           'TransportResponse', 'as_transport', 'create_transport',
+           'create_session']
+
+DEFAULT_POOL_SIZE = 10
+
+
+def _get_default_useragent(name='python-rri'):
+    return f'{name}/{__version__}'
+
+
+@lru_cache(maxsize=1024)
+def _basic_auth_header(rri_user, rri_pass):
+    credentials = f'{rri_user}:{rri_pass}'.encode('latin1')
+    return 'Basic ' + base64.b64encode(credentials).decode('ascii')
+
+
+def _get_charset(content_type):
+    for parameter in content_type.split(';')[1:]:
+        name, _, value = parameter.partition('=')
+        if name.strip().lower() == 'charset':
+            return value.strip().strip('"\'') or None
+
+    return None
+
+
+def create_session(pool_size=DEFAULT_POOL_SIZE, user_agent=None):
+    """Create a pooled session suitable for sharing between clients
+
+    Credentials are not stored on the session, they are sent with each
+    request by the resource, so a single session can serve many tlds.
+
+    :param int pool_size: maximum number of connections kept per host
+    :param str user_agent: alternative User-Agent header
+    :return: ``requests.Session``
+    """
+    import requests
+
+    session = requests.session()
+    adapter = requests.adapters.HTTPAdapter(pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update({
+        'User-Agent': user_agent or _get_default_useragent()
+    })
+
+    return session
+
+
+# Seconds the current thread spent opening connections in its request
+_timing = threading.local()
+
+
+class _TimedConnectionMixin:
+    """Records the time taken to connect, including any TLS handshake"""
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            _timing.connect = getattr(_timing, 'connect', 0.0) + \
+                time.perf_counter() - started
+
+
+class _TimedHTTPConnection(_TimedConnectionMixin,
+                           urllib3.connection.HTTPConnection):
+    pass
+
+
+class _TimedHTTPSConnection(_TimedConnectionMixin,
+                            urllib3.connection.HTTPSConnection):
+    pass
+
+
+class _TimedHTTPConnectionPool(urllib3.HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(urllib3.HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+_TIMED_POOL_CLASSES = {
+    'http': _TimedHTTPConnectionPool,
+    'https': _TimedHTTPSConnectionPool,
+}
+
+
+class TransportResponse:
+    """
+    Response to a request sent by a ``Transport``
+
+    Has the attributes of a ``requests.Response`` that resources use.
+
+    :param int status_code: HTTP status
+    :param headers: case insensitive mapping of response headers
+    :param bytes content: response body
+    :param str encoding: charset of the body, or None if it isn't given
+    :param elapsed: time taken to receive the response headers
+    :type elapsed: ``datetime.timedelta``
+    :param float connect: seconds spent connecting, 0.0 if an open
+        connection was reused, or None if it isn't measured
+    """
+    __slots__ = ('status_code', 'headers', 'content', 'encoding', 'elapsed',
+                 'connect', 'retries', 'retry_time')
+
+    def __init__(self, status_code, headers, content, encoding=None,
+                 elapsed=None, connect=None):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.encoding = encoding
+        self.elapsed = elapsed
+        self.connect = connect
+        self.retries = 0
+        self.retry_time = 0.0
+
+    def __repr__(self):
+        return f'TransportResponse({self.status_code})'
+
+
+class Transport:
+    """
+    Sends the HTTP requests of RRI resources
+
+    A transport returns an object with the ``status_code``, ``headers``,
+    ``content``, ``encoding`` and ``elapsed`` attributes of a
+    ``requests.Response``, and raises ``rri.exception.ConnectionFailed``,
+    ``RequestTimeout`` or another ``TransportError`` when a request can't
+    be completed, so that retry policies and circuit breakers handle every
+    transport alike. One transport may be shared by clients for many tlds
+    and called from many threads at once.
+    """
+    def request(self, method, url, auth=None, data=None, headers=None,
+                allow_redirects=True):
+        """Send a request
+
+        :param str method: HTTP method
+        :param str url: url
+        :param auth: ``(rri_user, rri_pass)`` sent with Basic
+            authentication
+        :param data: body prepared by ``rri.payload.open_report``
+        :param dict headers: extra request headers
+        :param bool allow_redirects: follow redirects
+        :return: the response
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """Release the transport's connections"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class RequestsTransport(Transport):
+    """
+    Transport sending requests through a ``requests.Session``
+
+    requests is only imported by this transport, and its exceptions are
+    raised as the ``TransportError`` they correspond to.
+
+    :param session: session, or any object with the ``request()`` method
+        of one. A pooled session is created if None
+    :param int pool_size: maximum number of connections kept per host of
+        a created session
+    :param str user_agent: alternative User-Agent header of a created
+        session
+    """
+    def __init__(self, session=None, pool_size=DEFAULT_POOL_SIZE,
+                 user_agent=None):
+        if session is None:
+            session = create_session(pool_size, user_agent)
+
+        self.session = session
+
+    def request(self, method, url, **kwargs):
+        import requests
+
+        try:
+            return self.session.request(method, url, **kwargs)
+        except requests.Timeout as e:
+            raise RequestTimeout(e) from e
+        except requests.ConnectionError as e:
+            raise ConnectionFailed(e) from e
+        except requests.RequestException as e:
+            raise TransportError(e) from e
+
+    def close(self):
+        self.session.close()
+
+    def __repr__(self):
+        return f'RequestsTransport({self.session!r})'
+
+
+def _ca_certs(trust_env=True):
+    """Return the CA bundle requests would verify certificates with
+
+    :param bool trust_env: honour ``REQUESTS_CA_BUNDLE`` and
+        ``CURL_CA_BUNDLE``
+    :return: path of a file or directory, or None for the system default
+    """
+    if trust_env:
+        for name in ('REQUESTS_CA_BUNDLE', 'CURL_CA_BUNDLE'):
+            path = os.environ.get(name)
+            if path:
+                return path
+
+    try:
+        import certifi
+    except ImportError:
+        return None
+
+    return certifi.where()
+
+
+def _netrc_auth(host):
+    """Return the ``(login, password)`` given for host in ``$NETRC``, or
+    ``~/.netrc`` as requests would, or None
+    """
+    if os.environ.get('NETRC'):
+        paths = [os.environ['NETRC']]
+    else:
+        paths = [os.path.join(os.path.expanduser('~'), name)
+                 for name in ('.netrc', '_netrc')]
+
+    for path in paths:
+        try:
+            entry = netrc.netrc(path).authenticators(host)
+        except (OSError, netrc.NetrcParseError):
+            continue
+
+        if entry:
+            login, _, password = entry
+            return login, password
+
+    return None
+
+
+class Urllib3Transport(Transport):
+    """
+    Transport sending requests straight through a ``urllib3`` pool
+
+    Skips the hooks, cookie handling and header merging of ``requests``,
+    which are a large part of the cost of a HEAD check. Redirects aren't
+    followed, and retries are left to ``rri.retry.RetryPolicy``. Responses
+    report the time spent connecting in ``connect``.
+
+    Like ``requests``, it honours the environment unless ``trust_env`` is
+    False: proxies are taken from ``HTTP_PROXY``, ``HTTPS_PROXY`` and
+    ``NO_PROXY``, or the system settings, when the transport is created,
+    certificates are verified against ``REQUESTS_CA_BUNDLE`` or
+    ``CURL_CA_BUNDLE``, and requests made without credentials use those
+    in ``~/.netrc``. Otherwise certificates are verified against certifi's
+    bundle, if it's installed.
+
+    :param int pool_size: maximum number of connections kept per host
+    :param str user_agent: alternative User-Agent header
+    :param float timeout: seconds to wait for a connection or a response,
+        or None to wait indefinitely
+    :param bool trust_env: use proxies, CA bundles and credentials from
+        the environment
+    """
+    def __init__(self, pool_size=DEFAULT_POOL_SIZE, user_agent=None,
+                 timeout=None, trust_env=True):
+        self.pool_size = pool_size
+        self.trust_env = trust_env
+        self.timeout = urllib3.Timeout(connect=timeout, read=timeout)
+        self.headers = {
+            'User-Agent': user_agent or _get_default_useragent(),
+            'Accept-Encoding': 'gzip, deflate',
+        }
+
+        self.pool_kwargs = {'maxsize': pool_size}
+        ca_certs = _ca_certs(trust_env)
+        if ca_certs:
+            name = 'ca_cert_dir' if os.path.isdir(ca_certs) else 'ca_certs'
+            self.pool_kwargs[name] = ca_certs
+
+        self.pool = urllib3.PoolManager(**self.pool_kwargs)
+        self.pool.pool_classes_by_scheme = _TIMED_POOL_CLASSES
+
+        self.proxies = urllib.request.getproxies() if trust_env else {}
+        # Pool used for each (scheme, host), and the pool for each proxy
+        self._pools = {}
+        self._proxy_pools = {}
+        self._lock = threading.Lock()
+
+    def _proxy_pool(self, proxy):
+        with self._lock:
+            pool = self._proxy_pools.get(proxy)
+            if pool is not None:
+                return pool
+
+            url = urllib3.util.parse_url(
+                proxy if '://' in proxy else 'http://' + proxy)
+            headers = None
+            if url.auth:
+                headers = urllib3.make_headers(
+                    proxy_basic_auth=unquote(url.auth))
+                url = url._replace(auth=None)
+
+            pool = urllib3.ProxyManager(url.url, proxy_headers=headers,
+                                        **self.pool_kwargs)
+            pool.pool_classes_by_scheme = _TIMED_POOL_CLASSES
+            self._proxy_pools[proxy] = pool
+
+            return pool
+
+    def _pool_for(self, url):
+        """Return the pool to send a request for url through, the direct
+        pool or that of the proxy for its scheme and host
+        """
+        if not self.proxies:
+            return self.pool
+
+        url = urllib3.util.parse_url(url)
+        key = (url.scheme, url.host)
+
+        pool = self._pools.get(key)
+        if pool is None:
+            proxy = self.proxies.get(url.scheme) or self.proxies.get('all')
+
+            if proxy and not urllib.request.proxy_bypass(url.host):
+                pool = self._proxy_pool(proxy)
+            else:
+                pool = self.pool
+
+            self._pools[key] = pool
+
+        return pool
+
+    def _prepare(self, url, auth, data, headers):
+        request_headers = dict(self.headers)
+        if headers:
+            request_headers.update(headers)
+        if auth is None and self.trust_env:
+            auth = _netrc_auth(urllib3.util.parse_url(url).host)
+        if auth:
+            request_headers['Authorization'] = _basic_auth_header(*auth)
+
+        # urllib3 streams file objects with chunked encoding unless their
+        # length is given
+        length = report_length(data)
+        if length is not None and hasattr(data, 'read'):
+            request_headers['Content-Length'] = str(length)
+
+        return request_headers, length is None
+
+    def request(self, method, url, auth=None, data=None, headers=None,
+                allow_redirects=True):
+        request_headers, chunked = self._prepare(url, auth, data, headers)
+        pool = self._pool_for(url)
+        _timing.connect = 0.0
+        started = time.perf_counter()
+
+        try:
+            response = pool.urlopen(method, url, body=data,
+                                    headers=request_headers,
+                                    chunked=chunked, retries=False,
+                                    redirect=False, timeout=self.timeout,
+                                    preload_content=False)
+            elapsed = time.perf_counter() - started
+            try:
+                content = response.read()
+            finally:
+                response.release_conn()
+        # A failure to connect is also a ConnectTimeoutError to urllib3
+        except urllib3.exceptions.NewConnectionError as e:
+            raise ConnectionFailed(e) from e
+        except urllib3.exceptions.TimeoutError as e:
+            raise RequestTimeout(e) from e
+        except urllib3.exceptions.HTTPError as e:
+            raise ConnectionFailed(e) from e
+
+        return TransportResponse(
+            response.status, response.headers, content,
+            encoding=_get_charset(response.headers.get('Content-Type', '')),
+            elapsed=timedelta(seconds=elapsed), connect=_timing.connect,
+        )
+
+    def close(self):
+        self.pool.clear()
+        with self._lock:
+            for pool in self._proxy_pools.values():
+                pool.clear()
+
+    def __repr__(self):
+        return f'Urllib3Transport(pool_size={self.pool_size})'
+
+
+def create_transport(pool_size=DEFAULT_POOL_SIZE, user_agent=None):
+    """Create the default transport, suitable for sharing between clients
+
+    :param int pool_size: maximum number of connections kept per host
+    :param str user_agent: alternative User-Agent header
+    :return: ``Urllib3Transport``
+    """
+    return Urllib3Transport(pool_size=pool_size, user_agent=user_agent)
+
+
+def as_transport(client):
+    """Return a client as a transport, wrapping a ``requests.Session``
+
+    :param client: ``Transport``, or a session to wrap in a
+        ``RequestsTransport``
+    :return: ``Transport``
+    """
+    if isinstance(client, Transport):
+        return client
+
+    return RequestsTransport(client)
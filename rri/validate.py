@@ -0,0 +1,570 @@
+# -*- coding: utf-8 -*-
+import csv
+import re
+import xml.etree.ElementTree as ET
+
+from .exception import InvalidReport
+from .payload import open_report, _is_rereadable, _iter_chunks
+from .fields import TRANSACTION_FIELDS, FUNCTION_FIELDS
+
+
+__all__ = ['ReportError', 'parse_errors', 'validate_report', 'validate_body',
+           'get_validator', 'ValidatingIterator',
+           'TransactionsValidator', 'FunctionsValidator',
+           'EscrowReportValidator', 'XMLValidator']
+
+MAX_ERRORS = 100
+
+RDE_REPORT_NS = 'urn:ietf:params:xml:ns:rdeReport-1.0'
+RDE_HEADER_NS = 'urn:ietf:params:xml:ns:rdeHeader-1.0'
+
+# A line of an error response, e.g. "line 3: iana-id: must be unique"
+ERROR_LINE_PATTERN = re.compile(
+    r'^(?:line\s+(?P<line>\d+)\s*[:,]\s*)?'
+    r'(?:(?P<field>[\w.:-]+)\s*:\s+)?(?P<message>.+)$',
+    re.IGNORECASE
+)
+ERROR_ELEMENTS = ('error', 'msg')
+
+DATETIME_PATTERN = re.compile(
+    r'^-?\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}(\.\d+)?(Z|[+-]\d{2}:\d{2})?$'
+)
+
+
+class ReportError:
+    """
+    A problem found in a report
+
+    :param int line: line number, starting at 1, or None
+    :param str field: name of the field or element, or None
+    :param str message: description of the problem
+    """
+    __slots__ = ('line', 'field', 'message')
+
+    def __init__(self, line, field, message):
+        self.line = line
+        self.field = field
+        self.message = message
+
+    def __eq__(self, other):
+        if not isinstance(other, ReportError):
+            return NotImplemented
+
+        return (self.line, self.field, self.message) == \
+            (other.line, other.field, other.message)
+
+    def __str__(self):
+        location = []
+        if self.line is not None:
+            location.append(f'line {self.line}')
+        if self.field:
+            location.append(self.field)
+
+        return ': '.join(location + [self.message])
+
+    def __repr__(self):
+        return f'ReportError({self.line!r}, {self.field!r}, ' \
+            f'{self.message!r})'
+
+
+def _local_name(tag):
+    return tag.rpartition('}')[2]
+
+
+def _parse_xml_errors(root):
+    found = False
+
+    for element in root.iter():
+        if _local_name(element.tag) not in ERROR_ELEMENTS:
+            continue
+
+        message = ' '.join(''.join(element.itertext()).split())
+        if not message:
+            continue
+
+        line = element.get('line')
+        found = True
+        yield ReportError(int(line) if line and line.isdigit() else None,
+                          element.get('field') or element.get('element'),
+                          message)
+
+    if not found:
+        message = ' '.join(''.join(root.itertext()).split())
+        if message:
+            yield ReportError(None, None, message)
+
+
+def parse_errors(body, encoding='utf-8'):
+    """Parse the problems listed in the body of an HTTP/400 response
+
+    XML bodies yield an entry per ``error`` or ``msg`` element, taking the
+    line and field from its ``line`` and ``field`` attributes. Text bodies
+    yield an entry per line, in the form written by ``ReportError``, e.g.
+    ``line 3: iana-id: must be unique``.
+
+    :param body: the response body
+    :type body: ``bytes`` or ``str``
+    :param str encoding: encoding of a ``bytes`` body
+    :return: iterator of ``ReportError``
+    """
+    text = body.decode(encoding, errors='replace') \
+        if isinstance(body, (bytes, bytearray)) else body
+
+    if text.lstrip().startswith('<'):
+        try:
+            root = ET.fromstring(text.strip())
+        except ET.ParseError:
+            pass
+        else:
+            yield from _parse_xml_errors(root)
+            return
+
+    for line in text.splitlines():
+        match = ERROR_LINE_PATTERN.match(line.strip())
+        if not match:
+            continue
+
+        number = match.group('line')
+        yield ReportError(int(number) if number else None,
+                          match.group('field'), match.group('message'))
+
+
+class _Validator:
+    """
+    Single pass validator fed with a report in chunks
+
+    Call ``feed()`` with each chunk and ``close()`` at the end, either of
+    which raises ``InvalidReport`` once errors are found. Memory use
+    doesn't depend on the size of the report.
+    """
+    def __init__(self, max_errors=MAX_ERRORS):
+        self.max_errors = max_errors
+        self.errors = []
+
+    def error(self, line, field, message):
+        if len(self.errors) < self.max_errors:
+            self.errors.append(ReportError(line, field, message))
+
+    def raise_errors(self):
+        if self.errors:
+            raise InvalidReport(self.errors)
+
+    def feed(self, chunk):
+        raise NotImplementedError
+
+    def close(self):
+        raise NotImplementedError
+
+
+class _CSVValidator(_Validator):
+    """Base for the CSV reports, splitting chunks into parsed lines"""
+    header = ()
+    # Values other than integers a field may hold
+    special_values = {}
+
+    def __init__(self, max_errors=MAX_ERRORS):
+        super().__init__(max_errors)
+        self.line = 0
+        self._pending = b''
+
+    def feed(self, chunk):
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+
+        lines = (self._pending + bytes(chunk)).split(b'\n')
+        self._pending = lines.pop()
+
+        for line in lines:
+            self._parse(line)
+
+        self.raise_errors()
+
+    def close(self):
+        if self._pending.strip():
+            self._parse(self._pending)
+        self._pending = b''
+
+        self.finish()
+        self.raise_errors()
+
+    def _parse(self, line):
+        self.line += 1
+
+        try:
+            text = line.decode('utf-8').rstrip('\r')
+        except UnicodeDecodeError:
+            self.error(self.line, None, 'Line is not valid UTF-8')
+            return
+
+        if not text:
+            self.error(self.line, None, 'Empty line')
+            return
+
+        row = next(csv.reader([text]))
+
+        if self.line == 1:
+            self.check_header(row)
+        elif len(row) != len(self.header):
+            self.error(self.line, None,
+                       f'Expected {len(self.header)} fields, '
+                       f'found {len(row)}')
+        else:
+            self.check_row(row)
+
+    def check_header(self, row):
+        if row != list(self.header):
+            missing = [f for f in self.header if f not in row]
+            unexpected = [f for f in row if f not in self.header]
+
+            detail = []
+            if missing:
+                detail.append('missing ' + ', '.join(missing))
+            if unexpected:
+                detail.append('unexpected ' + ', '.join(unexpected))
+            detail = '; '.join(detail) or 'wrong order'
+
+            self.error(1, None,
+                       f'Header does not match the report fields ({detail})')
+
+    def counters(self, row, start):
+        """Return the row's counters as integers, recording any errors"""
+        values = []
+
+        for field, value in zip(self.header[start:], row[start:]):
+            if value in self.special_values.get(field, ()):
+                values.append(0)
+            elif not value.isdigit():
+                self.error(self.line, field,
+                           f'"{value}" is not a non-negative integer')
+                values.append(0)
+            else:
+                values.append(int(value))
+
+        return values
+
+    def check_row(self, row):
+        raise NotImplementedError
+
+    def finish(self):
+        raise NotImplementedError
+
+
+class TransactionsValidator(_CSVValidator):
+    """
+    Validate a Per-Registrar Transactions report
+
+    Checks the header, that each registrar line has a name, a unique IANA
+    id and non-negative integer counters, and that the last line holds
+    the totals of every column.
+    """
+    header = ('registrar-name', 'iana-id', *TRANSACTION_FIELDS)
+
+    def __init__(self, max_errors=MAX_ERRORS):
+        super().__init__(max_errors)
+        self._sums = [0] * len(TRANSACTION_FIELDS)
+        self._iana_ids = set()
+        self._totals_line = None
+
+    def check_row(self, row):
+        if self._totals_line is not None:
+            self.error(self.line, None, 'Line after the totals line')
+
+        if row[0] == 'Totals':
+            self._totals_line = self.line
+
+            if row[1]:
+                self.error(self.line, 'iana-id',
+                           'Must be empty on the totals line')
+
+            for field, total, value in zip(TRANSACTION_FIELDS, self._sums,
+                                           self.counters(row, 2)):
+                if total != value:
+                    self.error(self.line, field,
+                               f'Total {value} does not match the sum of '
+                               f'the registrar lines ({total})')
+            return
+
+        if not row[0].strip():
+            self.error(self.line, 'registrar-name', 'Missing registrar name')
+
+        if not row[1].isdigit():
+            self.error(self.line, 'iana-id', f'"{row[1]}" is not an IANA id')
+        elif row[1] in self._iana_ids:
+            self.error(self.line, 'iana-id', f'Duplicate IANA id {row[1]}')
+        else:
+            self._iana_ids.add(row[1])
+
+        self._sums = [total + value for total, value
+                      in zip(self._sums, self.counters(row, 2))]
+
+    def finish(self):
+        if self.line == 0:
+            self.error(None, None, 'Report is empty')
+        elif self._totals_line is None:
+            self.error(None, None, 'Missing totals line')
+
+
+class FunctionsValidator(_CSVValidator):
+    """
+    Validate a Registry Functions Activity report
+
+    Checks the header and that it's followed by a single line of
+    non-negative integer counters. ``zfa-passwords`` may instead be
+    ``CZDS`` when zone file access is provided through the Centralized
+    Zone Data Service.
+    """
+    header = FUNCTION_FIELDS
+    special_values = {'zfa-passwords': ('CZDS',)}
+
+    def check_row(self, row):
+        if self.line > 2:
+            self.error(self.line, None, 'Only one line of values is allowed')
+        else:
+            self.counters(row, 0)
+
+    def finish(self):
+        if self.line < 2:
+            self.error(None, None, 'Missing line of values')
+
+
+class XMLValidator(_Validator):
+    """
+    Check that an XML report is well formed
+
+    Elements are discarded as soon as they have been checked, so memory
+    use stays bounded whatever the size of the document. This is the only
+    check made on escrow agent notifications: they aren't validated
+    against a schema.
+    """
+    def __init__(self, max_errors=MAX_ERRORS):
+        super().__init__(max_errors)
+        self._parser = ET.XMLPullParser(events=('start', 'end'))
+        self._depth = 0
+        self._root = None
+
+    def feed(self, chunk):
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+
+        try:
+            self._parser.feed(bytes(chunk))
+            self._process()
+        except ET.ParseError as e:
+            self.error(e.position[0], None, f'Invalid XML: {e}')
+
+        self.raise_errors()
+
+    def close(self):
+        try:
+            self._parser.close()
+            self._process()
+        except ET.ParseError as e:
+            self.error(e.position[0], None, f'Invalid XML: {e}')
+
+        if self._root is None and not self.errors:
+            self.error(None, None, 'Report is empty')
+
+        if not self.errors:
+            self.finish()
+
+        self.raise_errors()
+
+    def _process(self):
+        for event, element in self._parser.read_events():
+            if event == 'start':
+                if self._depth == 0:
+                    self._root = element
+                self.start(element, self._depth)
+                self._depth += 1
+            else:
+                self._depth -= 1
+                self.end(element, self._depth)
+
+                if self._depth:
+                    element.clear()
+
+    def start(self, element, depth):
+        pass
+
+    def end(self, element, depth):
+        pass
+
+    def finish(self):
+        pass
+
+
+def _tag(namespace, name):
+    return f'{{{namespace}}}{name}'
+
+
+class EscrowReportValidator(XMLValidator):
+    """
+    Validate a registry escrow report (rdeReport)
+
+    Checks the root element, that the report elements appear once and in
+    order with valid values, and that the rdeHeader has a tld and object
+    counts.
+    """
+    fields = (
+        ('id', lambda v: bool(v), 'must not be empty'),
+        ('version', lambda v: v == '1', 'must be 1'),
+        ('rydeSpecEscrow', lambda v: bool(v), 'must not be empty'),
+        ('rydeSpecMapping', lambda v: bool(v), 'must not be empty'),
+        ('resend', lambda v: v.isdigit(),
+         'must be a non-negative integer'),
+        ('crDate', lambda v: bool(DATETIME_PATTERN.match(v)),
+         'must be an XML Schema dateTime'),
+        ('kind', lambda v: v in ('FULL', 'INCR'), 'must be FULL or INCR'),
+        ('watermark', lambda v: bool(DATETIME_PATTERN.match(v)),
+         'must be an XML Schema dateTime'),
+    )
+
+    def __init__(self, max_errors=MAX_ERRORS):
+        super().__init__(max_errors)
+        self._expected = [_tag(RDE_REPORT_NS, name)
+                          for name, _, _ in self.fields] + \
+            [_tag(RDE_HEADER_NS, 'header')]
+        self._seen = []
+        self._tlds = 0
+        self._counts = 0
+
+    def start(self, element, depth):
+        if depth == 0 and element.tag != _tag(RDE_REPORT_NS, 'report'):
+            self.error(None, element.tag,
+                       'Root element must be rdeReport:report')
+
+    def end(self, element, depth):
+        if depth == 1:
+            self._seen.append(element.tag)
+            value = (element.text or '').strip()
+
+            for field, check, message in self.fields:
+                if element.tag == _tag(RDE_REPORT_NS, field) and \
+                        not check(value):
+                    self.error(None, field, f'"{value}" {message}')
+
+        elif depth == 2 and element.tag == _tag(RDE_HEADER_NS, 'tld'):
+            self._tlds += 1
+            if not (element.text or '').strip():
+                self.error(None, 'tld', 'must not be empty')
+
+        elif depth == 2 and element.tag == _tag(RDE_HEADER_NS, 'count'):
+            self._counts += 1
+            name = 'count'
+            if not element.get('uri'):
+                self.error(None, name, 'missing uri attribute')
+            if not (element.text or '').strip().isdigit():
+                self.error(None, name,
+                           f'"{element.text}" must be a non-negative '
+                           f'integer')
+
+    def finish(self):
+        if self._seen != self._expected:
+            names = [tag.rpartition('}')[2] for tag in self._expected]
+            missing = [name for name, tag in zip(names, self._expected)
+                       if tag not in self._seen]
+            detail = 'missing ' + ', '.join(missing) if missing \
+                else 'wrong order'
+
+            self.error(None, None, 'Report elements must be '
+                       f'{", ".join(names)} ({detail})')
+
+        if self._tlds != 1:
+            self.error(None, 'tld', 'header must contain one tld')
+
+        if not self._counts:
+            self.error(None, 'count', 'header must contain object counts')
+
+
+_VALIDATORS = {
+    'registrar-transactions': TransactionsValidator,
+    'registry-functions-activity': FunctionsValidator,
+    'registry-escrow-report': EscrowReportValidator,
+    'escrow-agent-notification': XMLValidator,
+}
+
+
+def get_validator(resource_name, max_errors=MAX_ERRORS):
+    """Return a new validator for a resource
+
+    The CSV reports and the escrow report are checked for their fields
+    and structure. Escrow agent notifications are only checked to be well
+    formed XML.
+
+    :param str resource_name: e.g. ``RRIClient.transactions.resource_name``
+    :param int max_errors: stop collecting errors after this many
+    """
+    return _VALIDATORS[resource_name](max_errors)
+
+
+def validate_body(resource_name, body, max_errors=MAX_ERRORS):
+    """Validate a body prepared by ``open_report`` before it's uploaded
+
+    Bodies that can be read twice are validated immediately. Iterables
+    are wrapped so they are validated as they are uploaded instead.
+
+    :param str resource_name: name of the resource the report is for
+    :param body: a body returned by ``open_report``
+    :param int max_errors: stop collecting errors after this many
+    :return: the body to upload
+    :raises InvalidReport: if the report is invalid, with its ``errors``
+    """
+    validator = get_validator(resource_name, max_errors)
+
+    if not _is_rereadable(body):
+        return ValidatingIterator(body, validator)
+
+    for chunk in _iter_chunks(body):
+        validator.feed(chunk)
+    validator.close()
+
+    return body
+
+
+def validate_report(resource, report, max_errors=MAX_ERRORS):
+    """Validate a report in a single streaming pass
+
+    :param resource: the resource the report is for, e.g.
+        ``RRIClient.transactions``, or its resource name
+    :param report: any report accepted by ``submit()``
+    :param int max_errors: stop collecting errors after this many
+    :raises InvalidReport: if the report is invalid, with its ``errors``
+    """
+    name = getattr(resource, 'resource_name', resource)
+    validator = get_validator(name, max_errors)
+
+    with open_report(report) as body:
+        chunks = _iter_chunks(body) if _is_rereadable(body) else body
+
+        for chunk in chunks:
+            validator.feed(chunk)
+
+    validator.close()
+
+
+class ValidatingIterator:
+    """
+    Validate a streamed report as it's uploaded
+
+    Raises ``InvalidReport`` from ``__next__`` as soon as a problem is
+    found, which aborts the upload before the report is complete.
+
+    :param chunks: iterable of ``bytes``
+    :param validator: validator from ``get_validator``
+    """
+    def __init__(self, chunks, validator):
+        self.chunks = iter(chunks)
+        self.validator = validator
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            chunk = next(self.chunks)
+        except StopIteration:
+            self.validator.close()
+            raise
+
+        self.validator.feed(chunk)
+        return chunk
@@ -0,0 +1,496 @@
+# -*- coding: utf-8 -*-
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import pathlib
+import queue
+import select
+import shutil
+import struct
+import threading
+import time
+
+from .escrow import read_deposit
+from .retry import TRANSIENT_ERRORS
+
+
+__all__ = ['DepositWatcher', 'Inotify']
+
+DEPOSIT = 'deposit'
+NOTIFICATION = 'notification'
+
+DEFAULT_WORKERS = 4
+DEFAULT_QUEUE_SIZE = 64
+DEFAULT_POLL_INTERVAL = 2.0
+DEFAULT_RESCAN_INTERVAL = 300.0
+DEFAULT_BACKOFF_FACTOR = 30.0
+DEFAULT_MAX_BACKOFF = 3600.0
+
+# From <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+EVENT_HEADER = struct.Struct('iIII')
+READ_SIZE = 64 * 1024
+
+logger = logging.getLogger(__name__)
+
+
+class Inotify:
+    """
+    Minimal inotify binding, reporting files written or moved into
+    directories
+
+    :param directories: directories to watch
+    :raises OSError: if inotify isn't available
+    """
+    def __init__(self, directories):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6',
+                           use_errno=True)
+        if not hasattr(libc, 'inotify_init1'):
+            raise OSError(errno.ENOSYS, 'inotify is not available')
+
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+
+        self._directories = {}
+        try:
+            for directory in directories:
+                wd = libc.inotify_add_watch(self.fd, os.fsencode(directory),
+                                            IN_CLOSE_WRITE | IN_MOVED_TO)
+                if wd < 0:
+                    error = ctypes.get_errno()
+                    raise OSError(error, os.strerror(error), directory)
+
+                self._directories[wd] = directory
+        except BaseException:
+            os.close(self.fd)
+            raise
+
+    def read(self, timeout=None):
+        """Wait for files to land
+
+        :param float timeout: seconds to wait, or None to wait
+            indefinitely
+        :return: ``(directory, name)`` of the files, or None if events
+            were lost and the directories must be scanned
+        :rtype: ``list``
+        """
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+
+        try:
+            data = os.read(self.fd, READ_SIZE)
+        except BlockingIOError:
+            return []
+
+        events = []
+        offset = 0
+
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                return None
+
+            directory = self._directories.get(wd)
+            if directory is not None and name:
+                events.append((directory, os.fsdecode(name)))
+
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+class DepositWatcher:
+    """
+    Submit escrow reports and notifications as soon as deposits land
+
+    ``deposits`` directories receive decrypted RDE deposit XML files: each
+    is read with ``rri.escrow.read_deposit`` and its report submitted to
+    ``EscrowReport``. ``notifications`` directories receive escrow agent
+    notifications, which are submitted to ``EscrowNotification`` as they
+    are. The tld is read from the deposit header, or from the start of the
+    file name, e.g. ``example_2018-08-09_full_S1_R0.xml``.
+
+    Directories are watched with inotify where it's available, so files
+    are picked up as soon as they're closed or moved in, and scanned every
+    ``poll_interval`` seconds otherwise. Files go through a queue of
+    ``queue_size`` to ``workers`` threads; when the workers fall behind
+    the watcher waits for room, so deposits are never read faster than
+    they can be submitted.
+
+    Submitted and rejected files are moved into ``archive`` if given, or
+    else remembered until the watcher stops. Files failing with a
+    transient error are tried again at the first scan after an exponential
+    backoff, scans being every ``rescan_interval`` seconds with inotify,
+    or straight away if they change. A deposit's summary is kept while
+    its report is retried, so the deposit isn't read again.
+
+    :param fleet: ``RRIFleet``, or a mapping of tld to ``RRIClient``
+    :param deposits: directory, or list of directories, of deposits
+    :param notifications: directory, or list of directories, of
+        notifications
+    :param str archive: directory to move handled files into
+    :param int workers: number of submitting threads
+    :param int queue_size: files waiting for a worker before the watcher
+        waits
+    :param float poll_interval: seconds between scans without inotify
+    :param float rescan_interval: seconds between scans with inotify
+    :param bool use_inotify: use inotify if it's available
+    :param on_result: callable passed the path and the ``RRIResponse`` or
+        exception of each file
+    :param float backoff_factor: seconds before the first retry of a file,
+        doubling with each further failure
+    :param float max_backoff: longest wait before a retry in seconds
+    """
+    def __init__(self, fleet, deposits=(), notifications=(), archive=None,
+                 workers=DEFAULT_WORKERS, queue_size=DEFAULT_QUEUE_SIZE,
+                 poll_interval=DEFAULT_POLL_INTERVAL,
+                 rescan_interval=DEFAULT_RESCAN_INTERVAL, use_inotify=True,
+                 on_result=None, backoff_factor=DEFAULT_BACKOFF_FACTOR,
+                 max_backoff=DEFAULT_MAX_BACKOFF):
+        self.fleet = fleet
+        self.directories = {}
+        for kind, directories in ((DEPOSIT, deposits),
+                                  (NOTIFICATION, notifications)):
+            if isinstance(directories, (str, os.PathLike)):
+                directories = [directories]
+            for directory in directories:
+                self.directories[os.fspath(directory)] = kind
+
+        self.archive = os.fspath(archive) if archive else None
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.rescan_interval = rescan_interval
+        self.use_inotify = use_inotify
+        self.on_result = on_result
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.inotify = None
+
+        # Files queued or being submitted, and files already handled
+        self._pending = set()
+        self._handled = {}
+        self._sizes = {}
+        # Files failing transiently, by path: their signature, the
+        # attempts made and when they may be tried again, and the summary
+        # of each deposit with its signature
+        self._retries = {}
+        self._summaries = {}
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._threads = []
+        self._watcher = None
+
+    @staticmethod
+    def _signature(path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+
+        return stat.st_size, stat.st_mtime_ns
+
+    @staticmethod
+    def _wanted(name):
+        return name.endswith('.xml') and not name.startswith('.')
+
+    def _enqueue(self, path, kind):
+        """Queue a file unless it's queued or handled, waiting for room"""
+        signature = self._signature(path)
+        if signature is None:
+            return
+
+        with self._lock:
+            if path in self._pending or \
+                    self._handled.get(path) == signature:
+                return
+
+            retry = self._retries.get(path)
+            if retry is not None and retry[0] == signature and \
+                    time.monotonic() < retry[2]:
+                return
+
+            self._pending.add(path)
+
+        while not self._stopping.is_set():
+            try:
+                self.queue.put((path, kind), timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+        with self._lock:
+            self._pending.discard(path)
+
+    def scan(self, settle=False):
+        """Queue every file waiting in the directories
+
+        :param bool settle: skip files whose size or modification time
+            changed since the last scan, as they may still be written
+        """
+        sizes = {}
+
+        for directory, kind in self.directories.items():
+            try:
+                names = sorted(os.listdir(directory))
+            except FileNotFoundError:
+                logger.warning('Deposit directory %s is missing', directory)
+                continue
+
+            for name in names:
+                path = os.path.join(directory, name)
+                if not self._wanted(name) or not os.path.isfile(path):
+                    continue
+
+                signature = self._signature(path)
+                sizes[path] = signature
+                if settle and self._sizes.get(path) != signature:
+                    continue
+
+                self._enqueue(path, kind)
+
+                if self._stopping.is_set():
+                    return
+
+        self._sizes = sizes
+
+    def _get_client(self, tld, path):
+        if not tld:
+            tld = os.path.basename(path).partition('_')[0]
+
+        return self.fleet[tld]
+
+    def submit(self, path, kind=DEPOSIT):
+        """Submit the report for a file
+
+        :param str path: path to a deposit or notification
+        :param str kind: ``deposit`` or ``notification``
+        :return: ``RRIResponse``
+        """
+        if kind == NOTIFICATION:
+            rric = self._get_client(None, path)
+            # A str would be sent as the report itself
+            return rric.notification.submit(pathlib.Path(path))
+
+        summary = self._summary(path)
+        rric = self._get_client(summary.tld, path)
+        if summary.tld is None:
+            summary.tld = rric.tld
+
+        return rric.report.submit(summary.to_report(), summary.id)
+
+    def _summary(self, path):
+        """Read a deposit, or return the summary kept from reading it for
+        an earlier attempt if it hasn't changed since
+        """
+        signature = self._signature(path)
+
+        with self._lock:
+            cached = self._summaries.get(path)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+
+        summary = read_deposit(path)
+        with self._lock:
+            self._summaries[path] = (signature, summary)
+
+        return summary
+
+    def backoff(self, attempts, retry_after=None) -> float:
+        """Return the delay in seconds before a file that failed is tried
+        again
+
+        :param int attempts: attempts made so far
+        :param float retry_after: seconds the circuit breaker asked to
+            wait, if longer
+        """
+        delay = self.backoff_factor * 2 ** max(attempts - 1, 0)
+
+        return min(max(delay, retry_after or 0), self.max_backoff)
+
+    def _retry_later(self, path, signature, error):
+        with self._lock:
+            retry = self._retries.get(path)
+            attempts = retry[1] + 1 if retry and retry[0] == signature \
+                else 1
+            delay = self.backoff(attempts, getattr(error, 'retry_after',
+                                                   None))
+            self._retries[path] = (signature, attempts,
+                                   time.monotonic() + delay)
+
+        return delay
+
+    def _forget(self, path):
+        with self._lock:
+            self._retries.pop(path, None)
+            self._summaries.pop(path, None)
+
+    def _handle(self, path, kind):
+        signature = self._signature(path)
+
+        try:
+            result = self.submit(path, kind)
+        except TRANSIENT_ERRORS as e:
+            # Left for a scan after the backoff to try again
+            delay = self._retry_later(path, signature, e)
+            logger.warning('Submitting %s failed, retrying in %.0fs: %s',
+                           path, delay, e)
+            result = e
+        except Exception as e:
+            # Not archived, as it wasn't submitted, but not tried again
+            # until the file changes
+            logger.exception('Submitting %s failed', path)
+            result = e
+            self._forget(path)
+            self._remember(path, signature)
+        else:
+            self._forget(path)
+            if not result.success:
+                logger.warning('Report for %s was rejected: %s', path,
+                               result.response_body)
+
+            self._finish(path, signature)
+
+        if self.on_result is not None:
+            self.on_result(path, result)
+
+    def _finish(self, path, signature):
+        if self.archive:
+            try:
+                os.makedirs(self.archive, exist_ok=True)
+                shutil.move(path, os.path.join(self.archive,
+                                               os.path.basename(path)))
+                return
+            except OSError:
+                logger.exception('Archiving %s failed', path)
+
+        self._remember(path, signature)
+
+    def _remember(self, path, signature):
+        with self._lock:
+            self._handled[path] = signature
+
+    def _work(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                self.queue.task_done()
+                return
+
+            path, kind = item
+            try:
+                self._handle(path, kind)
+            finally:
+                with self._lock:
+                    self._pending.discard(path)
+                self.queue.task_done()
+
+    def _watch_inotify(self):
+        self.scan()
+        last_scan = time.monotonic()
+
+        while not self._stopping.is_set():
+            events = self.inotify.read(timeout=0.1)
+
+            if events is None or \
+                    time.monotonic() - last_scan >= self.rescan_interval:
+                self.scan()
+                last_scan = time.monotonic()
+                continue
+
+            for directory, name in events:
+                if self._wanted(name):
+                    self._enqueue(os.path.join(directory, name),
+                                  self.directories[directory])
+
+    def _watch_polling(self):
+        # Files already waiting are complete, later ones must settle
+        self.scan()
+
+        while not self._stopping.wait(self.poll_interval):
+            self.scan(settle=True)
+
+    def _open_inotify(self):
+        if not self.use_inotify:
+            return None
+
+        try:
+            return Inotify(list(self.directories))
+        except (OSError, AttributeError) as e:
+            logger.info('Polling for deposits, inotify unavailable: %s', e)
+            return None
+
+    def start(self):
+        """Start watching in background threads"""
+        self._stopping.clear()
+        self.inotify = self._open_inotify()
+
+        for n in range(self.workers):
+            thread = threading.Thread(target=self._work, daemon=True,
+                                      name=f'rri-watcher-worker-{n}')
+            thread.start()
+            self._threads.append(thread)
+
+        watch = self._watch_inotify if self.inotify else self._watch_polling
+        self._watcher = threading.Thread(target=watch, daemon=True,
+                                         name='rri-watcher')
+        self._watcher.start()
+
+        return self
+
+    def stop(self):
+        """Stop watching, finishing the files already queued"""
+        self._stopping.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+        for _ in self._threads:
+            self.queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+        if self.inotify is not None:
+            self.inotify.close()
+            self.inotify = None
+
+    def join(self):
+        """Wait until every queued file has been handled"""
+        self.queue.join()
+
+    def run(self):
+        """Watch until interrupted"""
+        self.start()
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def __repr__(self):
+        return f'DepositWatcher({len(self.directories)} directories, ' \
+            f'{"inotify" if self.inotify else "polling"})'
@@ -13,9 +13,15 @@ with open('HISTORY.rst') as history_file:
 
 requirements = [
     'requests>=2.19.1,<3.0.0',
+    'urllib3>=1.23',
     'uritemplate==3.0.0',
 ]
 
+extras_requirements = {
+    'async': ['aiohttp>=3.5.0,<4.0.0'],
+    'reports': ['numpy>=1.15.0'],
+}
+
 setup_requirements = ['pytest-runner', ]
 
 test_requirements = ['pytest', 'coverage', 'responses', 'pytest-responses']
@@ -34,9 +40,15 @@ setup(
         'Programming Language :: Python :: 3.7',
     ],
     description="Client library for the ICANN Registry Reporting Interface",
+    entry_points={
+        'console_scripts': [
+            'rri=rri.cli:main',
+        ],
+    },
     keywords='rri icann registry api',
     python_requires='>=3.6.0',
     install_requires=requirements,
+    extras_require=extras_requirements,
     license="MIT license",
     long_description=readme + '\n\n' + history,
     include_package_data=True,
@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+import rri.fleet
+import rri.rri
+from rri.transport import RequestsTransport
+
+
+@pytest.fixture(autouse=True)
+def requests_transport(request, monkeypatch):
+    """Send requests through requests by default, so that the responses
+    mock sees them. Tests marked withoutresponses use the real default.
+    """
+    if request.node.get_closest_marker('withoutresponses'):
+        return
+
+    def create_transport(pool_size=rri.rri.DEFAULT_POOL_SIZE,
+                         user_agent=None):
+        return RequestsTransport(pool_size=pool_size, user_agent=user_agent)
+
+    monkeypatch.setattr(rri.rri, 'create_transport', create_transport)
+    monkeypatch.setattr(rri.fleet, 'create_transport', create_transport)
@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `rri.aio` module."""
+import asyncio
+
+import pytest
+
+pytest.importorskip('aiohttp')
+
+from rri import AsyncRRIClient
+from rri.exception import InvalidInput, InvalidTldCredentials, \
+    InvalidAccess, InvalidRequestMethod, GeneralFailure, NotImplemented, \
+    UnknownStatus
+
+
+class FakeResponse:
+    charset = None
+
+    def __init__(self, status, body=''):
+        self.status = status
+        self.body = body
+
+    async def read(self):
+        return self.body.encode()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+
+class FakeSession:
+    """Records requests and answers them with a fixed status"""
+    def __init__(self, status, body=''):
+        self.status = status
+        self.body = body
+        self.calls = []
+
+    def request(self, method, url, **kwargs):
+        self.calls.append((method, url, kwargs))
+        return FakeResponse(self.status, self.body)
+
+    async def close(self):
+        pass
+
+
+def _client(status, body=''):
+    return AsyncRRIClient('example', 'testuser', 'testpass',
+                          client=FakeSession(status, body))
+
+
+@pytest.mark.withoutresponses
+@pytest.mark.parametrize('resource, date, url', [
+    ('report', '2018-08-09', 'https://ry-api.icann.org/info/report/registry-escrow-report/example/2018-08-09'),
+    ('notification', '2018-08-09', 'https://ry-api.icann.org/info/report/escrow-agent-notification/example/2018-08-09'),
+    ('functions', '2018-08', 'https://ry-api.icann.org/info/report/registry-functions-activity/example/2018-08'),
+    ('transactions', '2018-08', 'https://ry-api.icann.org/info/report/registrar-transactions/example/2018-08'),
+])
+@pytest.mark.parametrize('return_value, expected', [
+    (200, True),
+    (404, False)
+])
+def test_async_check(resource, date, url, return_value, expected):
+    rric = _client(return_value)
+
+    assert asyncio.run(getattr(rric, resource).check(date)) == expected
+
+    method, request_url, kwargs = rric.client.calls[0]
+    assert (method, request_url) == ('HEAD', url)
+    assert kwargs['headers']['Authorization'] == \
+        'Basic dGVzdHVzZXI6dGVzdHBhc3M='
+
+
+@pytest.mark.withoutresponses
+@pytest.mark.parametrize('return_value, expected_exception', [
+    (400, InvalidInput),
+    (401, InvalidTldCredentials),
+    (403, InvalidAccess),
+    (405, InvalidRequestMethod),
+    (500, GeneralFailure),
+    (501, NotImplemented),
+    (999, UnknownStatus)
+])
+def test_async_check_failure_raises_exception(return_value,
+                                              expected_exception):
+    rric = _client(return_value)
+
+    with pytest.raises(expected_exception):
+        asyncio.run(rric.functions.check('2018-08'))
+
+
+@pytest.mark.withoutresponses
+@pytest.mark.parametrize('return_value, expected', [
+    (200, True),
+    (500, GeneralFailure),
+])
+def test_async_check_coalesces_concurrent_checks(return_value, expected):
+    rric = _client(return_value)
+
+    async def run():
+        return await asyncio.gather(
+            *[rric.report.check('2018-08-09') for _ in range(5)],
+            return_exceptions=True
+        )
+
+    results = asyncio.run(run())
+
+    if expected is True:
+        assert results == [True] * 5
+    else:
+        assert all(isinstance(result, expected) for result in results)
+    assert len(rric.client.calls) == 1
+    assert len(rric.report.in_flight) == 0
+
+
+@pytest.mark.withoutresponses
+def test_async_check_many():
+    rric = _client(200)
+
+    results = asyncio.run(rric.report.check_many(
+        ['2018-08-09', '2018-08-10', 'not-a-date-string', 20180811],
+        max_workers=1
+    ))
+
+    assert list(results) == ['2018-08-09', '2018-08-10', 'not-a-date-string',
+                             20180811]
+    assert results['2018-08-09'] is True and results['2018-08-10'] is True
+    assert isinstance(results['not-a-date-string'], ValueError)
+    assert isinstance(results[20180811], TypeError)
+    assert len(rric.client.calls) == 2
+
+
+@pytest.mark.withoutresponses
+def test_async_check_range():
+    rric = _client(404)
+
+    results = asyncio.run(rric.functions.check_range('2018-11', '2019-01'))
+
+    assert results == dict.fromkeys(['2018-11', '2018-12', '2019-01'], False)
+
+
+@pytest.mark.withoutresponses
+def test_async_check_survives_cancelled_caller():
+    rric = _client(200)
+
+    async def run():
+        first = asyncio.ensure_future(rric.report.check('2018-08-09'))
+        second = asyncio.ensure_future(rric.report.check('2018-08-09'))
+        await asyncio.sleep(0)
+        first.cancel()
+
+        return await second, first.cancelled()
+
+    assert asyncio.run(run()) == (True, True)
+    assert len(rric.client.calls) == 1
+
+
+@pytest.mark.withoutresponses
+@pytest.mark.parametrize('return_value, expected', [
+    (200, True),
+    (400, False)
+])
+def test_async_submit(return_value, expected):
+    rric = _client(return_value, 'result')
+
+    r = asyncio.run(rric.report.submit('<examplereport></examplereport>',
+                                       'EXAMPLEID'))
+
+    assert r.success == expected
+    assert r.response_body == 'result'
+
+    method, url, kwargs = rric.client.calls[0]
+    assert method == 'PUT'
+    assert url == 'https://ry-api.icann.org/report/registry-escrow-report/example/EXAMPLEID'
+    assert kwargs['headers']['Content-type'] == 'text/xml'
+
+
+@pytest.mark.withoutresponses
+def test_async_notification_submit_posts():
+    rric = _client(200)
+
+    asyncio.run(rric.notification.submit('<notification/>'))
+
+    method, url, _ = rric.client.calls[0]
+    assert method == 'POST'
+    assert url == 'https://ry-api.icann.org/report/escrow-agent-notification/example'
+
+
+@pytest.mark.withoutresponses
+def test_async_client_owns_session():
+    async def run():
+        async with AsyncRRIClient('example', 'testuser', 'testpass',
+                                  pool_size=5) as rric:
+            assert rric.client.connector.limit == 5
+        return rric
+
+    assert asyncio.run(run()).client.closed
@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `rri.breaker` module."""
+import time
+
+import pytest
+import requests
+
+
+from rri import RRIClient, RRIFleet
+from rri.breaker import CircuitBreaker
+from rri.exception import CircuitOpen, ConnectionFailed, GeneralFailure, \
+    InvalidAccess
+from rri.retry import RetryPolicy
+
+
+CHECK_URL = 'https://ry-api.icann.org/info/report/registrar-transactions/example/2018-08'
+KEY = 'https://ry-api.icann.org/report/registrar-transactions'
+
+
+@pytest.fixture
+def breaker(tmpdir):
+    breaker = CircuitBreaker(str(tmpdir.join('breaker.sqlite')),
+                             failure_threshold=3, reset_timeout=60)
+    yield breaker
+    breaker.close()
+
+
+@pytest.fixture
+def rric(breaker):
+    return RRIClient('example', 'testuser', 'testpass', breaker=breaker)
+
+
+def _fail(rric, times):
+    for _ in range(times):
+        with pytest.raises(GeneralFailure):
+            rric.transactions.check('2018-08')
+
+
+def test_opens_after_consecutive_failures(rric, breaker, responses):
+    responses.add(responses.HEAD, CHECK_URL, status=500)
+
+    _fail(rric, 3)
+    assert breaker.state(KEY) == 'open'
+
+    with pytest.raises(CircuitOpen) as e:
+        rric.transactions.check('2018-08')
+
+    assert e.value.key == KEY
+    assert 0 < e.value.retry_after <= 60
+    assert len(responses.calls) == 3
+
+
+def test_success_resets_failures(rric, breaker, responses):
+    responses.add(responses.HEAD, CHECK_URL, status=500)
+    _fail(rric, 2)
+
+    responses.replace(responses.HEAD, CHECK_URL, status=404)
+    assert rric.transactions.check('2018-08') is False
+
+    responses.replace(responses.HEAD, CHECK_URL, status=500)
+    _fail(rric, 2)
+
+    assert breaker.state(KEY) == 'closed'
+
+
+def test_client_errors_are_not_failures(rric, breaker, responses):
+    responses.add(responses.HEAD, CHECK_URL, status=403)
+
+    for _ in range(4):
+        with pytest.raises(InvalidAccess):
+            rric.transactions.check('2018-08')
+
+    assert breaker.state(KEY) == 'closed'
+
+
+def test_connection_errors_are_failures(rric, breaker, responses):
+    responses.add(responses.HEAD, CHECK_URL,
+                  body=requests.ConnectionError())
+
+    for _ in range(3):
+        with pytest.raises(ConnectionFailed):
+            rric.transactions.check('2018-08')
+
+    assert breaker.state(KEY) == 'open'
+
+
+def test_half_open_probe(rric, breaker, responses, monkeypatch):
+    responses.add(responses.HEAD, CHECK_URL, status=500)
+    _fail(rric, 3)
+
+    now = time.time()
+    monkeypatch.setattr(time, 'time', lambda: now + 61)
+
+    # A single probe is let through, and fails
+    _fail(rric, 1)
+    assert breaker.state(KEY) == 'open'
+
+    with pytest.raises(CircuitOpen):
+        rric.transactions.check('2018-08')
+
+    monkeypatch.setattr(time, 'time', lambda: now + 122)
+    responses.replace(responses.HEAD, CHECK_URL, status=200)
+
+    assert rric.transactions.check('2018-08') is True
+    assert breaker.state(KEY) == 'closed'
+
+
+def test_half_open_limits_probes(breaker):
+    for _ in range(3):
+        breaker.failure(KEY)
+    breaker.reset_timeout = 0
+
+    breaker.before(KEY)
+    assert breaker.state(KEY) == 'half-open'
+
+    breaker.reset_timeout = 60
+    with pytest.raises(CircuitOpen):
+        breaker.before(KEY)
+
+
+def test_shared_between_processes(breaker):
+    for _ in range(3):
+        breaker.failure(KEY)
+
+    other = CircuitBreaker(breaker.path)
+    with pytest.raises(CircuitOpen):
+        other.before(KEY)
+
+    other.reset()
+    assert breaker.state(KEY) == 'closed'
+    other.close()
+
+
+def test_shared_between_tlds(breaker, responses):
+    responses.add(responses.HEAD, CHECK_URL, status=500)
+    fleet = RRIFleet({'example': ('testuser', 'testpass'),
+                      'test': ('testuser', 'testpass')}, breaker=breaker)
+
+    _fail(fleet['example'], 3)
+
+    with pytest.raises(CircuitOpen):
+        fleet['test'].transactions.check('2018-08')
+
+    # Other resources have their own circuit
+    responses.add(responses.HEAD, status=200,
+                  url='https://ry-api.icann.org/info/report/registry-functions-activity/test/2018-08')
+    assert fleet['test'].functions.check('2018-08') is True
+
+
+def test_stops_retries(breaker, responses):
+    responses.add(responses.HEAD, CHECK_URL, status=500)
+    retry = RetryPolicy(max_retries=10, sleep=lambda seconds: None)
+    rric = RRIClient('example', 'testuser', 'testpass', retry=retry,
+                     breaker=breaker)
+
+    with pytest.raises(CircuitOpen):
+        rric.transactions.check('2018-08')
+
+    assert len(responses.calls) == 3
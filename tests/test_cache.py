@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `rri.cache` module."""
+import pathlib
+import time
+
+import pytest
+
+
+from rri import RRIClient
+from rri.cache import CheckCache
+
+
+CHECK_URL = 'https://ry-api.icann.org/info/report/registrar-transactions/example/2018-08'
+
+
+@pytest.fixture
+def cache(tmpdir):
+    cache = CheckCache(str(tmpdir.join('cache.sqlite')), missing_ttl=60)
+    yield cache
+    cache.close()
+
+
+@pytest.fixture
+def rric(cache):
+    return RRIClient('example', 'testuser', 'testpass', cache=cache)
+
+
+def test_cache_get_set(cache):
+    assert cache.get('example', 'registrar-transactions', '2018-08') is None
+
+    cache.set('example', 'registrar-transactions', '2018-08', False)
+    assert cache.get('example', 'registrar-transactions', '2018-08') is False
+
+    cache.set('example', 'registrar-transactions', '2018-08', True)
+    assert cache.get('example', 'registrar-transactions', '2018-08') is True
+
+
+def test_cache_accepted_is_permanent(cache):
+    cache.set('example', 'registrar-transactions', '2018-08', True)
+    cache.set('example', 'registrar-transactions', '2018-08', False)
+
+    assert cache.get('example', 'registrar-transactions', '2018-08') is True
+
+
+def test_cache_missing_expires(cache, monkeypatch):
+    cache.set('example', 'registrar-transactions', '2018-08', False)
+
+    now = time.time()
+    monkeypatch.setattr(time, 'time', lambda: now + 61)
+
+    assert cache.get('example', 'registrar-transactions', '2018-08') is None
+    assert cache.evict() == 1
+
+
+def test_cache_shared_between_connections(cache):
+    cache.set('example', 'registrar-transactions', '2018-08', True)
+
+    other = CheckCache(cache.path)
+    assert other.get('example', 'registrar-transactions', '2018-08') is True
+    other.close()
+
+
+def test_check_uses_cache(rric, responses):
+    responses.add(responses.HEAD, status=200, url=CHECK_URL)
+
+    assert rric.transactions.check('2018-08') is True
+    assert rric.transactions.check('2018-08') is True
+    assert len(responses.calls) == 1
+
+
+def test_check_refreshes_missing(rric, cache, responses):
+    responses.add(responses.HEAD, status=404, url=CHECK_URL)
+    cache.missing_ttl = 0
+
+    assert rric.transactions.check('2018-08') is False
+    assert rric.transactions.check('2018-08') is False
+    assert len(responses.calls) == 2
+
+
+def test_submit_marks_period_accepted(rric, cache, responses):
+    responses.add(responses.PUT, status=200,
+                  url='https://ry-api.icann.org/report/registrar-transactions/example/2018-08')
+
+    cache.set('example', 'registrar-transactions', '2018-08', False)
+    rric.transactions.submit('registrar-name,iana-id\n', '2018-08')
+
+    assert rric.transactions.check('2018-08') is True
+    assert len(responses.calls) == 1
+
+
+SUBMIT_URL = 'https://ry-api.icann.org/report/registrar-transactions/example/2018-08'
+
+
+def _consume(request):
+    if hasattr(request.body, '__next__'):
+        b''.join(request.body)
+    return 200, {}, '<accepted/>'
+
+
+def test_cache_submission_digest(cache):
+    assert cache.get_submission('example', 'registrar-transactions',
+                                '2018-08', 'abc') is None
+
+    cache.set_submission('example', 'registrar-transactions', '2018-08',
+                         'abc', '<accepted/>')
+
+    assert cache.get_submission('example', 'registrar-transactions',
+                                '2018-08', 'abc') == '<accepted/>'
+    assert cache.get_submission('example', 'registrar-transactions',
+                                '2018-08', 'def') is None
+
+
+@pytest.mark.parametrize('report', [
+    'registrar-name,iana-id\n',
+    lambda path: path,
+])
+def test_submit_skips_unchanged_report(rric, responses, tmpdir, report):
+    path = tmpdir.join('report.csv')
+    path.write_binary(b'registrar-name,iana-id\n')
+    responses.add_callback(responses.PUT, SUBMIT_URL, callback=_consume)
+
+    def make_report():
+        return report(pathlib.Path(str(path))) if callable(report) \
+            else report
+
+    first = rric.transactions.submit(make_report(), '2018-08')
+    second = rric.transactions.submit(make_report(), '2018-08')
+
+    assert not first.deduplicated
+    assert second.success and second.deduplicated
+    assert second.response_body == '<accepted/>'
+    assert len(responses.calls) == 1
+
+
+def test_submit_records_streamed_report(rric, responses):
+    responses.add_callback(responses.PUT, SUBMIT_URL, callback=_consume)
+
+    # A stream can't be hashed before it's sent, but is hashed as it's sent
+    rric.transactions.submit(iter([b'registrar-name,', b'iana-id\n']),
+                             '2018-08')
+    response = rric.transactions.submit(b'registrar-name,iana-id\n',
+                                        '2018-08')
+
+    assert response.deduplicated
+    assert len(responses.calls) == 1
+
+
+def test_submit_uploads_changed_report(rric, responses):
+    responses.add_callback(responses.PUT, SUBMIT_URL, callback=_consume)
+
+    rric.transactions.submit('registrar-name,iana-id\n', '2018-08')
+    response = rric.transactions.submit('registrar-name,iana-id\r\n',
+                                        '2018-08')
+
+    assert not response.deduplicated
+    assert len(responses.calls) == 2
+
+
+def test_submit_force(rric, responses):
+    responses.add_callback(responses.PUT, SUBMIT_URL, callback=_consume)
+
+    rric.transactions.submit('registrar-name,iana-id\n', '2018-08')
+    response = rric.transactions.submit('registrar-name,iana-id\n',
+                                        '2018-08', force=True)
+
+    assert not response.deduplicated
+    assert len(responses.calls) == 2
+
+
+def test_submit_rejected_report_is_not_indexed(rric, responses):
+    responses.add(responses.PUT, SUBMIT_URL, status=400)
+
+    rric.transactions.submit('registrar-name,iana-id\n', '2018-08')
+    rric.transactions.submit('registrar-name,iana-id\n', '2018-08')
+
+    assert len(responses.calls) == 2
+
+
+def test_escrow_report_deduplicated_by_id(rric, responses):
+    responses.add(responses.PUT, status=200,
+                  url='https://ry-api.icann.org/report/registry-escrow-report/example/20180809001')
+
+    rric.report.submit('<report/>', '20180809001')
+    response = rric.report.submit('<report/>', '20180809001')
+
+    assert response.deduplicated
+    assert len(responses.calls) == 1
@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `rri.cli` module."""
+import pathlib
+
+import pytest
+
+
+from rri.cli import main, scan
+
+
+BASE_URL = 'https://ry-api.icann.org'
+TRANSACTIONS = 'registrar-transactions'
+
+
+@pytest.fixture
+def root(tmpdir):
+    tmpdir.mkdir('reports')
+    root = tmpdir.join('reports')
+    for tld in ('example', 'test'):
+        resource = root.mkdir(tld).mkdir(TRANSACTIONS)
+        resource.join('2018-08.csv').write_binary(b'registrar-name,iana-id\n')
+    root.join('example').mkdir('registry-escrow-report') \
+        .join('20180809001.xml').write_binary(b'<report/>')
+    root.join('example').mkdir('unknown-resource') \
+        .join('2018-08.csv').write_binary(b'')
+    root.join('example', TRANSACTIONS, '.2018-09.csv.swp').write_binary(b'')
+    return str(root)
+
+
+ESCROW_REPORT = b'''<?xml version="1.0" encoding="UTF-8"?>
+<rdeReport:report xmlns:rdeReport="urn:ietf:params:xml:ns:rdeReport-1.0"
+  xmlns:rdeHeader="urn:ietf:params:xml:ns:rdeHeader-1.0">
+  <rdeReport:id>20180809001</rdeReport:id>
+  <rdeReport:kind>FULL</rdeReport:kind>
+  <rdeReport:watermark>2018-08-09T00:00:00Z</rdeReport:watermark>
+</rdeReport:report>'''
+
+
+@pytest.fixture
+def credentials(tmpdir):
+    path = tmpdir.join('credentials.csv')
+    path.write('example,exampleuser,examplepass\ntest,testuser,testpass\n')
+    return str(path)
+
+
+def test_scan(root):
+    tasks = scan(root)
+
+    assert [(t.tld, t.resource, t.period) for t in tasks] == [
+        ('example', TRANSACTIONS, '2018-08'),
+        ('example', 'registry-escrow-report', '20180809001'),
+        ('test', TRANSACTIONS, '2018-08'),
+    ]
+
+
+def test_scan_filters(root):
+    tasks = scan(root, tlds=['test'], resources=[TRANSACTIONS])
+
+    assert [(t.tld, t.resource) for t in tasks] == [('test', TRANSACTIONS)]
+
+
+def test_submit(root, credentials, responses, capsys):
+    responses.add(responses.PUT, status=200,
+                  url=f'{BASE_URL}/report/{TRANSACTIONS}/example/2018-08')
+    responses.add(responses.PUT, status=400,
+                  body='line 2: iana-id: must be an integer\nMissing Totals',
+                  url=f'{BASE_URL}/report/{TRANSACTIONS}/test/2018-08')
+    responses.add(responses.PUT, status=200,
+                  url=f'{BASE_URL}/report/registry-escrow-report/example/'
+                      f'20180809001')
+
+    code = main(['--credentials', credentials, '--workers', '3',
+                 'submit', root])
+    out = capsys.readouterr().out
+
+    assert code == 1
+    assert len(responses.calls) == 3
+    assert sorted(call.request.headers['Content-Length']
+                  for call in responses.calls) == ['23', '23', '9']
+    assert 'test     registrar-transactions  2018-08      rejected  ' \
+        'line 2: iana-id: must be an integer; Missing Totals' in out
+    assert out.endswith('3 reports: 2 accepted, 1 rejected\n')
+
+
+def test_submit_unknown_tld(root, tmpdir, responses, capsys):
+    path = tmpdir.join('example.csv')
+    path.write('example,exampleuser,examplepass\n')
+    responses.add(responses.PUT, status=200,
+                  url=f'{BASE_URL}/report/{TRANSACTIONS}/example/2018-08')
+
+    code = main(['--credentials', str(path), '--tld', 'example', '--tld',
+                 'test', '--resource', TRANSACTIONS, 'submit', root])
+
+    assert code == 1
+    assert "error     KeyError 'test'" in capsys.readouterr().out
+
+
+def test_check(root, credentials, responses, capsys):
+    for tld, status in (('example', 200), ('test', 404)):
+        responses.add(responses.HEAD, status=status,
+                      url=f'{BASE_URL}/info/report/{TRANSACTIONS}/{tld}/'
+                          f'2018-08')
+
+    code = main(['--credentials', credentials, '--resource', TRANSACTIONS,
+                 'check', root])
+    out = capsys.readouterr().out
+
+    assert code == 1
+    assert out.endswith('2 reports: 1 missing, 1 present\n')
+
+
+def test_check_escrow_reports_by_deposit_date(root, credentials, responses,
+                                              capsys):
+    escrow = pathlib.Path(root, 'example', 'registry-escrow-report')
+    (escrow / '20180809001.xml').write_bytes(ESCROW_REPORT)
+    (escrow / '20180810001.xml').write_bytes(b'<report/>')
+    for tld in ('example', 'test'):
+        responses.add(responses.HEAD, status=200,
+                      url=f'{BASE_URL}/info/report/{TRANSACTIONS}/{tld}/'
+                          f'2018-08')
+    responses.add(responses.HEAD, status=200,
+                  url=f'{BASE_URL}/info/report/registry-escrow-report/'
+                      f'example/2018-08-09')
+
+    code = main(['--credentials', credentials, 'check', root])
+    out = capsys.readouterr().out
+
+    assert code == 0
+    assert 'registry-escrow-report  20180809001  present  deposit of ' \
+        '2018-08-09' in out
+    assert 'registry-escrow-report  20180810001  skipped  no watermark' in out
+    assert out.endswith('4 reports: 3 present, 1 skipped\n')
+    assert len(responses.calls) == 3
+
+
+def test_status_escrow_and_notifications(root, credentials, tmpdir,
+                                         responses, capsys):
+    cache = str(tmpdir.join('cache.sqlite'))
+    example = pathlib.Path(root, 'example')
+    (example / 'registry-escrow-report' / '20180809001.xml') \
+        .write_bytes(ESCROW_REPORT)
+    (example / 'escrow-agent-notification').mkdir()
+    (example / 'escrow-agent-notification' / '2018-08-09.xml') \
+        .write_bytes(b'<notification/>')
+    responses.add(responses.PUT, status=200,
+                  url=f'{BASE_URL}/report/registry-escrow-report/example/'
+                      f'20180809001')
+
+    main(['--credentials', credentials, '--cache', cache, '--tld', 'example',
+          '--resource', 'registry-escrow-report', 'submit', root])
+    capsys.readouterr()
+
+    main(['--cache', cache, '--tld', 'example', 'status', root])
+    out = capsys.readouterr().out
+
+    assert 'registry-escrow-report     20180809001  submitted' in out
+    assert 'escrow-agent-notification  2018-08-09   untracked  ' \
+        'notifications are not recorded in the cache' in out
+    assert out.endswith('3 reports: 1 submitted, 1 unknown, 1 untracked\n')
+
+
+def test_status(root, credentials, tmpdir, responses, capsys):
+    cache = str(tmpdir.join('cache.sqlite'))
+    responses.add(responses.PUT, status=200,
+                  url=f'{BASE_URL}/report/{TRANSACTIONS}/example/2018-08')
+
+    main(['--credentials', credentials, '--cache', cache, '--tld', 'example',
+          '--resource', TRANSACTIONS, 'submit', root])
+    capsys.readouterr()
+
+    assert main(['--cache', cache, 'status', root]) == 0
+    out = capsys.readouterr().out
+
+    assert 'example  registrar-transactions  2018-08      submitted' in out
+    assert out.endswith('3 reports: 1 submitted, 2 unknown\n')
+
+
+def test_submit_skips_unchanged(root, credentials, tmpdir, responses,
+                                capsys):
+    cache = str(tmpdir.join('cache.sqlite'))
+    responses.add(responses.PUT, status=200,
+                  url=f'{BASE_URL}/report/{TRANSACTIONS}/example/2018-08')
+    args = ['--credentials', credentials, '--cache', cache, '--tld',
+            'example', '--resource', TRANSACTIONS, 'submit', root]
+
+    assert main(args) == 0
+    assert main(args) == 0
+
+    assert len(responses.calls) == 1
+    assert capsys.readouterr().out.endswith('1 reports: 1 unchanged\n')
+
+
+def test_needs_credentials(root, monkeypatch):
+    monkeypatch.delenv('RRI_CREDENTIALS', raising=False)
+
+    with pytest.raises(SystemExit):
+        main(['check', root])
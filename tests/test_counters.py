@@ -0,0 +1,270 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `rri.counters` module."""
+import importlib.util
+import json
+from datetime import datetime as dt, timedelta, timezone
+
+import pytest
+
+
+from rri import RRIClient
+from rri.counters import EPPEvent, MonthlyCounters
+from rri.fields import TRANSACTION_FIELDS, FUNCTION_FIELDS
+from rri.validate import validate_report
+
+
+AUGUST = dt(2018, 8, 9, 12, 0)
+
+# Counting doesn't need numpy, producing the reports does
+requires_numpy = pytest.mark.skipif(importlib.util.find_spec('numpy') is None,
+                                    reason='numpy is not installed')
+
+
+@pytest.fixture
+def counters():
+    counters = MonthlyCounters(registrars={9999: 'Example Registrar, Inc.',
+                                           1000: 'Other Registrar'})
+    events = [
+        EPPEvent(AUGUST, 9999, 'domain', 'create', years=1),
+        EPPEvent(AUGUST, 9999, 'domain', 'create', years=1),
+        EPPEvent(AUGUST, 9999, 'domain', 'create', success=False, years=2),
+        EPPEvent(AUGUST, 2000, 'domain', 'renew', years=3),
+        EPPEvent(AUGUST, 2000, 'domain', 'delete', grace=True),
+        EPPEvent(AUGUST, 9999, 'domain', 'transfer', op='request'),
+        EPPEvent(AUGUST, 9999, 'host', 'check'),
+        EPPEvent(AUGUST, 9999, 'session', 'login'),
+        EPPEvent(dt(2018, 9, 1), 9999, 'domain', 'create', years=1),
+    ]
+    for event in events:
+        counters.record(event)
+    return counters
+
+
+def _field(row, field):
+    return row[2 + TRANSACTION_FIELDS.index(field)]
+
+
+def test_event_fields():
+    create = EPPEvent(AUGUST, 9999, 'domain', 'create', years=2)
+    restore = EPPEvent(AUGUST, 9999, 'domain', 'rgp-restore', op='request')
+    failed = EPPEvent(AUGUST, 9999, 'contact', 'transfer', success=False,
+                      op='approve')
+
+    assert create.function_field() == 'srs-dom-create'
+    assert create.transaction_fields() == ['attempted-adds',
+                                           'net-adds-2-yr']
+    assert restore.function_field() == 'srs-dom-rgp-restore-request'
+    assert restore.transaction_fields() == ['restored-domains']
+    assert failed.function_field() == 'srs-cont-transfer-approve'
+    assert failed.transaction_fields() == []
+
+
+@requires_numpy
+def test_grace_deletes_reverse_net_adds_and_renews():
+    deletes = [
+        EPPEvent(AUGUST, 9999, 'domain', 'delete', years=2, grace='add'),
+        EPPEvent(AUGUST, 9999, 'domain', 'delete', years=1,
+                 grace='autorenew'),
+        EPPEvent(AUGUST, 9999, 'domain', 'delete', years=1,
+                 grace='transfer'),
+        EPPEvent(AUGUST, 9999, 'domain', 'delete', years=1),
+        EPPEvent(AUGUST, 9999, 'domain', 'delete', success=False, years=1,
+                 grace='add'),
+    ]
+
+    assert [event.reversed_fields() for event in deletes] == [
+        ['net-adds-2-yr'], ['net-renews-1-yr'], [], [], []]
+    assert deletes[0].transaction_fields() == ['deleted-domains-grace']
+
+
+@requires_numpy
+def test_grace_deletes_are_taken_off(counters):
+    counters.record(EPPEvent(AUGUST, 9999, 'domain', 'delete', years=1,
+                             grace='add'))
+    counters.record(EPPEvent(AUGUST, 2000, 'domain', 'delete', years=3,
+                             grace='renew'))
+
+    rows = {row[1]: row for row in counters.transaction_rows('2018-08')}
+
+    assert _field(rows[9999], 'net-adds-1-yr') == 1
+    assert _field(rows[9999], 'deleted-domains-grace') == 1
+    assert _field(rows[2000], 'net-renews-3-yr') == 0
+    assert _field(rows[2000], 'deleted-domains-grace') == 2
+    assert _field(rows[''], 'net-adds-1-yr') == 1
+
+
+@requires_numpy
+def test_grace_deletes_undo_the_month_of_the_create():
+    counters = MonthlyCounters(registrars={1: 'Example Registrar'})
+    counters.record(EPPEvent(dt(2018, 1, 30), 1, 'domain', 'create',
+                             years=1))
+    counters.record(EPPEvent(dt(2018, 2, 2), 1, 'domain', 'delete', years=1,
+                             grace='add', undoes=dt(2018, 1, 30)))
+    # Without the month of the create, the delete's month has none to undo
+    counters.record(EPPEvent(dt(2018, 2, 3), 1, 'domain', 'delete', years=1,
+                             grace='add'))
+    # Nor is anything taken off a month that has been discarded
+    counters.record(EPPEvent(dt(2018, 2, 4), 1, 'domain', 'delete', years=1,
+                             grace='add', undoes='2017-12'))
+
+    january = {row[1]: row for row in counters.transaction_rows('2018-01')}
+    february = {row[1]: row for row in counters.transaction_rows('2018-02')}
+
+    assert _field(january[1], 'net-adds-1-yr') == 0
+    assert _field(february[1], 'net-adds-1-yr') == 0
+    assert _field(february[1], 'deleted-domains-grace') == 3
+    assert counters.months() == ['2018-01', '2018-02']
+
+    for month in counters.months():
+        validate_report('registrar-transactions',
+                        counters.iter_transactions_csv(month))
+
+
+@requires_numpy
+def test_transaction_rows(counters):
+    rows = {row[1]: row for row in counters.transaction_rows('2018-08')}
+
+    assert list(rows) == [1000, 2000, 9999, '']
+    assert rows[9999][0] == 'Example Registrar, Inc.'
+    assert _field(rows[9999], 'net-adds-1-yr') == 2
+    assert _field(rows[9999], 'attempted-adds') == 3
+    assert _field(rows[2000], 'net-renews-3-yr') == 1
+    assert _field(rows[2000], 'deleted-domains-grace') == 1
+    assert rows[1000][2:] == [0] * len(TRANSACTION_FIELDS)
+    assert rows[''][:2] == ['Totals', '']
+    assert _field(rows[''], 'attempted-adds') == 3
+
+
+def test_function_values(counters):
+    values = dict(zip(FUNCTION_FIELDS, counters.function_values('2018-08')))
+
+    assert values['srs-dom-create'] == 3
+    assert values['srs-dom-renew'] == 1
+    assert values['srs-dom-transfer-request'] == 1
+    assert values['srs-host-check'] == 1
+    assert sum(values.values()) == 7
+    assert counters.function_values('2018-07') == [0] * len(FUNCTION_FIELDS)
+
+
+def test_months(counters):
+    assert counters.months() == ['2018-08', '2018-09']
+
+    counters.discard(dt(2018, 9, 30))
+
+    assert counters.months() == ['2018-08']
+
+
+def test_month_is_utc():
+    counters = MonthlyCounters()
+    ahead = timezone(timedelta(hours=10))
+    counters.record(EPPEvent(dt(2018, 9, 1, 8, 0, tzinfo=ahead), 9999,
+                             'domain', 'info'))
+
+    assert counters.months() == ['2018-08']
+
+
+@requires_numpy
+def test_set_and_add(counters):
+    counters.set_transaction('2018-08', 9999, 'total-domains', 120)
+    counters.add_transaction(AUGUST, 9999, 'transfer-gaining-successful', 2)
+    counters.set_function('2018-08', 'operational-registrars', 3)
+    counters.add_function('2018-08', 'whois-43-queries', 10)
+
+    rows = {row[1]: row for row in counters.transaction_rows('2018-08')}
+    values = dict(zip(FUNCTION_FIELDS, counters.function_values('2018-08')))
+
+    assert _field(rows[9999], 'total-domains') == 120
+    assert _field(rows[9999], 'transfer-gaining-successful') == 2
+    assert values['operational-registrars'] == 3
+    assert values['whois-43-queries'] == 10
+
+    with pytest.raises(ValueError):
+        counters.add_transaction('2018-08', 9999, 'not-a-field')
+    with pytest.raises(ValueError):
+        counters.set_function('2018-08', 'not-a-field', 1)
+    with pytest.raises(ValueError):
+        counters.add_function('2018-13', 'whois-43-queries')
+
+
+@requires_numpy
+def test_csv(counters):
+    lines = b''.join(counters.iter_transactions_csv('2018-08')) \
+        .decode().split('\r\n')
+
+    assert lines[0] == ','.join(['registrar-name', 'iana-id',
+                                 *TRANSACTION_FIELDS])
+    assert lines[1].startswith('Other Registrar,1000,0,0,')
+    assert lines[3].startswith('"Example Registrar, Inc.",9999,0,0,2,')
+    assert lines[4].startswith('Totals,,0,0,2,')
+    assert lines[5] == ''
+
+    lines = b''.join(counters.iter_functions_csv('2018-08')) \
+        .decode().split('\r\n')
+
+    assert lines[0] == ','.join(FUNCTION_FIELDS)
+    assert len(lines[1].split(',')) == len(FUNCTION_FIELDS)
+
+
+def test_checkpoint(counters, tmpdir):
+    path = str(tmpdir.join('counters.json'))
+    counters.path = path
+
+    counters.record(EPPEvent(AUGUST, 1000, 'domain', 'create', years=1),
+                    position=4096)
+    counters.checkpoint()
+
+    restored = MonthlyCounters(path, registrars=counters.registrars)
+
+    assert restored.position == 4096
+    assert restored.months() == counters.months()
+    assert restored.transaction_rows('2018-08') == \
+        counters.transaction_rows('2018-08')
+    assert restored.function_values('2018-08') == \
+        counters.function_values('2018-08')
+    assert tmpdir.listdir() == [tmpdir.join('counters.json')]
+
+
+def test_checkpoint_interval(tmpdir):
+    path = tmpdir.join('counters.json')
+    counters = MonthlyCounters(str(path), checkpoint_interval=0)
+
+    counters.record(EPPEvent(AUGUST, 9999, 'domain', 'info'), position=1)
+
+    assert json.loads(path.read())['position'] == 1
+
+    counters = MonthlyCounters(str(path), checkpoint_interval=3600)
+    counters.record(EPPEvent(AUGUST, 9999, 'domain', 'info'), position=2)
+
+    assert json.loads(path.read())['position'] == 1
+
+
+def test_checkpoint_fields_must_match(counters, tmpdir):
+    path = str(tmpdir.join('counters.json'))
+    counters.path = path
+    counters.checkpoint()
+
+    with pytest.raises(ValueError):
+        MonthlyCounters(path, function_fields=FUNCTION_FIELDS[:-1])
+
+    with pytest.raises(ValueError):
+        MonthlyCounters().checkpoint()
+
+
+@requires_numpy
+def test_submit(counters, responses):
+    base = 'https://ry-api.icann.org/report/'
+    responses.add(responses.PUT, status=200,
+                  url=base + 'registrar-transactions/example/2018-08')
+    responses.add(responses.PUT, status=200,
+                  url=base + 'registry-functions-activity/example/2018-08')
+    rric = RRIClient('example', 'testuser', 'testpass')
+
+    assert counters.submit_transactions(rric.transactions, AUGUST).success
+    assert counters.submit_functions(rric.functions, '2018-08').success
+
+    body = responses.calls[0].request.body
+    if not isinstance(body, bytes):
+        body = b''.join(body)
+    assert body.startswith(b'registrar-name,iana-id,total-domains')
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `rri.escrow` module."""
+import io
+from datetime import datetime
+
+import pytest
+
+
+from rri import RRIClient
+from rri.escrow import read_deposit, read_report_watermark, submit_deposit
+from rri.validate import validate_report
+
+
+DOMAIN_NS = 'urn:ietf:params:xml:ns:rdeDomain-1.0'
+HOST_NS = 'urn:ietf:params:xml:ns:rdeHost-1.0'
+
+
+def _deposit(kind='FULL', header=True, domains=3, hosts=1, deletes=0):
+    objects = ''.join(
+        f'<rdeDomain:domain><rdeDomain:name>d{n}.example</rdeDomain:name>'
+        f'</rdeDomain:domain>' for n in range(domains)
+    ) + ''.join(
+        f'<rdeHost:host><rdeHost:name>ns{n}.example</rdeHost:name>'
+        f'</rdeHost:host>' for n in range(hosts)
+    )
+    removed = ''.join(
+        f'<rdeDomain:delete><rdeDomain:name>x{n}.example</rdeDomain:name>'
+        f'</rdeDomain:delete>' for n in range(deletes)
+    )
+    header_xml = f'''
+    <rdeHeader:header>
+      <rdeHeader:tld>example</rdeHeader:tld>
+      <rdeHeader:count uri="{DOMAIN_NS}">{domains}</rdeHeader:count>
+      <rdeHeader:count uri="{HOST_NS}">{hosts}</rdeHeader:count>
+    </rdeHeader:header>''' if header else ''
+
+    return f'''<?xml version="1.0" encoding="UTF-8"?>
+<rde:deposit type="{kind}" id="20180809001" resend="1"
+  xmlns:rde="urn:ietf:params:xml:ns:rde-1.0"
+  xmlns:rdeHeader="urn:ietf:params:xml:ns:rdeHeader-1.0"
+  xmlns:rdeDomain="{DOMAIN_NS}"
+  xmlns:rdeHost="{HOST_NS}">
+  <rde:watermark>2018-08-09T00:00:00Z</rde:watermark>
+  <rde:rdeMenu>
+    <rde:version>1.0</rde:version>
+    <rde:objURI>{DOMAIN_NS}</rde:objURI>
+  </rde:rdeMenu>
+  <rde:contents>{header_xml}{objects}</rde:contents>
+  <rde:deletes>{removed}</rde:deletes>
+</rde:deposit>'''.encode()
+
+
+def test_read_deposit():
+    summary = read_deposit(io.BytesIO(_deposit(domains=3, hosts=2,
+                                               deletes=4)))
+
+    assert summary.id == '20180809001'
+    assert summary.kind == 'FULL'
+    assert summary.resend == 1
+    assert summary.watermark == '2018-08-09T00:00:00Z'
+    assert summary.tld == 'example'
+    assert summary.header_counts == {DOMAIN_NS: 3, HOST_NS: 2}
+    assert summary.counts == {DOMAIN_NS: 3, HOST_NS: 2}
+    assert summary.deletes == {DOMAIN_NS: 4}
+
+
+def test_read_deposit_path(tmpdir):
+    path = tmpdir.join('deposit.xml')
+    path.write_binary(_deposit())
+
+    assert read_deposit(str(path)).counts[DOMAIN_NS] == 3
+
+
+def test_read_deposit_rejects_other_documents():
+    with pytest.raises(ValueError):
+        read_deposit(io.BytesIO(b'<report/>'))
+
+
+@pytest.mark.parametrize('kind, header, expected_kind', [
+    ('FULL', True, 'FULL'),
+    ('INCR', True, 'INCR'),
+    ('DIFF', False, 'INCR'),
+])
+def test_report_is_valid(kind, header, expected_kind):
+    summary = read_deposit(io.BytesIO(_deposit(kind, header)))
+    summary.tld = summary.tld or 'example'
+    report = summary.to_report(created=datetime(2018, 8, 9, 0, 15))
+
+    validate_report('registry-escrow-report', report)
+    assert f'<rdeReport:kind>{expected_kind}</rdeReport:kind>' in report
+    assert '<rdeReport:crDate>2018-08-09T00:15:00.000000Z' in report
+    assert f'<rdeHeader:count uri="{DOMAIN_NS}">3</rdeHeader:count>' in report
+
+
+def test_read_report_watermark():
+    report = read_deposit(io.BytesIO(_deposit())).to_report()
+
+    assert read_report_watermark(io.BytesIO(report.encode())) == \
+        '2018-08-09T00:00:00Z'
+
+    with pytest.raises(ValueError):
+        read_report_watermark(io.BytesIO(_deposit()))
+    with pytest.raises(ValueError):
+        read_report_watermark(io.BytesIO(b'<rdeReport:report'))
+
+
+def test_submit_deposit(responses):
+    responses.add(responses.PUT, status=200, url='https://ry-api.icann.org'
+                  '/report/registry-escrow-report/example/20180809001')
+    rric = RRIClient('example', 'testuser', 'testpass')
+
+    r = submit_deposit(rric.report, io.BytesIO(_deposit()))
+
+    assert r.success
+    assert b'<rdeReport:id>20180809001' in \
+        responses.calls[0].request.body.encode()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `rri.fleet` module."""
+import base64
+
+import pytest
+import requests
+
+
+from rri import RRIClient, RRIFleet
+from rri.transport import RequestsTransport, Urllib3Transport
+
+
+@pytest.fixture(scope='function')
+def fleet():
+    return RRIFleet({
+        'example': ('exampleuser', 'examplepass'),
+        'test': ('testuser', 'testpass'),
+    }, pool_size=4)
+
+
+def _basic_auth(user, password):
+    token = base64.b64encode(f'{user}:{password}'.encode()).decode()
+    return f'Basic {token}'
+
+
+def test_fleet_builds_clients_lazily(fleet):
+    assert len(fleet) == 2
+    assert fleet._clients == {}
+
+    rric = fleet['example']
+
+    assert isinstance(rric, RRIClient)
+    assert fleet['example'] is rric
+    assert list(fleet._clients) == ['example']
+
+
+@pytest.mark.withoutresponses
+def test_fleet_shares_transport(fleet):
+    assert isinstance(fleet.client, Urllib3Transport)
+    assert fleet['example'].client is fleet['test'].client
+    assert fleet['example'].client.pool.connection_pool_kw['maxsize'] == 4
+
+
+def test_fleet_wraps_session():
+    session = requests.Session()
+    fleet = RRIFleet({'example': ('exampleuser', 'examplepass')},
+                     client=session)
+
+    assert isinstance(fleet.client, RequestsTransport)
+    assert fleet['example'].client.session is session
+
+
+def test_fleet_unknown_tld(fleet):
+    assert 'unknown' not in fleet
+    assert fleet.get('unknown') is None
+
+    with pytest.raises(KeyError):
+        fleet['unknown']
+
+
+def test_fleet_sends_per_request_auth(fleet, responses):
+    for tld in ('example', 'test'):
+        responses.add(responses.HEAD, status=200,
+                      url=f'https://ry-api.icann.org/info/report/registry-escrow-report/{tld}/2018-08-09')
+
+    fleet['example'].report.check('2018-08-09')
+    fleet['test'].report.check('2018-08-09')
+
+    assert fleet.client.session.auth is None
+    assert responses.calls[0].request.headers['Authorization'] == \
+        _basic_auth('exampleuser', 'examplepass')
+    assert responses.calls[1].request.headers['Authorization'] == \
+        _basic_auth('testuser', 'testpass')
+
+
+def test_fleet_from_csv(tmpdir):
+    path = tmpdir.join('credentials.csv')
+    path.write('# tld,user,pass\nexample, exampleuser, examplepass\n')
+
+    fleet = RRIFleet.from_csv(str(path), base_url='test.example')
+
+    assert list(fleet) == ['example']
+    assert fleet['example'].rri_user == 'exampleuser'
+    assert fleet['example'].base_url == 'test.example'
@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `rri.lease` module."""
+import multiprocessing
+import threading
+from collections import Counter
+
+import pytest
+
+
+from rri import RRIFleet
+from rri.lease import (FileLeaseBackend, Lease, LeaseCoordinator,
+                       Partitioner, SQLiteLeaseBackend)
+
+
+TRANSACTIONS_URL = \
+    'https://ry-api.icann.org/report/registrar-transactions/example/2018-08'
+
+
+@pytest.fixture(params=['sqlite', 'file'])
+def backend(request, tmpdir):
+    if request.param == 'sqlite':
+        backend = SQLiteLeaseBackend(str(tmpdir.join('leases.db')))
+    else:
+        backend = FileLeaseBackend(str(tmpdir.join('leases')))
+    yield backend
+    backend.close()
+
+
+def test_acquire_and_release(backend):
+    assert backend.acquire('key', 'a', 60)
+    assert not backend.acquire('key', 'b', 60)
+    # Acquiring a lease already held extends it
+    assert backend.acquire('key', 'a', 60)
+    assert backend.holder('key')[0] == 'a'
+
+    # Only the holder can renew or release it
+    assert not backend.renew('key', 'b', 60)
+    backend.release('key', 'b')
+    assert backend.renew('key', 'a', 60)
+
+    backend.release('key', 'a')
+
+    assert backend.holder('key') is None
+    assert backend.acquire('key', 'b', 60)
+
+
+def test_expired_lease_is_taken_over(backend):
+    assert backend.acquire('key', 'a', -1)
+    assert backend.holder('key') is None
+
+    assert backend.acquire('key', 'b', 60)
+    assert not backend.renew('key', 'a', 60)
+    assert backend.holder('key')[0] == 'b'
+
+
+def test_completed_lease_is_never_granted(backend):
+    assert backend.acquire('key', 'a', 60)
+    assert not backend.complete('key', 'b')
+    assert backend.complete('key', 'a')
+
+    assert backend.holder('key') == ('a', None)
+    assert not backend.acquire('key', 'a', 60)
+    assert not backend.acquire('key', 'b', 60)
+    backend.release('key', 'a')
+    assert backend.holder('key') == ('a', None)
+
+    backend.reset('key')
+
+    assert backend.acquire('key', 'b', 60)
+
+
+def _acquire_all(args):
+    path, kind, owner = args
+    if kind == 'sqlite':
+        backend = SQLiteLeaseBackend(path)
+    else:
+        backend = FileLeaseBackend(path)
+    return [key for key in map(str, range(50))
+            if backend.acquire(key, owner, 60)]
+
+
+@pytest.mark.parametrize('kind', ['sqlite', 'file'])
+def test_one_holder_across_processes(kind, tmpdir):
+    path = str(tmpdir.join('leases'))
+    context = multiprocessing.get_context('spawn')
+
+    with context.Pool(4) as pool:
+        acquired = pool.map(_acquire_all, [(path, kind, f'worker-{n}')
+                                           for n in range(4)])
+
+    counts = Counter(key for keys in acquired for key in keys)
+    assert sorted(counts, key=int) == list(map(str, range(50)))
+    assert set(counts.values()) == {1}
+
+
+def test_lease_keepalive():
+    backend = SQLiteLeaseBackend()
+    assert backend.acquire('key', 'a', 0.15)
+
+    with Lease(backend, 'key', 'a', ttl=0.15) as lease:
+        threading.Event().wait(0.4)
+        assert not backend.acquire('key', 'b', 60)
+        assert not lease.lost
+
+    assert backend.holder('key') is None
+
+    assert backend.acquire('key', 'a', 0.15)
+    lease = Lease(backend, 'key', 'a', ttl=0.15)
+    backend.reset('key')
+    assert backend.acquire('key', 'b', 60)
+    threading.Event().wait(0.2)
+
+    assert lease.lost
+    lease.release()
+    assert backend.holder('key')[0] == 'b'
+
+
+def test_partitioner():
+    keys = [f'example/registrar-transactions/{n}' for n in range(2000)]
+    workers = [Partitioner(4, n) for n in range(4)]
+
+    # Every key has exactly one owner, and the load is spread evenly
+    owned = [sum(map(worker.owns, keys)) for worker in workers]
+    assert sum(owned) == len(keys)
+    assert min(owned) > len(keys) / 4 * 0.8
+
+    # A fifth worker only takes keys, it doesn't move them between others
+    before = {key: workers[0].owner(key) for key in keys}
+    after = {key: Partitioner(5, 0).owner(key) for key in keys}
+    moved = [key for key in keys if before[key] != after[key]]
+    assert all(after[key] == '4' for key in moved)
+    assert len(moved) < len(keys) / 5 * 1.2
+
+    with pytest.raises(ValueError):
+        Partitioner(['a', 'b'], 'c')
+
+
+def test_coordinator_submits_once(responses):
+    responses.add(responses.PUT, status=200, url=TRANSACTIONS_URL)
+    fleet = RRIFleet({'example': ('exampleuser', 'examplepass')})
+    backend = SQLiteLeaseBackend()
+    workers = [LeaseCoordinator(fleet, backend, Partitioner(3, n),
+                                owner=str(n))
+               for n in range(3)]
+    args = ('example', 'registrar-transactions', '2018-08', 'a,b\r\n')
+
+    results = [worker.submit(*args) for worker in workers]
+    taken_over = [worker.submit(*args, takeover=True) for worker in workers]
+
+    assert sum(result is not None for result in results) == 1
+    assert next(filter(None, results)).success
+    assert taken_over == [None] * 3
+    assert len(responses.calls) == 1
+    assert backend.holder(LeaseCoordinator.key(*args[:3]))[1] is None
+
+
+def test_coordinator_releases_rejected_reports(responses):
+    responses.add(responses.PUT, status=400, url=TRANSACTIONS_URL)
+    responses.add(responses.PUT, status=200, url=TRANSACTIONS_URL)
+    fleet = RRIFleet({'example': ('exampleuser', 'examplepass')})
+    coordinator = LeaseCoordinator(fleet, SQLiteLeaseBackend())
+    args = ('example', 'registrar-transactions', '2018-08', 'a,b\r\n')
+
+    assert not coordinator.submit(*args).success
+    assert coordinator.submit(*args).success
+    assert coordinator.submit(*args) is None
+    assert len(responses.calls) == 2
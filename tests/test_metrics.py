@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `rri.metrics` module."""
+import pytest
+
+
+from rri import RRIClient
+from rri.exception import GeneralFailure
+from rri.metrics import LatencyHistogram, MetricsCollector, RRIEvent
+
+
+CHECK_URL = 'https://ry-api.icann.org/info/report/registrar-transactions/example/2018-08'
+SUBMIT_URL = 'https://ry-api.icann.org/report/registrar-transactions/example/2018-08'
+
+
+@pytest.fixture
+def events():
+    return []
+
+
+@pytest.fixture
+def rric(events):
+    return RRIClient('example', 'testuser', 'testpass', hooks=[events.append])
+
+
+def test_check_emits_event(rric, events, responses):
+    responses.add(responses.HEAD, status=404, url=CHECK_URL)
+
+    rric.transactions.check('2018-08')
+
+    event, = events
+    assert event.tld == 'example'
+    assert event.resource == 'registrar-transactions'
+    assert event.method == 'HEAD'
+    assert event.status == 404
+    assert event.exception is None
+    assert event.bytes_sent == 0
+    # requests doesn't measure the time spent connecting
+    assert event.connect is None
+    assert event.ttfb is not None
+    assert event.total >= 0
+
+
+def test_failed_check_emits_exception(rric, events, responses):
+    responses.add(responses.HEAD, status=500, url=CHECK_URL)
+
+    with pytest.raises(GeneralFailure):
+        rric.transactions.check('2018-08')
+
+    assert events[0].status == 500
+    assert events[0].exception is GeneralFailure
+
+
+@pytest.mark.parametrize('report, expected', [
+    ('registrar-name,iana-id\n', 23),
+    (iter([b'registrar-name,', b'iana-id\n']), 23),
+])
+def test_submit_emits_bytes_sent(rric, events, responses, report, expected):
+    def callback(request):
+        # Consume streamed bodies as a real transport would
+        if not isinstance(request.body, (str, bytes)):
+            b''.join(request.body)
+        return 200, {}, ''
+
+    responses.add_callback(responses.PUT, callback=callback, url=SUBMIT_URL)
+
+    rric.transactions.submit(report, '2018-08')
+
+    assert events[0].method == 'PUT'
+    assert events[0].bytes_sent == expected
+
+
+def test_failing_hook_does_not_fail_request(responses):
+    def hook(event):
+        raise RuntimeError
+
+    responses.add(responses.HEAD, status=200, url=CHECK_URL)
+    rric = RRIClient('example', 'testuser', 'testpass', hooks=[hook])
+
+    assert rric.transactions.check('2018-08') is True
+
+
+def test_histogram():
+    histogram = LatencyHistogram(buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 5.0):
+        histogram.observe(value)
+
+    assert list(histogram.cumulative()) == [
+        (0.1, 2), (1.0, 3), (float('inf'), 4)
+    ]
+    assert histogram.count == 4
+    assert histogram.sum == pytest.approx(5.65)
+
+
+def test_prometheus_export(responses):
+    collector = MetricsCollector(buckets=(0.5,))
+    rric = RRIClient('example', 'testuser', 'testpass', hooks=[collector])
+
+    responses.add(responses.HEAD, status=200, url=CHECK_URL)
+    rric.transactions.check('2018-08')
+    rric.transactions.check('2018-08')
+
+    text = collector.to_prometheus()
+
+    assert '# TYPE rri_request_duration_seconds histogram' in text
+    assert 'rri_request_duration_seconds_bucket{resource="registrar-transactions",method="HEAD",le="+Inf"} 2' in text
+    assert 'rri_request_duration_seconds_count{resource="registrar-transactions",method="HEAD"} 2' in text
+    assert 'rri_requests_total{resource="registrar-transactions",method="HEAD",status="200",exception=""} 2' in text
+
+
+def test_connect_histogram():
+    collector = MetricsCollector(buckets=(0.5,))
+
+    for connect in (None, 0.0, 0.2):
+        collector(RRIEvent('example', 'registrar-transactions', 'HEAD', 200,
+                           connect=connect, total=0.3))
+
+    text = collector.to_prometheus()
+
+    assert 'rri_connect_seconds_count{resource="registrar-transactions",method="HEAD"} 1' in text
+
+
+def test_coalesced_counter():
+    collector = MetricsCollector(buckets=(0.5,))
+
+    collector(RRIEvent('example', 'registry-escrow-report', 'HEAD', 200,
+                       total=0.3))
+    collector(RRIEvent('example', 'registry-escrow-report', 'HEAD', None,
+                       total=0.2, coalesced=True))
+
+    text = collector.to_prometheus()
+
+    assert 'rri_requests_total{resource="registry-escrow-report",method="HEAD",status="200",exception=""} 1' in text
+    assert 'rri_request_duration_seconds_count{resource="registry-escrow-report",method="HEAD"} 1' in text
+    assert 'rri_coalesced_total{resource="registry-escrow-report",method="HEAD",exception=""} 1' in text
@@ -0,0 +1,192 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `rri.outbox` module."""
+import time
+
+import pytest
+import requests
+
+
+from rri import RRIFleet
+from rri.outbox import Outbox
+
+
+TRANSACTIONS_URL = 'https://ry-api.icann.org/report/registrar-transactions'
+ESCROW_URL = 'https://ry-api.icann.org/report/registry-escrow-report'
+
+
+@pytest.fixture
+def outbox(tmpdir):
+    outbox = Outbox(str(tmpdir.join('outbox.sqlite')), max_attempts=2,
+                    backoff_factor=0.05)
+    yield outbox
+    outbox.close()
+
+
+@pytest.fixture
+def fleet():
+    return RRIFleet({
+        'example': ('exampleuser', 'examplepass'),
+        'test': ('testuser', 'testpass'),
+    })
+
+
+@pytest.fixture
+def report(tmpdir):
+    path = tmpdir.join('report.csv')
+    path.write_binary(b'registrar-name,iana-id\r\n')
+    return path
+
+
+def test_outbox_add_is_idempotent(outbox, report):
+    assert outbox.add('example', 'registrar-transactions', '2018-08', report)
+    assert not outbox.add('example', 'registrar-transactions', '2018-08',
+                          report)
+
+    items = outbox.items()
+    assert len(items) == 1
+    assert items[0].payload == str(report)
+    assert items[0].state == 'pending'
+
+
+def test_outbox_claim(outbox, report):
+    outbox.add('example', 'registrar-transactions', '2018-08', report)
+
+    item = outbox.claim()
+    assert item.state == 'in-flight'
+    assert item.attempts == 1
+    assert outbox.claim() is None
+
+    outbox.finish(item, 'done')
+    assert outbox.counts()['done'] == 1
+
+
+def test_outbox_reclaims_abandoned_items(outbox, report):
+    outbox.add('example', 'registrar-transactions', '2018-08', report)
+    outbox.claim()
+
+    outbox.lease_timeout = 0
+    item = outbox.claim()
+
+    assert item.attempts == 2
+
+
+def test_outbox_drain(outbox, fleet, report, responses):
+    responses.add(responses.PUT, f'{TRANSACTIONS_URL}/example/2018-08',
+                  status=200)
+    responses.add(responses.PUT, f'{TRANSACTIONS_URL}/test/2018-08',
+                  status=400, body='<error/>')
+    responses.add(responses.PUT, f'{ESCROW_URL}/example/20180809001',
+                  status=200)
+    responses.add(responses.POST,
+                  'https://ry-api.icann.org/report/escrow-agent-notification'
+                  '/example', status=200)
+
+    outbox.add('example', 'registrar-transactions', '2018-08', report)
+    outbox.add('test', 'registrar-transactions', '2018-08', report)
+    outbox.add('example', 'registry-escrow-report', '20180809001', report)
+    outbox.add('example', 'escrow-agent-notification', None, report)
+
+    counts = outbox.drain(fleet, max_workers=2)
+
+    assert counts == {'pending': 0, 'in-flight': 0, 'done': 3,
+                      'rejected': 1, 'failed': 0}
+    assert outbox.items('rejected')[0].error == '<error/>'
+    assert len(responses.calls) == 4
+
+
+def test_outbox_uploads_file_contents(outbox, fleet, report, responses):
+    bodies = []
+
+    def callback(request):
+        bodies.append(bytes(request.body))
+        return 200, {}, ''
+
+    responses.add_callback(responses.PUT,
+                           f'{TRANSACTIONS_URL}/example/2018-08',
+                           callback=callback)
+    outbox.add('example', 'registrar-transactions', '2018-08', report)
+
+    assert outbox.drain(fleet)['done'] == 1
+    assert bodies == [report.read_binary()]
+
+
+def test_outbox_resumes_after_crash(tmpdir, fleet, report, responses):
+    responses.add(responses.PUT, f'{TRANSACTIONS_URL}/example/2018-09',
+                  status=200)
+    path = str(tmpdir.join('outbox.sqlite'))
+
+    crashed = Outbox(path)
+    crashed.add('example', 'registrar-transactions', '2018-08', report)
+    crashed.add('example', 'registrar-transactions', '2018-09', report)
+    crashed.finish(crashed.claim(), 'done')
+    crashed.claim()
+    crashed.close()
+
+    outbox = Outbox(path)
+    counts = outbox.drain(fleet)
+    outbox.close()
+
+    assert counts['done'] == 2
+    assert [call.request.url for call in responses.calls] == \
+        [f'{TRANSACTIONS_URL}/example/2018-09']
+
+
+def test_outbox_retries_transient_failures(outbox, fleet, report,
+                                           responses):
+    responses.add(responses.PUT, f'{TRANSACTIONS_URL}/example/2018-08',
+                  status=500)
+    responses.add(responses.PUT, f'{TRANSACTIONS_URL}/test/2018-08',
+                  body=requests.ConnectionError())
+    outbox.add('example', 'registrar-transactions', '2018-08', report)
+    outbox.add('test', 'registrar-transactions', '2018-08', report)
+
+    counts = outbox.drain(fleet)
+
+    assert counts['failed'] == 2
+    assert len(responses.calls) == 4
+
+
+def test_outbox_delays_retries(outbox, fleet, report, responses):
+    attempts = []
+
+    def callback(request):
+        attempts.append(time.monotonic())
+        return 500, {}, ''
+
+    responses.add_callback(responses.PUT,
+                           f'{TRANSACTIONS_URL}/example/2018-08',
+                           callback=callback)
+    outbox.add('example', 'registrar-transactions', '2018-08', report)
+
+    assert outbox.process(fleet, outbox.claim()) == 'pending'
+    # Not claimed again until the backoff has passed
+    assert outbox.claim() is None
+    assert outbox.next_due() > time.time()
+
+    assert outbox.drain(fleet, recover=False)['failed'] == 1
+    assert attempts[1] - attempts[0] >= 0.05
+
+
+def test_outbox_backoff(tmpdir):
+    outbox = Outbox(str(tmpdir.join('outbox.sqlite')), backoff_factor=10,
+                    max_backoff=60)
+
+    assert [outbox.backoff(n) for n in range(1, 6)] == [10, 20, 40, 60, 60]
+    assert outbox.backoff(1, retry_after=30) == 30
+
+
+def test_outbox_unknown_tld_fails(outbox, fleet, report):
+    outbox.add('unknown', 'registrar-transactions', '2018-08', report)
+
+    assert outbox.drain(fleet)['failed'] == 1
+    assert 'KeyError' in outbox.items('failed')[0].error
+
+
+def test_outbox_retry_failed(outbox, report):
+    outbox.add('example', 'registrar-transactions', '2018-08', report)
+    outbox.finish(outbox.claim(), 'failed', 'GeneralFailure()')
+
+    assert outbox.retry_failed() == 1
+    assert outbox.items('pending')[0].attempts == 0
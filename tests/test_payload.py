@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `rri.payload` module."""
+import hashlib
+import io
+import pathlib
+
+import pytest
+
+
+from rri.payload import open_report, report_digest, HashingIterator
+
+
+@pytest.fixture
+def report_path(tmpdir):
+    path = tmpdir.join('report.csv')
+    path.write_binary(b'registrar-name,iana-id\nExample,9999\n')
+    return pathlib.Path(str(path))
+
+
+@pytest.mark.parametrize('report', [
+    '<examplereport></examplereport>',
+    b'<examplereport></examplereport>',
+])
+def test_open_report_passes_content_through(report):
+    with open_report(report) as body:
+        assert body is report
+
+
+def test_open_report_maps_path(report_path):
+    with open_report(report_path) as body:
+        assert isinstance(body, memoryview)
+        assert body.tobytes() == report_path.read_bytes()
+
+    # The mapping is released once the upload has finished
+    with pytest.raises(ValueError):
+        body.tobytes()
+
+
+def test_open_report_maps_open_file(report_path):
+    with open(report_path, 'rb') as f, open_report(f) as body:
+        assert isinstance(body, memoryview)
+        assert body.nbytes == report_path.stat().st_size
+
+
+def test_open_report_streams_partially_read_file(report_path):
+    with open(report_path, 'rb') as f:
+        f.readline()
+
+        with open_report(f) as body:
+            assert body is f
+
+
+def test_open_report_empty_file(tmpdir):
+    path = tmpdir.join('empty.csv')
+    path.write_binary(b'')
+
+    with open_report(pathlib.Path(str(path))) as body:
+        assert body == b''
+
+
+@pytest.mark.parametrize('report', [
+    io.BytesIO(b'registrar-name,iana-id\n'),
+    iter([b'registrar-name,iana-id\n', b'Example,9999\n']),
+])
+def test_open_report_streams_other_sources(report):
+    with open_report(report) as body:
+        assert body is report
+
+
+def test_report_digest(report_path):
+    expected = hashlib.sha256(report_path.read_bytes()).hexdigest()
+
+    with open_report(report_path) as body:
+        assert report_digest(body) == expected
+
+    with open(report_path, 'rb') as f:
+        f.read(5)
+        assert report_digest(io.BytesIO(report_path.read_bytes())) == expected
+        assert f.tell() == 5
+
+
+def test_hashing_iterator():
+    chunks = [b'registrar-name,iana-id\n', b'Example,9999\n']
+    hashing = HashingIterator(chunks)
+
+    assert next(hashing) == chunks[0]
+    assert hashing.hexdigest() is None
+
+    assert list(hashing) == chunks[1:]
+    assert hashing.hexdigest() == hashlib.sha256(b''.join(chunks)).hexdigest()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `rri.reports` module."""
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from rri import RRIClient
+from rri.reports import TransactionsReport, FunctionsReport, \
+    TRANSACTION_FIELDS, FUNCTION_FIELDS
+
+
+@pytest.fixture
+def transactions():
+    report = TransactionsReport({9999: 'Example Registrar, Inc.',
+                                 1000: 'Other Registrar'})
+    report.add(np.array([9999, 9999, 1000, 2000]),
+               np.array(['net-adds-1-yr', 'net-adds-1-yr', 'attempted-adds',
+                         'net-adds-1-yr']))
+    report.add_batch({
+        'iana_id': np.array([9999, 1000]),
+        'field': np.array([0, 0]),
+        'domains': np.array([120, 30]),
+    }, count='domains')
+    return report
+
+
+def test_transactions_counters(transactions):
+    rows = {row[1]: row for row in transactions.rows()}
+    net_adds = 2 + TRANSACTION_FIELDS.index('net-adds-1-yr')
+    attempted = 2 + TRANSACTION_FIELDS.index('attempted-adds')
+
+    assert list(rows) == [1000, 2000, 9999, '']
+    assert rows[9999][0] == 'Example Registrar, Inc.'
+    assert rows[9999][2] == 120
+    assert rows[9999][net_adds] == 2
+    assert rows[1000][attempted] == 1
+    assert rows[2000][0] == ''
+    assert rows[''][:3] == ['Totals', '', 150]
+    assert rows[''][net_adds] == 3
+
+
+def test_transactions_csv(transactions):
+    lines = transactions.to_csv().split('\r\n')
+
+    assert lines[0] == ','.join(['registrar-name', 'iana-id',
+                                 *TRANSACTION_FIELDS])
+    assert lines[3].startswith('"Example Registrar, Inc.",9999,120,0,2,')
+    assert lines[4].startswith('Totals,,150,0,3,')
+    assert lines[5] == ''
+
+
+def test_transactions_unknown_field():
+    report = TransactionsReport()
+
+    with pytest.raises(ValueError):
+        report.add([9999], ['not-a-field'])
+
+    with pytest.raises(ValueError):
+        report.add([9999], [len(TRANSACTION_FIELDS)])
+
+
+def test_transactions_mixed_iana_id_types():
+    report = TransactionsReport({'9999': 'Example Registrar, Inc.',
+                                 1000: 'Other Registrar'})
+    report.add(['9999', '1000'], ['net-adds-1-yr', 'net-adds-1-yr'])
+    report.add(np.array([9999]), ['net-adds-1-yr'])
+
+    rows = {row[1]: row for row in report.rows()}
+    net_adds = 2 + TRANSACTION_FIELDS.index('net-adds-1-yr')
+
+    assert list(rows) == [1000, 9999, '']
+    assert rows[9999][0] == 'Example Registrar, Inc.'
+    assert rows[9999][net_adds] == 2
+
+    with pytest.raises(ValueError):
+        report.add(['not-an-id'], ['net-adds-1-yr'])
+
+
+@pytest.mark.parametrize('counts', [
+    np.array([1.5]),
+    np.array([np.nan]),
+    np.array(['1']),
+])
+def test_fractional_counts_are_rejected(counts):
+    with pytest.raises(ValueError):
+        TransactionsReport().add([9999], ['net-adds-1-yr'], counts)
+    with pytest.raises(ValueError):
+        FunctionsReport().add(['srs-dom-check'], counts)
+
+
+def test_whole_float_counts_are_accepted():
+    report = FunctionsReport()
+    report.add(['srs-dom-check'], np.array([3.0]))
+
+    assert sum(map(int, report.to_csv().split('\r\n')[1].split(','))) == 3
+
+
+def test_transactions_submit_streams(transactions, responses):
+    captured = []
+
+    def callback(request):
+        captured.append(b''.join(request.body))
+        return 200, {}, ''
+
+    responses.add_callback(responses.PUT, callback=callback,
+                           url='https://ry-api.icann.org/report/registrar-transactions/example/2018-08')
+
+    rric = RRIClient('example', 'testuser', 'testpass')
+    r = transactions.submit(rric.transactions, '2018-08')
+
+    assert r.success
+    assert captured[0].decode() == transactions.to_csv()
+
+
+def test_functions_csv():
+    report = FunctionsReport()
+    report.add(np.array(['srs-dom-check'] * 5 + ['srs-dom-create']))
+    report.add(np.array(['whois-43-queries']), counts=np.array([1000]))
+    report.set('operational-registrars', 12)
+
+    header, values, end = report.to_csv().split('\r\n')
+    values = dict(zip(header.split(','), map(int, values.split(','))))
+
+    assert header == ','.join(FUNCTION_FIELDS)
+    assert values['operational-registrars'] == 12
+    assert values['whois-43-queries'] == 1000
+    assert values['srs-dom-check'] == 5
+    assert values['srs-dom-create'] == 1
+    assert sum(values.values()) == 1018
+    assert end == ''
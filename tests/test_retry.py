@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `rri.retry` module."""
+import pytest
+import requests
+
+
+from rri import RRIClient
+from rri.exception import ConnectionFailed, GeneralFailure
+from rri.retry import RetryPolicy, RetryBudget
+
+
+CHECK_URL = 'https://ry-api.icann.org/info/report/registrar-transactions/example/2018-08'
+SUBMIT_URL = 'https://ry-api.icann.org/report/registrar-transactions/example/2018-08'
+
+
+@pytest.fixture
+def sleeps():
+    return []
+
+
+@pytest.fixture
+def retry(sleeps):
+    return RetryPolicy(max_retries=2, jitter=False, sleep=sleeps.append)
+
+
+@pytest.fixture
+def rric(retry):
+    return RRIClient('example', 'testuser', 'testpass', retry=retry)
+
+
+def test_retry_until_success(rric, responses, sleeps):
+    responses.add(responses.PUT, status=500, url=SUBMIT_URL)
+    responses.add(responses.PUT, status=503, url=SUBMIT_URL)
+    responses.add(responses.PUT, status=200, url=SUBMIT_URL)
+
+    r = rric.transactions.submit('registrar-name,iana-id\n', '2018-08')
+
+    assert r.success
+    assert r.retries == 2
+    assert r.retry_time >= 0
+    assert sleeps == [0.5, 1.0]
+
+
+def test_retry_exhausted_raises_status(rric, responses, sleeps):
+    responses.add(responses.HEAD, status=500, url=CHECK_URL)
+
+    with pytest.raises(GeneralFailure):
+        rric.transactions.check('2018-08')
+
+    assert len(responses.calls) == 3
+
+
+def test_retry_connection_error(rric, responses):
+    responses.add(responses.HEAD, url=CHECK_URL,
+                  body=requests.ConnectionError('connection reset'))
+    responses.add(responses.HEAD, status=200, url=CHECK_URL)
+
+    assert rric.transactions.check('2018-08') is True
+
+
+def test_retry_connection_error_exhausted(rric, responses):
+    responses.add(responses.HEAD, url=CHECK_URL,
+                  body=requests.ConnectionError('connection reset'))
+
+    with pytest.raises(ConnectionFailed):
+        rric.transactions.check('2018-08')
+
+
+def test_retry_honours_retry_after(rric, responses, sleeps):
+    responses.add(responses.HEAD, status=503, url=CHECK_URL,
+                  headers={'Retry-After': '7'})
+    responses.add(responses.HEAD, status=200, url=CHECK_URL)
+
+    rric.transactions.check('2018-08')
+
+    assert sleeps == [7.0]
+
+
+def test_retry_skips_iterables(rric, responses):
+    responses.add(responses.PUT, status=500, url=SUBMIT_URL)
+
+    with pytest.raises(GeneralFailure):
+        rric.transactions.submit(iter([b'registrar-name,iana-id\n']),
+                                 '2018-08')
+
+    assert len(responses.calls) == 1
+
+
+def test_retry_budget_limits_retries(responses, sleeps):
+    retry = RetryPolicy(max_retries=5, sleep=sleeps.append,
+                        budget=RetryBudget(ratio=0.1, min_retries=1))
+    rric = RRIClient('example', 'testuser', 'testpass', retry=retry)
+    responses.add(responses.HEAD, status=500, url=CHECK_URL)
+
+    with pytest.raises(GeneralFailure):
+        rric.transactions.check('2018-08')
+
+    assert len(sleeps) == 1
+
+
+@pytest.mark.parametrize('retry, retry_after, expected', [
+    (0, None, 0.5),
+    (3, None, 4.0),
+    (10, None, 30.0),
+    (0, '2', 2.0),
+    (0, '120', 30.0),
+    (0, 'Wed, 21 Oct 2015 07:28:00 GMT', 0.0),
+])
+def test_backoff(retry, retry_after, expected):
+    policy = RetryPolicy(jitter=False)
+
+    assert policy.backoff(retry, retry_after) == expected
+
+
+def test_backoff_jitter():
+    policy = RetryPolicy()
+
+    assert all(0 <= policy.backoff(2) <= 2.0 for _ in range(100))
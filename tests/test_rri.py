@@ -2,12 +2,20 @@
 # -*- coding: utf-8 -*-
 
 """Tests for `rri` package."""
+import pathlib
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime as dt
 
 import pytest
 
 
 from rri import RRIClient
+from rri.rri import RRIResponse, _format_period
+from rri.validate import ReportError
 from rri.exception import InvalidInput, InvalidTldCredentials, \
     InvalidAccess, InvalidRequestMethod, GeneralFailure, NotImplemented, \
     UnknownStatus
@@ -80,6 +88,8 @@ def test_report_check_failure_raises_exception(rric, responses, return_value, ex
 
 @pytest.mark.parametrize('base_url, expected', [
     ('test.example', 'https://test.example/info/report/registry-escrow-report/example/2018-08-09'),
+    ('test.example:8443', 'https://test.example:8443/info/report/registry-escrow-report/example/2018-08-09'),
+    ('http://localhost:8080/', 'http://localhost:8080/info/report/registry-escrow-report/example/2018-08-09'),
     (None, 'https://ry-api.icann.org/info/report/registry-escrow-report/example/2018-08-09')
 ])
 def test_report_urls(responses, base_url, expected):
@@ -327,3 +337,358 @@ def test_transactions_urls(responses, base_url, expected):
 #     responses.add(responses.HEAD, status=200, url=target_url)
 #
 #     assert rric_resource.check(date) == True
+
+
+#
+# Bulk checks
+#
+def test_check_many(rric, responses):
+    base = 'https://ry-api.icann.org/info/report/registry-escrow-report/example/'
+    responses.add(responses.HEAD, status=200, url=base + '2018-08-09')
+    responses.add(responses.HEAD, status=404, url=base + '2018-08-10')
+    responses.add(responses.HEAD, status=500, url=base + '2018-08-11')
+
+    results = rric.report.check_many([
+        '2018-08-09', dt(2018, 8, 10), '2018-08-11', 'not-a-date-string', 20180812
+    ])
+
+    assert list(results) == ['2018-08-09', '2018-08-10', '2018-08-11',
+                             'not-a-date-string', 20180812]
+    assert results['2018-08-09'] is True
+    assert results['2018-08-10'] is False
+    assert isinstance(results['2018-08-11'], GeneralFailure)
+    assert isinstance(results['not-a-date-string'], ValueError)
+    assert isinstance(results[20180812], TypeError)
+
+
+def test_check_many_deduplicates_periods(rric, responses):
+    responses.add(responses.HEAD, status=200,
+                  url='https://ry-api.icann.org/info/report/registrar-transactions/example/2018-08')
+
+    results = rric.transactions.check_many([dt(2018, 8, 1), dt(2018, 8, 31)])
+
+    assert results == {'2018-08': True}
+    assert len(responses.calls) == 1
+
+
+@pytest.mark.parametrize('resource, start, end, expected', [
+    ('report', '2018-08-30', '2018-09-02',
+     ['2018-08-30', '2018-08-31', '2018-09-01', '2018-09-02']),
+    ('functions', '2018-11', dt(2019, 2, 14),
+     ['2018-11', '2018-12', '2019-01', '2019-02']),
+    ('transactions', '2018-08', '2018-07', []),
+])
+def test_check_range(rric, responses, resource, start, end, expected):
+    rric_resource = getattr(rric, resource)
+
+    for period in expected:
+        responses.add(responses.HEAD, status=200,
+                      url='https://ry-api.icann.org/info/report/{}/example/{}'.format(
+                          rric_resource.resource_name, period))
+
+    results = rric_resource.check_range(start, end, max_workers=2)
+
+    assert results == dict.fromkeys(expected, True)
+
+
+#
+# Coalescing
+#
+def _check_concurrently(rric_resource, responses, status, callers=5):
+    """Make identical checks while the first one's request is held up"""
+    started = threading.Event()
+    release = threading.Event()
+
+    def callback(request):
+        started.set()
+        release.wait(5)
+        return status, {}, ''
+
+    responses.add_callback(
+        responses.HEAD, callback=callback,
+        url='https://ry-api.icann.org/info/report/registry-escrow-report/example/2018-08-09')
+
+    def check():
+        try:
+            return rric_resource.check('2018-08-09')
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=callers) as executor:
+        first = executor.submit(check)
+        assert started.wait(5)
+        rest = [executor.submit(check) for _ in range(callers - 1)]
+        # Give the other callers time to join the request in flight
+        time.sleep(0.2)
+        release.set()
+
+        return [future.result() for future in [first] + rest]
+
+
+def test_check_coalesces_concurrent_checks(rric, responses):
+    results = _check_concurrently(rric.report, responses, 200)
+
+    assert results == [True] * 5
+    assert len(responses.calls) == 1
+    assert len(rric.report.in_flight) == 0
+
+
+def test_check_coalesced_checks_share_exception(rric, responses):
+    results = _check_concurrently(rric.report, responses, 500)
+
+    assert all(isinstance(result, GeneralFailure) for result in results)
+    assert len(responses.calls) == 1
+
+
+def test_check_coalescing_is_per_user(responses):
+    # Both requests must be in flight at once to get past the barrier
+    barrier = threading.Barrier(2, timeout=5)
+
+    def callback(request):
+        barrier.wait()
+        return 200, {}, ''
+
+    responses.add_callback(
+        responses.HEAD, callback=callback,
+        url='https://ry-api.icann.org/info/report/registry-escrow-report/example/2018-08-09')
+    first = RRIClient('example', 'testuser', 'testpass')
+    second = RRIClient('example', 'otheruser', 'otherpass')
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        results = list(executor.map(lambda rric: rric.report.check('2018-08-09'),
+                                    [first, second]))
+
+    assert results == [True, True]
+    assert len(responses.calls) == 2
+    assert {call.request.headers['Authorization'] for call in responses.calls} == {
+        'Basic dGVzdHVzZXI6dGVzdHBhc3M=', 'Basic b3RoZXJ1c2VyOm90aGVycGFzcw=='}
+
+
+def test_check_coalescing_is_per_client(responses):
+    barrier = threading.Barrier(2, timeout=5)
+
+    def callback(request):
+        barrier.wait()
+        return 200, {}, ''
+
+    responses.add_callback(
+        responses.HEAD, callback=callback,
+        url='https://ry-api.icann.org/info/report/registry-escrow-report/example/2018-08-09')
+    clients = [RRIClient('example', 'testuser', 'testpass') for _ in range(2)]
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        results = list(executor.map(lambda rric: rric.report.check('2018-08-09'),
+                                    clients))
+
+    assert results == [True, True]
+    assert len(responses.calls) == 2
+
+
+def test_check_coalesced_checks_emit_events(responses):
+    events = []
+    rric = RRIClient('example', 'testuser', 'testpass', hooks=[events.append])
+
+    results = _check_concurrently(rric.report, responses, 200, callers=3)
+
+    assert results == [True] * 3
+    assert len(responses.calls) == 1
+    assert [event.coalesced for event in events].count(False) == 1
+    assert [event.coalesced for event in events].count(True) == 2
+    assert all(event.status is None and event.total > 0
+               for event in events if event.coalesced)
+
+
+def test_check_runs_again_once_finished(rric, responses):
+    responses.add(responses.HEAD, status=404,
+                  url='https://ry-api.icann.org/info/report/registry-escrow-report/example/2018-08-09')
+
+    assert rric.report.check('2018-08-09') is False
+    assert rric.report.check('2018-08-09') is False
+    assert len(responses.calls) == 2
+
+
+#
+# Streaming submissions
+#
+def _capture_body(captured):
+    def callback(request):
+        body = request.body
+        if isinstance(body, memoryview):
+            body = body.tobytes()
+        elif not isinstance(body, (str, bytes)):
+            body = b''.join(body)
+
+        captured.append((body, request.headers))
+        return 200, {}, ''
+
+    return callback
+
+
+def test_submit_streams_path(rric, responses, tmpdir):
+    captured = []
+    responses.add_callback(responses.PUT, callback=_capture_body(captured),
+                           url='https://ry-api.icann.org/report/registrar-transactions/example/2018-08')
+
+    path = tmpdir.join('transactions.csv')
+    path.write_binary(b'registrar-name,iana-id\nExample,9999\n')
+
+    r = rric.transactions.submit(pathlib.Path(str(path)), '2018-08')
+
+    body, headers = captured[0]
+    assert r.success
+    assert body == b'registrar-name,iana-id\nExample,9999\n'
+    assert headers['Content-Length'] == str(len(body))
+
+
+def test_submit_streams_chunks(rric, responses):
+    captured = []
+    responses.add_callback(responses.PUT, callback=_capture_body(captured),
+                           url='https://ry-api.icann.org/report/registry-functions-activity/example/2018-08')
+
+    r = rric.functions.submit(iter([b'operational-registrars\n', b'10\n']),
+                              '2018-08')
+
+    body, headers = captured[0]
+    assert r.success
+    assert body == b'operational-registrars\n10\n'
+    assert headers['Transfer-Encoding'] == 'chunked'
+
+
+#
+# Responses
+
+def test_response_is_slotted():
+    response = RRIResponse(True, b'<ok/>')
+
+    assert not hasattr(response, '__dict__')
+    with pytest.raises(AttributeError):
+        response.other = 1
+
+
+@pytest.mark.parametrize('body, encoding, expected', [
+    (b'caf\xc3\xa9', None, 'caf\xe9'),
+    (b'caf\xe9', 'iso-8859-1', 'caf\xe9'),
+    ('caf\xe9', None, 'caf\xe9'),
+    (None, None, ''),
+])
+def test_response_body_decoded_on_read(body, encoding, expected):
+    response = RRIResponse(False, body, encoding=encoding)
+
+    assert response.response_body == expected
+    assert isinstance(response.content, bytes)
+
+
+def test_response_body_is_settable():
+    response = RRIResponse(False, b'<error/>')
+
+    response.response_body = 'caf\xe9'
+
+    assert response.content == b'caf\xc3\xa9'
+    assert response.response_body == 'caf\xe9'
+
+
+@pytest.mark.parametrize('content_type, expected', [
+    ('text/plain', 'caf\xe9'),
+    ('text/plain; charset=iso-8859-1', 'caf\xc3\xa9'),
+])
+def test_response_body_ignores_requests_default_charset(rric, responses,
+                                                        content_type,
+                                                        expected):
+    responses.add(responses.PUT, status=400, body=b'caf\xc3\xa9',
+                  content_type=content_type,
+                  url='https://ry-api.icann.org/report/registrar-transactions/example/2018-08')
+
+    response = rric.transactions.submit('registrar-name\n', '2018-08')
+
+    assert response.response_body == expected
+
+
+def test_response_errors(rric, responses):
+    responses.add(responses.PUT, status=400,
+                  body=b'line 2: iana-id: must be an integer\n',
+                  url='https://ry-api.icann.org/report/registrar-transactions/example/2018-08')
+
+    response = rric.transactions.submit('registrar-name,iana-id\n', '2018-08')
+
+    assert response.content == b'line 2: iana-id: must be an integer\n'
+    assert list(response.errors()) == \
+        [ReportError(2, 'iana-id', 'must be an integer')]
+
+
+def test_accepted_response_has_no_errors():
+    assert list(RRIResponse(True, b'line 2: accepted').errors()) == []
+
+
+# URL building
+#
+@pytest.mark.parametrize('id', [
+    None, '', '2018-08', '2018-08-09', 'EXAMPLEID', 'id with spaces',
+    'a/b?c#d', '~_.-', 'é', 12345,
+])
+def test_urls_match_templates(rric_resource, id):
+    assert rric_resource._get_submit_url(id) == \
+        rric_resource.submit_url.expand(id=id)
+
+    if id is not None:
+        assert rric_resource._get_info_url(id) == \
+            rric_resource.info_url.expand(id=id)
+
+
+def test_date_string_is_memoized(rric):
+    _format_period.cache_clear()
+
+    rric.report._get_date_string('2018-08-09')
+    rric.notification._get_date_string('2018-08-09')
+    rric.report._get_date_string(dt(2018, 8, 9))
+
+    assert _format_period.cache_info().hits == 1
+    assert _format_period.cache_info().currsize == 2
+
+
+# Package import
+
+def _imported_modules(code):
+    output = subprocess.check_output([
+        sys.executable, '-c',
+        f'import sys\n{code}\nprint(\' \'.join(sorted(sys.modules)))'
+    ])
+    return set(output.decode().split())
+
+
+def test_import_is_lazy():
+    modules = _imported_modules('import rri; rri.__version__')
+
+    assert 'rri' in modules
+    assert not modules & {'requests', 'uritemplate', 'aiohttp', 'rri.rri'}
+
+
+def test_client_import_skips_optional_modules():
+    modules = _imported_modules('from rri import RRIClient')
+
+    assert 'rri.rri' in modules
+    assert not modules & {'requests', 'aiohttp', 'numpy', 'rri.validate'}
+
+
+def test_default_client_skips_requests():
+    modules = _imported_modules(
+        'from rri import RRIClient\n'
+        'from rri.retry import RetryPolicy\n'
+        'from rri.breaker import CircuitBreaker\n'
+        "RRIClient('example', 'testuser', 'testpass', retry=RetryPolicy(),\n"
+        '          breaker=CircuitBreaker())'
+    )
+
+    assert 'urllib3' in modules
+    assert 'requests' not in modules
+
+
+def test_lazy_attributes():
+    import rri
+    from rri.fleet import RRIFleet
+
+    assert rri.RRIClient is RRIClient
+    assert rri.RRIFleet is RRIFleet
+    assert set(rri.__all__) <= set(dir(rri))
+
+    with pytest.raises(AttributeError):
+        rri.RRIUnknown
@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `rri.scheduler` module."""
+from datetime import datetime, timezone
+
+import pytest
+
+
+from rri import RRIFleet
+from rri.scheduler import Scheduler, get_deadline
+
+
+BASE_URL = 'https://ry-api.icann.org/report'
+
+
+def _utc(*args):
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def fleet():
+    return RRIFleet({
+        'example': ('exampleuser', 'examplepass'),
+        'test': ('testuser', 'testpass'),
+    })
+
+
+@pytest.mark.parametrize('resource, period, expected', [
+    ('registrar-transactions', '2018-08', _utc(2018, 9, 21)),
+    ('registry-functions-activity', '2018-12', _utc(2019, 1, 21)),
+    ('escrow-agent-notification', '2018-08-31', _utc(2018, 9, 2)),
+    ('registry-escrow-report', '20180809001', _utc(2018, 8, 11)),
+    ('registry-escrow-report', 'deposit-1', None),
+    ('escrow-agent-notification', None, None),
+])
+def test_get_deadline(resource, period, expected):
+    assert get_deadline(resource, period) == expected
+
+
+def test_get_deadline_unknown_resource():
+    with pytest.raises(ValueError):
+        get_deadline('unknown', '2018-08')
+
+
+def test_runs_closest_deadline_first(fleet, responses):
+    for period in ('2018-06', '2018-07', '2018-08'):
+        responses.add(responses.PUT, status=200,
+                      url=f'{BASE_URL}/registrar-transactions/example/'
+                          f'{period}')
+    responses.add(responses.POST, status=200,
+                  url=f'{BASE_URL}/escrow-agent-notification/example')
+
+    scheduler = Scheduler(fleet, max_workers=1)
+    scheduler.add('example', 'registrar-transactions', '2018-08', 'a')
+    scheduler.add('example', 'escrow-agent-notification', '2018-09-02', 'b')
+    scheduler.add('example', 'registrar-transactions', '2018-06', 'c')
+    scheduler.add('example', 'registrar-transactions', '2018-07', 'd')
+
+    finished = scheduler.run()
+
+    # The notification is due on the 4th, before the August report
+    assert [item.period for item in finished] == \
+        ['2018-06', '2018-07', '2018-09-02', '2018-08']
+    assert [call.request.body for call in responses.calls] == \
+        ['c', 'd', 'b', 'a']
+    assert all(item.state == 'done' for item in finished)
+    assert len(scheduler) == 0
+
+
+def test_undated_notification_is_due_now(fleet, responses):
+    responses.add(responses.POST, status=200,
+                  url=f'{BASE_URL}/escrow-agent-notification/example')
+
+    scheduler = Scheduler(fleet)
+    before = datetime.now(timezone.utc)
+    item = scheduler.add('example', 'escrow-agent-notification', None,
+                         '<notification/>')
+
+    assert before <= item.deadline <= datetime.now(timezone.utc)
+    assert scheduler.run() == [item]
+    assert item.state == 'done'
+
+
+def test_requeues_failures(fleet, responses):
+    url = f'{BASE_URL}/registrar-transactions/example/2018-08'
+    responses.add(responses.PUT, url, status=500)
+    responses.add(responses.PUT, url, status=200)
+
+    scheduler = Scheduler(fleet, retry_delay=0)
+    item = scheduler.add('example', 'registrar-transactions', '2018-08',
+                         'report')
+
+    assert scheduler.run() == [item]
+    assert item.state == 'done'
+    assert item.attempts == 2
+    assert item.error is None
+
+
+def test_fails_after_max_attempts(fleet, responses):
+    responses.add(responses.PUT, status=500,
+                  url=f'{BASE_URL}/registrar-transactions/example/2018-08')
+
+    scheduler = Scheduler(fleet, max_attempts=3, retry_delay=0)
+    item = scheduler.add('example', 'registrar-transactions', '2018-08',
+                         'report')
+    scheduler.run()
+
+    assert item.state == 'failed'
+    assert item.attempts == 3
+    assert len(responses.calls) == 3
+
+
+def test_rejected_and_unknown_tld_are_final(fleet, responses):
+    responses.add(responses.PUT, status=400,
+                  url=f'{BASE_URL}/registrar-transactions/example/2018-08')
+
+    scheduler = Scheduler(fleet, retry_delay=0)
+    rejected = scheduler.add('example', 'registrar-transactions', '2018-08',
+                             'report')
+    unknown = scheduler.add('unknown', 'registrar-transactions', '2018-08',
+                            'report')
+    scheduler.run()
+
+    assert rejected.state == 'rejected'
+    assert unknown.state == 'failed'
+    assert isinstance(unknown.error, KeyError)
+    assert rejected.attempts == unknown.attempts == 1
+
+
+def test_overdue(fleet, responses):
+    responses.add(responses.PUT, status=200,
+                  url=f'{BASE_URL}/registrar-transactions/example/2018-08')
+
+    scheduler = Scheduler(fleet)
+    item = scheduler.add('example', 'registrar-transactions', '2018-08',
+                         'report')
+    scheduler.run()
+
+    assert item.overdue
+    assert not scheduler.add('example', 'registrar-transactions', '2018-08',
+                             'report', deadline=datetime(2999, 1, 1)).overdue
@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `rri.testing` module."""
+import pytest
+import requests
+
+
+from rri import RRIClient, RRIFleet
+from rri.exception import ConnectionFailed, GeneralFailure, \
+    InvalidTldCredentials
+from rri.retry import RetryPolicy
+from rri.testing import FakeRRIServer
+
+
+pytestmark = pytest.mark.withoutresponses
+
+# Captured at collection, before any test patches it
+HTTP_ADAPTER_SEND = requests.adapters.HTTPAdapter.send
+
+
+@pytest.fixture(autouse=True)
+def real_http(monkeypatch):
+    # A test using the responses fixture leaves the pytest-responses
+    # mock patched in, so put the real adapter back
+    monkeypatch.setattr(requests.adapters.HTTPAdapter, 'send',
+                        HTTP_ADAPTER_SEND)
+
+
+@pytest.fixture
+def server():
+    with FakeRRIServer(credentials={'example': ('testuser', 'testpass')}) \
+            as server:
+        yield server
+
+
+@pytest.fixture
+def rric(server):
+    return RRIClient('example', 'testuser', 'testpass',
+                     base_url=server.base_url)
+
+
+def test_check_after_submit(server, rric):
+    assert rric.transactions.check('2018-08') is False
+
+    assert rric.transactions.submit('registrar-name,iana-id\n',
+                                    '2018-08').success
+
+    assert rric.transactions.check('2018-08') is True
+    assert rric.functions.check('2018-08') is False
+    assert server.accepted('example', 'registrar-transactions', '2018-08')
+
+
+def test_escrow_report_and_notification(server, rric):
+    rric.report.submit(b'<report/>', '20180809001')
+    rric.notification.submit(b'<notification/>')
+
+    assert server.accepted('example', 'registry-escrow-report',
+                           '20180809001')
+    assert rric.notification.check() is True
+
+
+def test_escrow_report_checked_by_watermark(server, rric):
+    report = b'''<rdeReport:report
+      xmlns:rdeReport="urn:ietf:params:xml:ns:rdeReport-1.0">
+      <rdeReport:id>20180809001</rdeReport:id>
+      <rdeReport:watermark>2018-08-09T00:00:00Z</rdeReport:watermark>
+    </rdeReport:report>'''
+
+    assert rric.report.check('2018-08-09') is False
+
+    assert rric.report.submit(report, '20180809001').success
+
+    assert rric.report.check('2018-08-09') is True
+    assert rric.report.check('2018-08-10') is False
+    assert server.accepted('example', 'registry-escrow-report',
+                           '20180809001')
+    assert server.accepted('example', 'registry-escrow-report',
+                           '2018-08-09')
+
+
+def test_request_log(server, rric):
+    rric.transactions.check('2018-08')
+    rric.transactions.submit(b'x' * 100, '2018-08')
+
+    check, submit = server.log
+    assert (check.method, check.tld, check.resource, check.period,
+            check.status) == ('HEAD', 'example', 'registrar-transactions',
+                              '2018-08', 404)
+    assert (submit.method, submit.user, submit.bytes_received,
+            submit.status) == ('PUT', 'testuser', 100, 200)
+    assert server.requests == 2
+    assert server.bytes_received == 100
+
+
+def test_streamed_submission(server, rric):
+    rric.transactions.submit(iter([b'x' * 10, b'y' * 20]), '2018-08')
+
+    assert server.log[0].bytes_received == 30
+
+
+def test_rejects_bad_credentials(server):
+    rric = RRIClient('example', 'testuser', 'wrong',
+                     base_url=server.base_url)
+
+    with pytest.raises(InvalidTldCredentials):
+        rric.transactions.check('2018-08')
+
+
+def test_fail_next(server, rric):
+    server.fail_next(2)
+
+    with pytest.raises(GeneralFailure):
+        rric.transactions.check('2018-08')
+
+    retry = RetryPolicy(max_retries=2, sleep=lambda seconds: None)
+    retrying = RRIClient('example', 'testuser', 'testpass',
+                         base_url=server.base_url, retry=retry)
+
+    assert retrying.transactions.submit('report', '2018-08').retries == 1
+    assert [r.status for r in server.log] == [500, 500, 200]
+
+
+def test_drop_next(server, rric):
+    server.drop_next()
+
+    with pytest.raises(ConnectionFailed):
+        rric.transactions.check('2018-08')
+
+    assert server.log[0].status is None
+    assert rric.transactions.check('2018-08') is False
+
+
+def test_validate_rejects_invalid_reports(server, rric):
+    server.validate = True
+
+    response = rric.transactions.submit(b'registrar-name\r\n', '2018-08')
+
+    assert not response.success
+    assert list(response.errors())
+    assert not server.accepted('example', 'registrar-transactions',
+                               '2018-08')
+
+
+def test_reset(server, rric):
+    rric.transactions.submit('report', '2018-08')
+    server.reset()
+
+    assert rric.transactions.check('2018-08') is False
+    assert len(server.log) == 1
+
+
+def test_concurrent_fleet():
+    credentials = {f'tld{n}': (f'user{n}', 'pass') for n in range(20)}
+
+    with FakeRRIServer(credentials=credentials, latency=0.01) as server:
+        fleet = RRIFleet(credentials, pool_size=10, base_url=server.base_url)
+
+        for rric in fleet.clients():
+            rric.functions.submit('report', '2018-08')
+
+        results = {tld: fleet[tld].functions.check_many(
+            ['2018-07', '2018-08'], max_workers=10) for tld in fleet}
+        fleet.close()
+
+    assert all(result == {'2018-07': False, '2018-08': True}
+               for result in results.values())
+    assert server.requests == 60
@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `rri.validate` module."""
+import io
+import pathlib
+
+import pytest
+
+
+from rri import RRIClient
+from rri.exception import InvalidReport
+from rri.fields import TRANSACTION_FIELDS, FUNCTION_FIELDS
+from rri.validate import validate_report, parse_errors, ReportError
+
+
+ESCROW_REPORT = '''<?xml version="1.0" encoding="UTF-8"?>
+<rdeReport:report
+  xmlns:rdeReport="urn:ietf:params:xml:ns:rdeReport-1.0"
+  xmlns:rdeHeader="urn:ietf:params:xml:ns:rdeHeader-1.0">
+  <rdeReport:id>20180809001</rdeReport:id>
+  <rdeReport:version>1</rdeReport:version>
+  <rdeReport:rydeSpecEscrow>RFC8909</rdeReport:rydeSpecEscrow>
+  <rdeReport:rydeSpecMapping>RFC9022</rdeReport:rydeSpecMapping>
+  <rdeReport:resend>0</rdeReport:resend>
+  <rdeReport:crDate>2018-08-09T00:15:00.0Z</rdeReport:crDate>
+  <rdeReport:kind>FULL</rdeReport:kind>
+  <rdeReport:watermark>2018-08-09T00:00:00Z</rdeReport:watermark>
+  <rdeHeader:header>
+    <rdeHeader:tld>example</rdeHeader:tld>
+    <rdeHeader:count
+      uri="urn:ietf:params:xml:ns:rdeDomain-1.0">2</rdeHeader:count>
+  </rdeHeader:header>
+</rdeReport:report>
+'''
+
+
+def _transactions(*rows):
+    header = ','.join(['registrar-name', 'iana-id', *TRANSACTION_FIELDS])
+    return '\r\n'.join([header, *rows]) + '\r\n'
+
+
+def _row(name, iana_id, first=0, rest=0):
+    values = [first] + [rest] * (len(TRANSACTION_FIELDS) - 1)
+    return ','.join([name, str(iana_id), *map(str, values)])
+
+
+def _errors(resource, report):
+    with pytest.raises(InvalidReport) as excinfo:
+        validate_report(resource, report)
+
+    return excinfo.value.errors
+
+
+def test_valid_transactions():
+    report = _transactions(_row('"Example, Inc."', 9999, 10, 1),
+                           _row('Other', 1000, 5, 2),
+                           _row('Totals', '', 15, 3))
+
+    validate_report('registrar-transactions', report)
+    validate_report('registrar-transactions', report.encode())
+    validate_report('registrar-transactions', iter([report.encode()]))
+
+
+def test_transactions_errors():
+    report = _transactions(_row('Example', 9999, 10),
+                           _row('Example', 9999, 'x'),
+                           'Short,1,2',
+                           _row('Totals', '', 11))
+
+    assert _errors('registrar-transactions', report) == [
+        ReportError(3, 'iana-id', 'Duplicate IANA id 9999'),
+        ReportError(3, 'total-domains', '"x" is not a non-negative integer'),
+        ReportError(4, None,
+                    f'Expected {len(TRANSACTION_FIELDS) + 2} fields, '
+                    f'found 3'),
+        ReportError(5, 'total-domains', 'Total 11 does not match the sum of '
+                                        'the registrar lines (10)'),
+    ]
+
+
+def test_transactions_missing_totals():
+    errors = _errors('registrar-transactions',
+                     _transactions(_row('Example', 9999)))
+
+    assert errors == [ReportError(None, None, 'Missing totals line')]
+
+
+def test_transactions_header():
+    errors = _errors('registrar-transactions', 'registrar-name,iana-id\r\n')
+
+    assert errors[0].line == 1
+    assert 'missing total-domains' in errors[0].message
+
+
+def test_functions():
+    header = ','.join(FUNCTION_FIELDS)
+    values = ','.join(['1'] * len(FUNCTION_FIELDS))
+
+    validate_report('registry-functions-activity', f'{header}\r\n{values}\r\n')
+
+    errors = _errors('registry-functions-activity',
+                     f'{header}\r\n{values}\r\n{values}\r\n')
+    assert errors == [ReportError(3, None,
+                                  'Only one line of values is allowed')]
+
+
+def test_functions_zfa_passwords_czds():
+    header = ','.join(FUNCTION_FIELDS)
+    values = ['0'] * len(FUNCTION_FIELDS)
+    values[FUNCTION_FIELDS.index('zfa-passwords')] = 'CZDS'
+
+    validate_report('registry-functions-activity',
+                    f'{header}\r\n{",".join(values)}\r\n')
+
+    values[0] = 'CZDS'
+    errors = _errors('registry-functions-activity',
+                     f'{header}\r\n{",".join(values)}\r\n')
+    assert errors == [ReportError(2, FUNCTION_FIELDS[0],
+                                  '"CZDS" is not a non-negative integer')]
+
+
+def test_escrow_report():
+    validate_report('registry-escrow-report', ESCROW_REPORT)
+
+
+def test_escrow_report_errors():
+    report = ESCROW_REPORT.replace('>FULL<', '>PARTIAL<')
+
+    errors = _errors('registry-escrow-report', report)
+
+    assert [str(error) for error in errors] == [
+        'kind: "PARTIAL" must be FULL or INCR'
+    ]
+
+
+def test_escrow_report_missing_element():
+    report = ESCROW_REPORT.replace('<rdeReport:resend>0</rdeReport:resend>',
+                                   '')
+
+    errors = _errors('registry-escrow-report', report)
+
+    assert [str(error) for error in errors] == [
+        'Report elements must be id, version, rydeSpecEscrow, '
+        'rydeSpecMapping, resend, crDate, kind, watermark, header '
+        '(missing resend)'
+    ]
+
+
+def test_malformed_xml():
+    errors = _errors('escrow-agent-notification', '<notification><id>')
+
+    assert errors[0].message.startswith('Invalid XML')
+
+
+def test_validate_path(tmpdir):
+    path = tmpdir.join('report.xml')
+    path.write(ESCROW_REPORT)
+
+    validate_report('registry-escrow-report', pathlib.Path(str(path)))
+
+
+def test_validate_file_is_rewound():
+    report = io.BytesIO(ESCROW_REPORT.encode())
+
+    validate_report('registry-escrow-report', report)
+
+    assert report.tell() == 0
+
+
+def test_submit_validates_before_upload(responses):
+    rric = RRIClient('example', 'testuser', 'testpass', validate=True)
+
+    with pytest.raises(InvalidReport):
+        rric.transactions.submit('registrar-name\r\n', '2018-08')
+
+    assert len(responses.calls) == 0
+
+
+def test_submit_validates_streamed_reports(responses):
+    def callback(request):
+        b''.join(request.body)
+        return 200, {}, ''
+
+    responses.add_callback(responses.PUT, callback=callback,
+                           url='https://ry-api.icann.org/report/registrar-transactions/example/2018-08')
+    rric = RRIClient('example', 'testuser', 'testpass', validate=True)
+
+    with pytest.raises(InvalidReport):
+        rric.transactions.submit(iter([b'registrar-name\r\n']), '2018-08')
+
+
+@pytest.mark.parametrize('body, expected', [
+    (b'line 3: iana-id: must be unique\nline 4, must be an integer\n'
+     b'Missing Totals line\n\n', [
+         ReportError(3, 'iana-id', 'must be unique'),
+         ReportError(4, None, 'must be an integer'),
+         ReportError(None, None, 'Missing Totals line'),
+     ]),
+    ('<result><error line="2" field="attempted-adds">must be an integer'
+     '</error><error>Missing Totals line</error></result>', [
+         ReportError(2, 'attempted-adds', 'must be an integer'),
+         ReportError(None, None, 'Missing Totals line'),
+     ]),
+    (b'<?xml version="1.0" encoding="UTF-8"?>\n<response><code>2001</code>'
+     b'<text>Invalid report</text></response>', [
+         ReportError(None, None, '2001Invalid report'),
+     ]),
+    (b'', []),
+])
+def test_parse_errors(body, expected):
+    assert list(parse_errors(body)) == expected
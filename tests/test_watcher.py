@@ -0,0 +1,242 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `rri.watcher` module."""
+import os
+import threading
+import time
+
+import pytest
+
+
+import rri.watcher
+from rri import RRIFleet
+from rri.escrow import read_deposit
+from rri.exception import GeneralFailure
+from rri.rri import RRIResponse
+from rri.watcher import DepositWatcher, Inotify
+
+
+BASE_URL = 'https://ry-api.icann.org/report'
+REPORT_URL = f'{BASE_URL}/registry-escrow-report/example/20180809001'
+NOTIFICATION_URL = f'{BASE_URL}/escrow-agent-notification/example'
+
+DEPOSIT = b'''<?xml version="1.0" encoding="UTF-8"?>
+<rde:deposit type="FULL" id="20180809001"
+  xmlns:rde="urn:ietf:params:xml:ns:rde-1.0"
+  xmlns:rdeHeader="urn:ietf:params:xml:ns:rdeHeader-1.0"
+  xmlns:rdeDomain="urn:ietf:params:xml:ns:rdeDomain-1.0">
+  <rde:watermark>2018-08-09T00:00:00Z</rde:watermark>
+  <rde:contents>
+    <rdeDomain:domain><rdeDomain:name>a.example</rdeDomain:name>
+    </rdeDomain:domain>
+  </rde:contents>
+</rde:deposit>'''
+
+
+def _inotify_available():
+    try:
+        Inotify([]).close()
+    except OSError:
+        return False
+
+    return True
+
+
+class Results:
+    """Collects the results passed to on_result"""
+    def __init__(self):
+        self.results = []
+        self.condition = threading.Condition()
+
+    def __call__(self, path, result):
+        with self.condition:
+            self.results.append((os.path.basename(path), result))
+            self.condition.notify_all()
+
+    def wait(self, count, timeout=5):
+        with self.condition:
+            assert self.condition.wait_for(
+                lambda: len(self.results) >= count, timeout
+            ), self.results
+            return list(self.results)
+
+
+@pytest.fixture
+def fleet():
+    return RRIFleet({'example': ('exampleuser', 'examplepass')})
+
+
+@pytest.fixture
+def spool(tmpdir):
+    return tmpdir.mkdir('deposits'), tmpdir.mkdir('notifications')
+
+
+def _land(directory, name, data):
+    """Write a file and move it into place, as a deposit would arrive"""
+    temporary = directory.join('.' + name)
+    temporary.write_binary(data)
+    os.rename(str(temporary), str(directory.join(name)))
+
+
+@pytest.mark.parametrize('use_inotify', [
+    pytest.param(True, id='inotify', marks=pytest.mark.skipif(
+        not _inotify_available(), reason='inotify is not available')),
+    pytest.param(False, id='polling'),
+])
+def test_submits_deposits_and_notifications(fleet, spool, responses,
+                                            use_inotify):
+    responses.add(responses.PUT, status=200, url=REPORT_URL)
+    received = []
+
+    def notification_callback(request):
+        # The file's memory map is closed once the request is sent
+        received.append(bytes(request.body))
+        return 200, {}, ''
+
+    responses.add_callback(responses.POST, callback=notification_callback,
+                           url=NOTIFICATION_URL)
+    deposits, notifications = spool
+    results = Results()
+
+    watcher = DepositWatcher(fleet, deposits=str(deposits),
+                             notifications=[str(notifications)],
+                             poll_interval=0.05, use_inotify=use_inotify,
+                             on_result=results)
+
+    with watcher:
+        assert (watcher.inotify is not None) == use_inotify
+
+        _land(deposits, 'example_2018-08-09_full_S1_R0.xml', DEPOSIT)
+        _land(notifications, 'example_2018-08-09_notification.xml',
+              b'<notification/>')
+        deposits.join('README.txt').write('ignored')
+
+        handled = dict(results.wait(2))
+
+    assert all(isinstance(result, RRIResponse) and result.success
+               for result in handled.values())
+
+    report = next(call.request for call in responses.calls
+                  if call.request.method == 'PUT')
+    assert report.url == REPORT_URL
+    assert '<rdeReport:id>20180809001</rdeReport:id>' in report.body
+    assert received == [b'<notification/>']
+    assert len(responses.calls) == 2
+
+
+def test_submits_files_waiting_at_start(fleet, spool, responses):
+    responses.add(responses.PUT, status=200, url=REPORT_URL)
+    deposits, _ = spool
+    deposits.join('example_2018-08-09_full_S1_R0.xml').write_binary(DEPOSIT)
+    results = Results()
+
+    with DepositWatcher(fleet, deposits=str(deposits), poll_interval=0.05,
+                        use_inotify=False, on_result=results):
+        results.wait(1)
+        # Handled files aren't submitted again
+        time.sleep(0.2)
+
+    assert len(responses.calls) == 1
+
+
+def test_archives_handled_files(fleet, spool, responses, tmpdir):
+    responses.add(responses.PUT, status=200, url=REPORT_URL)
+    deposits, _ = spool
+    archive = tmpdir.join('archive')
+    results = Results()
+
+    with DepositWatcher(fleet, deposits=str(deposits), archive=str(archive),
+                        poll_interval=0.05, on_result=results):
+        _land(deposits, 'example_2018-08-09_full_S1_R0.xml', DEPOSIT)
+        results.wait(1)
+
+    assert deposits.listdir() == []
+    assert archive.join('example_2018-08-09_full_S1_R0.xml').check()
+
+
+def test_retries_transient_failures(fleet, spool, responses, monkeypatch):
+    responses.add(responses.PUT, status=500, url=REPORT_URL)
+    responses.add(responses.PUT, status=500, url=REPORT_URL)
+    responses.add(responses.PUT, status=200, url=REPORT_URL)
+    deposits, _ = spool
+    results = Results()
+
+    reads = []
+
+    def counting_read_deposit(path):
+        reads.append(path)
+        return read_deposit(path)
+
+    monkeypatch.setattr(rri.watcher, 'read_deposit', counting_read_deposit)
+    watcher = DepositWatcher(fleet, deposits=str(deposits),
+                             poll_interval=0.05, use_inotify=False,
+                             on_result=results, backoff_factor=0.3)
+
+    with watcher:
+        _land(deposits, 'example_2018-08-09_full_S1_R0.xml', DEPOSIT)
+        results.wait(1)
+        # Scans go on, but the file waits out its backoff
+        time.sleep(0.2)
+        assert len(responses.calls) == 1
+
+        (_, first), (_, second), (_, third) = results.wait(3)
+
+    assert isinstance(first, GeneralFailure)
+    assert isinstance(second, GeneralFailure)
+    assert third.success
+    # The deposit was only read for the first attempt
+    assert len(reads) == 1
+    assert watcher._retries == {} and watcher._summaries == {}
+
+
+def test_backoff(fleet):
+    watcher = DepositWatcher(fleet, backoff_factor=10, max_backoff=60)
+
+    assert [watcher.backoff(n) for n in (1, 2, 3, 4)] == [10, 20, 40, 60]
+    assert watcher.backoff(1, retry_after=30) == 30
+
+
+def test_unknown_tld_is_not_retried(fleet, spool, responses):
+    deposits, notifications = spool
+    results = Results()
+
+    with DepositWatcher(fleet, notifications=str(notifications),
+                        poll_interval=0.05, use_inotify=False,
+                        on_result=results):
+        _land(notifications, 'unknown_2018-08-09.xml', b'<notification/>')
+        (_, result), = results.wait(1)
+        time.sleep(0.2)
+
+    assert isinstance(result, KeyError)
+    assert len(results.results) == 1
+    assert notifications.join('unknown_2018-08-09.xml').check()
+
+
+def test_backpressure(fleet, spool, responses):
+    release = threading.Event()
+
+    def callback(request):
+        release.wait(5)
+        return 200, {}, ''
+
+    responses.add_callback(responses.POST, callback=callback,
+                           url=NOTIFICATION_URL)
+    _, notifications = spool
+    for n in range(6):
+        notifications.join(f'example_{n}.xml').write_binary(b'<n/>')
+    results = Results()
+
+    watcher = DepositWatcher(fleet, notifications=str(notifications),
+                             workers=1, queue_size=2, use_inotify=False,
+                             on_result=results)
+    with watcher:
+        time.sleep(0.2)
+        # One file with the worker, two queued, and the scan waiting
+        assert watcher.queue.qsize() == 2
+        assert len(watcher._pending) == 4
+
+        release.set()
+        results.wait(6)
+
+    assert len(responses.calls) == 6